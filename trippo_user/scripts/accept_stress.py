@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Stress ride acceptance under contention against the Firestore emulator.
+
+Seeds pending rides into rideRequests and has many simulated drivers tap
+accept at the same moment (threads released together by a barrier). Two
+implementations of the accept are compared:
+
+    app          RideRepository.acceptRideRequest as shipped: query the
+                 driver's accepted/ongoing rides, read the ride, then update
+                 it if it is still pending. Three separate requests.
+    transaction  The same checks and update inside one Firestore
+                 transaction, retried by the client on contention.
+
+For every contention level (--levels: drivers racing for each ride) and
+mode it records per-accept latency (histogram and percentiles),
+transaction attempts/retries, aborts (transactions that ran out of
+attempts or errored) and invariant violations found afterwards:
+
+    double accepts   more than one driver was told they won the same ride
+    multi-active     a driver ended up with more than one accepted ride
+
+--rides-per-driver > 1 makes each driver tap several rides at once, which
+exercises the single-active-ride check instead of the pending check.
+
+Accepted rides are deleted between rounds so drivers start every round
+without an active ride. Refuses to run without FIRESTORE_EMULATOR_HOST.
+
+Run:
+    firebase emulators:exec --only firestore --project btrips-42089 \\
+        "python3 scripts/accept_stress.py --levels 2,8,32,64 --rounds 20"
+    python3 scripts/accept_stress.py --levels 16 --rides-per-driver 4 --mode transaction
+"""
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import sys
+import threading
+import time
+
+from firebase_client import get_firestore, initialize_firebase, using_emulator
+from firestore_bulk import BatchWriter
+from synthetic_data import SyntheticFleet, driver_email, driver_uid
+
+MODES = ('app', 'transaction')
+DEFAULT_LEVELS = [1, 4, 16, 64]
+DEFAULT_MAX_ATTEMPTS = 5
+ACTIVE_STATUSES = ['accepted', 'ongoing']
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Outcomes of one accept tap
+ACCEPTED = 'accepted'
+UNAVAILABLE = 'unavailable'       # ride no longer pending
+ACTIVE_RIDE = 'active_ride'       # driver already has an accepted/ongoing ride
+ABORTED = 'aborted'               # transaction gave up or the request failed
+
+
+class RideNoLongerAvailable(Exception):
+    pass
+
+
+class AlreadyHasActiveRide(Exception):
+    pass
+
+
+class AcceptAborted(Exception):
+    """The accept failed outright; the original error is the __cause__."""
+
+    def __init__(self, attempts):
+        super().__init__(f"accept aborted after {attempts} attempt(s)")
+        self.attempts = attempts
+
+
+def _accept_update(driver_index):
+    from google.cloud.firestore import SERVER_TIMESTAMP
+
+    return {
+        'driverId': driver_uid(driver_index),
+        'driverEmail': driver_email(driver_index),
+        'status': 'accepted',
+        'acceptedAt': SERVER_TIMESTAMP,
+    }
+
+
+def _active_rides_query(db, driver_index):
+    from firestore_counts import build_query
+
+    return build_query(db, 'rideRequests', [('driverId', '==', driver_uid(driver_index)),
+                                            ('status', 'in', ACTIVE_STATUSES)])
+
+
+def accept_app(db, ride_id, driver_index):
+    """The app's accept: two checks and an update, not atomic.
+
+    Returns:
+        (outcome, attempts)
+    """
+    if list(_active_rides_query(db, driver_index).stream()):
+        return ACTIVE_RIDE, 1
+    ride_ref = db.collection('rideRequests').document(ride_id)
+    snapshot = ride_ref.get()
+    if not snapshot.exists or (snapshot.to_dict() or {}).get('status') != 'pending':
+        return UNAVAILABLE, 1
+    ride_ref.update(_accept_update(driver_index))
+    return ACCEPTED, 1
+
+
+def accept_transaction(db, ride_id, driver_index, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """The same accept in one transaction.
+
+    Returns:
+        (outcome, attempts)
+    """
+    from google.cloud import firestore
+
+    ride_ref = db.collection('rideRequests').document(ride_id)
+    active_query = _active_rides_query(db, driver_index)
+    attempts = 0
+
+    @firestore.transactional
+    def accept(transaction):
+        nonlocal attempts
+        attempts += 1
+        if list(transaction.get(active_query)):
+            raise AlreadyHasActiveRide()
+        snapshot = ride_ref.get(transaction=transaction)
+        if not snapshot.exists or (snapshot.to_dict() or {}).get('status') != 'pending':
+            raise RideNoLongerAvailable()
+        transaction.update(ride_ref, _accept_update(driver_index))
+
+    try:
+        accept(db.transaction(max_attempts=max_attempts))
+    except AlreadyHasActiveRide:
+        return ACTIVE_RIDE, attempts
+    except RideNoLongerAvailable:
+        return UNAVAILABLE, attempts
+    except Exception as e:
+        # Includes "failed to commit transaction in N attempts"
+        raise AcceptAborted(attempts) from e
+    return ACCEPTED, attempts
+
+
+class StressStats:
+    """Outcomes, attempts and latencies for one (mode, level) run."""
+
+    def __init__(self):
+        self.outcomes = Counter()
+        self.attempts = Counter()
+        self.latencies_ms = []
+        self.violations = Counter()
+        self.errors = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, outcome, attempts, latency_ms, error=None):
+        with self._lock:
+            self.outcomes[outcome] += 1
+            self.attempts[attempts] += 1
+            self.latencies_ms.append(latency_ms)
+            if error is not None:
+                self.errors[type(error).__name__] += 1
+
+    def histogram(self):
+        """Accept count per latency bucket, keyed by the bucket's upper bound."""
+        buckets = Counter()
+        for latency in self.latencies_ms:
+            bound = next((b for b in LATENCY_BUCKETS_MS if latency <= b), None)
+            buckets[f"<={bound}" if bound is not None else f">{LATENCY_BUCKETS_MS[-1]}"] += 1
+        labels = [f"<={b}" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}"]
+        return {label: buckets[label] for label in labels}
+
+    def summary(self):
+        taps = sum(self.outcomes.values())
+        latencies = sorted(self.latencies_ms)
+
+        def percentile(fraction):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(fraction * len(latencies)))], 1)
+
+        attempts = sum(count * tries for tries, count in self.attempts.items())
+        return {
+            'taps': taps,
+            'outcomes': dict(self.outcomes),
+            'abortRate': round(self.outcomes[ABORTED] / taps, 4) if taps else None,
+            'retries': attempts - taps,
+            'retriesPerTap': round((attempts - taps) / taps, 3) if taps else None,
+            'attemptsHistogram': {str(tries): self.attempts[tries] for tries in sorted(self.attempts)},
+            'latencyMs': {'p50': percentile(0.50), 'p95': percentile(0.95),
+                          'p99': percentile(0.99), 'max': percentile(1.0)},
+            'latencyHistogramMs': self.histogram(),
+            'violations': dict(self.violations),
+            'errors': dict(self.errors),
+        }
+
+
+def seed_rides(db, fleet, first_index, count):
+    """Write `count` pending rides and return their IDs."""
+    ride_ids = []
+    with BatchWriter(db) as writer:
+        for index in range(first_index, first_index + count):
+            _, ride = fleet.ride(index)
+            ride.pop('userRating', None)
+            ride.pop('driverRating', None)
+            ride.update({'status': 'pending', 'driverId': None, 'driverEmail': None,
+                         'acceptedAt': None, 'startedAt': None, 'completedAt': None,
+                         'declinedBy': [], 'paymentStatus': 'pending'})
+            ride_id = f"stress_{index:08d}"
+            writer.set(db.collection('rideRequests').document(ride_id), ride)
+            ride_ids.append(ride_id)
+    return ride_ids
+
+
+def run_round(db, mode, ride_ids, drivers, stats, executor, max_attempts):
+    """Every driver taps accept on every ride of the round at the same time."""
+    taps = [(ride_id, driver) for driver in range(drivers) for ride_id in ride_ids]
+    barrier = threading.Barrier(len(taps))
+    winners = {ride_id: [] for ride_id in ride_ids}
+    lock = threading.Lock()
+
+    def tap(ride_id, driver):
+        barrier.wait()
+        start = time.perf_counter()
+        error = None
+        try:
+            if mode == 'app':
+                outcome, attempts = accept_app(db, ride_id, driver)
+            else:
+                outcome, attempts = accept_transaction(db, ride_id, driver, max_attempts)
+        except AcceptAborted as e:
+            outcome, attempts, error = ABORTED, e.attempts, e.__cause__
+        except Exception as e:
+            outcome, attempts, error = ABORTED, 1, e
+        stats.record(outcome, attempts, (time.perf_counter() - start) * 1000, error)
+        if outcome == ACCEPTED:
+            with lock:
+                winners[ride_id].append(driver)
+
+    for future in [executor.submit(tap, ride_id, driver) for ride_id, driver in taps]:
+        future.result()
+
+    won = Counter()
+    for ride_id, ride_winners in winners.items():
+        if len(ride_winners) > 1:
+            stats.violations['double_accepts'] += 1
+        won.update(ride_winners)
+    stats.violations['multi_active'] += sum(1 for count in won.values() if count > 1)
+
+
+def delete_rides(db, ride_ids):
+    with BatchWriter(db) as writer:
+        for ride_id in ride_ids:
+            writer.delete(db.collection('rideRequests').document(ride_id))
+
+
+def run_stress(db, levels, modes, rounds, rides_per_driver, max_attempts, seed=42):
+    """Run every (mode, level) combination.
+
+    Returns:
+        List of result dicts (mode, level, summary)
+    """
+    fleet = SyntheticFleet(seed=seed, drivers=max(levels), riders=100)
+    results = []
+    next_ride = 0
+    for mode in modes:
+        for level in levels:
+            stats = StressStats()
+            with ThreadPoolExecutor(max_workers=level * rides_per_driver) as executor:
+                for _ in range(rounds):
+                    ride_ids = seed_rides(db, fleet, next_ride, rides_per_driver)
+                    next_ride += rides_per_driver
+                    run_round(db, mode, ride_ids, level, stats, executor, max_attempts)
+                    delete_rides(db, ride_ids)
+            summary = stats.summary()
+            results.append({'mode': mode, 'driversPerRide': level,
+                            'ridesPerDriver': rides_per_driver, **summary})
+            print_result(mode, level, summary)
+    return results
+
+
+def print_result(mode, level, summary):
+    outcomes, latency = summary['outcomes'], summary['latencyMs']
+    violations = {name: count for name, count in summary['violations'].items() if count}
+    print(f"   {mode:<11} {level:>4} drivers/ride: "
+          f"{outcomes.get(ACCEPTED, 0)} won, {outcomes.get(UNAVAILABLE, 0)} unavailable, "
+          f"{outcomes.get(ACTIVE_RIDE, 0)} active-ride, {outcomes.get(ABORTED, 0)} aborted "
+          f"({summary['abortRate']:.1%}) | {summary['retriesPerTap']} retries/tap | "
+          f"p50 {latency['p50']} ms, p99 {latency['p99']} ms"
+          + (f" | ❌ {violations}" if violations else ""))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Stress concurrent ride acceptance against the Firestore emulator")
+    parser.add_argument('--levels', default=','.join(map(str, DEFAULT_LEVELS)),
+                        help=f"Comma-separated drivers racing per ride (default: {','.join(map(str, DEFAULT_LEVELS))})")
+    parser.add_argument('--rounds', type=int, default=10,
+                        help="Rounds per level; each seeds fresh pending rides (default: 10)")
+    parser.add_argument('--rides-per-driver', type=int, default=1,
+                        help="Rides each driver taps at once per round (default: 1)")
+    parser.add_argument('--mode', choices=MODES + ('both',), default='both',
+                        help="Accept implementation to stress (default: both)")
+    parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help=f"Transaction attempts before aborting (default: {DEFAULT_MAX_ATTEMPTS})")
+    parser.add_argument('--output', help="Also write the results as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    levels = [int(level) for level in args.levels.split(',') if level.strip()]
+    modes = MODES if args.mode == 'both' else (args.mode,)
+
+    print("\n" + "="*60)
+    print("🏁 BTRIPS ACCEPT CONTENTION STRESS")
+    print("="*60)
+
+    if not using_emulator():
+        print("❌ FIRESTORE_EMULATOR_HOST not set")
+        print("\n📋 This tool seeds and deletes rides, so it only runs against the emulator:")
+        print("   firebase emulators:exec --only firestore --project btrips-42089 \\")
+        print('       "python3 scripts/accept_stress.py"')
+        sys.exit(1)
+
+    if not initialize_firebase():
+        sys.exit(1)
+    db = get_firestore()
+
+    print(f"   Levels {levels}, {args.rounds} rounds, {args.rides_per_driver} ride(s) per driver\n")
+    results = run_stress(db, levels, modes, args.rounds, args.rides_per_driver, args.max_attempts)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,81 +7,19 @@ Install dependencies:
 
 Run:
     python3 scripts/add_drivers.py
+    python3 scripts/add_drivers.py --metrics-out add_drivers_metrics.json
 
 Or set GOOGLE_APPLICATION_CREDENTIALS environment variable:
     export GOOGLE_APPLICATION_CREDENTIALS="path/to/serviceAccountKey.json"
     python3 scripts/add_drivers.py
 """
 
-import firebase_admin
-from firebase_admin import credentials, firestore
-from google.cloud.firestore import GeoPoint
-import os
+import argparse
 
-# Initialize Firebase Admin SDK
-def initialize_firebase():
-    """Initialize Firebase Admin SDK."""
-    try:
-        # Try to use existing app
-        app = firebase_admin.get_app()
-        print("✅ Using existing Firebase app")
-        return app
-    except ValueError:
-        # No app exists, initialize it
-        print("🔄 Initializing Firebase Admin SDK...")
-        
-        # Project ID from firebase_options.dart
-        PROJECT_ID = "btrips-42089"
-        
-        # Option 1: Use service account key file (if provided)
-        cred_path = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS')
-        if cred_path and os.path.exists(cred_path):
-            cred = credentials.Certificate(cred_path)
-            app = firebase_admin.initialize_app(cred, {
-                'projectId': PROJECT_ID,
-            })
-            print("✅ Initialized with service account key")
-            return app
-        
-        # Option 2: Try to find service account key in common locations
-        possible_paths = [
-            'serviceAccountKey.json',
-            'btrips_user/serviceAccountKey.json',
-            os.path.expanduser('~/Downloads/serviceAccountKey.json'),
-        ]
-        
-        for path in possible_paths:
-            if os.path.exists(path):
-                print(f"📁 Found service account key at: {path}")
-                cred = credentials.Certificate(path)
-                app = firebase_admin.initialize_app(cred, {
-                    'projectId': PROJECT_ID,
-                })
-                print("✅ Initialized with service account key")
-                return app
-        
-        # Option 3: Use Application Default Credentials (for local development)
-        try:
-            cred = credentials.ApplicationDefault()
-            app = firebase_admin.initialize_app(cred, {
-                'projectId': PROJECT_ID,
-            })
-            print("✅ Initialized with Application Default Credentials")
-            return app
-        except Exception as e:
-            print("❌ Could not initialize Firebase Admin SDK")
-            print(f"\nError: {e}")
-            print("\n📋 To use this script, you need Firebase credentials:")
-            print("\nOption 1 - Download Service Account Key:")
-            print("1. Go to: https://console.firebase.google.com/project/btrips-42089/settings/serviceaccounts/adminsdk")
-            print("2. Click 'Generate New Private Key'")
-            print("3. Save as 'serviceAccountKey.json' in the btrips_user directory")
-            print("4. Run the script again")
-            print("\nOption 2 - Set Environment Variable:")
-            print("   export GOOGLE_APPLICATION_CREDENTIALS='path/to/serviceAccountKey.json'")
-            print("\nOption 3 - Use Firebase Console:")
-            print("   Manually add drivers via Firebase Console (see ADD_DRIVERS.md)")
-            return None
+from firebase_client import get_firestore, initialize_firebase
+from firestore_bulk import bulk_upsert
+from firestore_geo import geo_point
+from firestore_metrics import add_metrics_arguments, start_metrics, step
 
 def add_drivers():
     """Add 4 sample drivers to Firestore."""
@@ -89,7 +27,7 @@ def add_drivers():
     if not app:
         return
     
-    db = firestore.client()
+    db = get_firestore()
     
     # Sample drivers data - Located near major airports in the area
     drivers = [
@@ -101,9 +39,7 @@ def add_drivers():
             "email": "ahmed.khan@driver.com",
             "driverStatus": "Idle",
             "rate": 3.0,  # Vehicle rate multiplier
-            "driverLoc": {
-                "geopoint": GeoPoint(40.6895, -74.1745),  # Near Newark Airport
-            },
+            "driverLoc": geo_point(40.6895, -74.1745),  # Near Newark Airport
         },
         {
             "Car Name": "Honda Civic",
@@ -113,9 +49,7 @@ def add_drivers():
             "email": "sara.ali@driver.com",
             "driverStatus": "Idle",
             "rate": 3.0,  # Vehicle rate multiplier
-            "driverLoc": {
-                "geopoint": GeoPoint(40.6413, -73.7781),  # Near JFK Airport
-            },
+            "driverLoc": geo_point(40.6413, -73.7781),  # Near JFK Airport
         },
         {
             "Car Name": "Toyota RAV4",
@@ -125,9 +59,7 @@ def add_drivers():
             "email": "mohammed.hassan@driver.com",
             "driverStatus": "Idle",
             "rate": 3.0,  # Vehicle rate multiplier
-            "driverLoc": {
-                "geopoint": GeoPoint(40.7769, -73.8740),  # Near La Guardia Airport
-            },
+            "driverLoc": geo_point(40.7769, -73.8740),  # Near La Guardia Airport
         },
         {
             "Car Name": "Yamaha R15",
@@ -137,44 +69,47 @@ def add_drivers():
             "email": "fatima.ahmed@driver.com",
             "driverStatus": "Idle",
             "rate": 3.0,  # Vehicle rate multiplier
-            "driverLoc": {
-                "geopoint": GeoPoint(39.8719, -75.2411),  # Near Philadelphia Airport
-            },
+            "driverLoc": geo_point(39.8719, -75.2411),  # Near Philadelphia Airport
         },
     ]
     
+    # Stamp the change time so incremental migrations pick the drivers up
+    from google.cloud.firestore import SERVER_TIMESTAMP
+    for driver in drivers:
+        driver["updatedAt"] = SERVER_TIMESTAMP
+    
     print(f"\n📝 Adding {len(drivers)} drivers to Firestore...\n")
     print("-" * 60)
     
-    for driver_data in drivers:
-        try:
-            # Use email as document ID
-            doc_ref = db.collection("Drivers").document(driver_data["email"])
-            
-            # Check if driver already exists
-            doc = doc_ref.get()
-            if doc.exists:
-                print(f"⚠️  Driver {driver_data['email']} already exists. Updating...")
-                doc_ref.update(driver_data)
-                status = "Updated"
-            else:
-                doc_ref.set(driver_data)
-                status = "Added"
-            
-            print(f"✅ {status}: {driver_data['name']} ({driver_data['Car Name']})")
-            print(f"   📧 Email: {driver_data['email']}")
-            print(f"   🚗 Type: {driver_data['Car Type']}")
-            print(f"   📍 Location: {driver_data['driverLoc']['geopoint'].latitude}, {driver_data['driverLoc']['geopoint'].longitude}")
-            print(f"   🟢 Status: {driver_data['driverStatus']}")
-            print("-" * 60)
-            
-        except Exception as e:
-            print(f"❌ Error adding driver {driver_data['email']}: {e}")
-            print("-" * 60)
+    summary = bulk_upsert(db, "Drivers", drivers, doc_id_field="email", on_written=_print_driver)
+    
+    for email, message in summary.errors:
+        print(f"❌ Error adding driver {email}: {message}")
+        print("-" * 60)
     
+    print(f"\n📊 {summary.added} added, {summary.updated} updated")
     print(f"\n✨ Done! {len(drivers)} drivers processed.")
     print("\n💡 Tip: Check Firebase Console to verify drivers were added.")
 
+def _print_driver(status, driver_data):
+    """Print one written driver."""
+    print(f"✅ {status}: {driver_data['name']} ({driver_data['Car Name']})")
+    print(f"   📧 Email: {driver_data['email']}")
+    print(f"   🚗 Type: {driver_data['Car Type']}")
+    print(f"   📍 Location: {driver_data['driverLoc']['geopoint'].latitude}, {driver_data['driverLoc']['geopoint'].longitude}")
+    print(f"   🟢 Status: {driver_data['driverStatus']}")
+    print("-" * 60)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Add the sample drivers to Firestore")
+    add_metrics_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    start_metrics(parse_args(argv))
+    with step('add_drivers'):
+        add_drivers()
+
 if __name__ == "__main__":
-    add_drivers()
+    main()
 
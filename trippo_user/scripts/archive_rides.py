@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Archive finished rides from rideRequests into rideHistory.
+
+The app moves a ride to rideHistory when it is completed or cancelled
+through the ride repository, but cancellations from the details screens
+and failed moves leave finished rides in rideRequests, where every
+driver's live pending-rides listener keeps scanning them. This job moves
+completed and cancelled rides older than a cutoff:
+
+    rideRequests/{id}  ->  rideHistory/{id}
+
+Each ride's copy and delete are committed in the same WriteBatch, so a
+ride is never lost or left in both collections. The delete is conditional
+on the request's update time, so a ride rated or edited after it was read
+is skipped and retried on the next run instead of being deleted with a
+stale copy. If rideHistory already has the ride (the app's own move
+half-finished), the history copy is kept and only the request is deleted.
+
+Finished rides are found per (status, timestamp) pair, since the details
+screens stamp cancelledAt where the repository stamps completedAt:
+
+    status == completed, completedAt < cutoff
+    status == cancelled, completedAt < cutoff
+    status == cancelled, cancelledAt < cutoff
+
+Each query is paged in timestamp order, and the timestamp of the last
+archived ride is checkpointed per query in _migrations/ride_archive. The
+next run starts from there instead of re-scanning the deleted range, so
+the job can run on a schedule (and resume after an interruption) at a
+cost proportional to the rides it moves.
+
+Run:
+    python3 scripts/archive_rides.py                   # rides finished more than 1 day ago
+    python3 scripts/archive_rides.py --days 7 --limit 20000
+    python3 scripts/archive_rides.py --dry-run
+    python3 scripts/archive_rides.py --restart         # ignore the checkpoint, scan from the start
+"""
+
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+import argparse
+import sys
+
+from firebase_client import get_firestore, initialize_firebase
+from firestore_bulk import MAX_BATCH_SIZE, BatchWriter, chunked, find_missing
+from firestore_counts import build_query
+from firestore_paging import iter_pages
+from migration_checkpoint import FirestoreCheckpointStore
+
+CHECKPOINT_NAME = 'ride_archive'
+SOURCE_COLLECTION = 'rideRequests'
+TARGET_COLLECTION = 'rideHistory'
+DEFAULT_DAYS = 1
+DEFAULT_PAGE_SIZE = 500
+
+# (status, timestamp field) pairs that mark a ride as finished
+FINISHED = [
+    ('completed', 'completedAt'),
+    ('cancelled', 'completedAt'),
+    ('cancelled', 'cancelledAt'),
+]
+
+# A ride is one set plus one delete, so this many rides fill a batch
+RIDES_PER_BATCH = MAX_BATCH_SIZE // 2
+
+
+def _step(status, field):
+    return f"{status}.{field}"
+
+
+def _precondition_failures():
+    from google.api_core import exceptions as gax_exceptions
+
+    return (gax_exceptions.FailedPrecondition, gax_exceptions.NotFound)
+
+
+def _commit_moves(db, moves):
+    """Commit (snapshot, history ref or None) moves in one batch.
+
+    Each delete only succeeds if the request is unchanged since it was
+    read, so a rating written in the meantime fails the batch instead of
+    being deleted without a copy.
+    """
+    writer = BatchWriter(db, split=False)
+    for snapshot, target in moves:
+        if target is not None:
+            writer.set(target, snapshot.to_dict() or {})
+        writer.delete(snapshot.reference,
+                      option=db.write_option(last_update_time=snapshot.update_time))
+    writer.flush()
+
+
+def archive_page(db, page, dry_run=False):
+    """Move one page of ride snapshots into rideHistory.
+
+    Returns:
+        (Counter of 'archived' (copied and deleted) and 'already_archived'
+        (only deleted, rideHistory already had them), snapshots skipped
+        because they changed after they were read)
+    """
+    summary = Counter()
+    changed = []
+    history = db.collection(TARGET_COLLECTION)
+
+    for chunk in chunked(page, RIDES_PER_BATCH):
+        targets = {snapshot.id: history.document(snapshot.id) for snapshot in chunk}
+        missing = {ref.id for ref in find_missing(db, list(targets.values()))}
+        moves = [(snapshot, targets[snapshot.id] if snapshot.id in missing else None)
+                 for snapshot in chunk]
+        if not dry_run:
+            # One chunk per batch, so a ride's set and delete always commit together
+            try:
+                _commit_moves(db, moves)
+            except _precondition_failures():
+                # Find the ride(s) that changed; the rest still move now
+                kept = []
+                for move in moves:
+                    try:
+                        _commit_moves(db, [move])
+                    except _precondition_failures():
+                        changed.append(move[0])
+                        continue
+                    kept.append(move)
+                moves = kept
+        for snapshot, target in moves:
+            summary['archived' if target is not None else 'already_archived'] += 1
+    return summary, changed
+
+
+def archive_finished(db, status, field, cutoff, checkpoint, page_size=DEFAULT_PAGE_SIZE,
+                     limit=None, dry_run=False, resume=True):
+    """Archive rides with `status` whose `field` is before `cutoff`.
+
+    Resumes from the timestamp saved in `checkpoint` for this query (unless
+    resume is False) and saves the last archived timestamp after every page.
+    Rides that changed while being archived are skipped, and the checkpoint
+    stays at the first of them so the next run retries it.
+
+    Returns:
+        Counter of 'archived', 'already_archived' and 'changed'
+    """
+    step = _step(status, field)
+    state = checkpoint.get(step) if resume else {}
+    filters = [('status', '==', status), (field, '<', cutoff)]
+    if state.get('cursor'):
+        since = datetime.fromisoformat(state['cursor'])
+        filters.append((field, '>=', since))
+        print(f"   ▶️  {step}: resuming from {since:%Y-%m-%d %H:%M:%S} UTC")
+
+    summary = Counter()
+    held = None
+    query = build_query(db, SOURCE_COLLECTION, filters)
+    for page in iter_pages(query, page_size, order_by=field):
+        if limit is not None:
+            page = page[:limit - summary['archived'] - summary['already_archived']]
+        page_summary, changed = archive_page(db, page, dry_run)
+        summary.update(page_summary)
+        if changed:
+            summary['changed'] += len(changed)
+            print(f"   ⏭️  {step}: {len(changed)} ride(s) changed while archiving, retrying next run")
+            if held is None:
+                held = changed[0].get(field)
+
+        last = page[-1].get(field)
+        moved = summary['archived'] + summary['already_archived']
+        print(f"   📦 {step}: {moved} rides moved (through {last:%Y-%m-%d %H:%M:%S})")
+        if not dry_run:
+            checkpoint.save(step, (held or last).isoformat(),
+                            archived=state.get('archived', 0) + summary['archived'],
+                            already_archived=state.get('already_archived', 0) + summary['already_archived'])
+        if limit is not None and moved >= limit:
+            break
+    return summary
+
+
+def archive_rides(db, cutoff, checkpoint, page_size=DEFAULT_PAGE_SIZE, limit=None, dry_run=False,
+                  resume=True):
+    """Archive every kind of finished ride older than `cutoff`.
+
+    Returns:
+        Counter of '<status>' rides moved, 'archived', 'already_archived'
+        and 'changed'
+    """
+    summary = Counter()
+    for status, field in FINISHED:
+        remaining = None if limit is None else limit - summary['archived'] - summary['already_archived']
+        if remaining is not None and remaining <= 0:
+            break
+        moved = archive_finished(db, status, field, cutoff, checkpoint, page_size, remaining,
+                                 dry_run, resume)
+        summary.update(moved)
+        summary[status] += moved['archived'] + moved['already_archived']
+    return summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Move completed and cancelled rides from rideRequests to rideHistory")
+    parser.add_argument('--days', type=float, default=DEFAULT_DAYS,
+                        help=f"Only archive rides finished more than this many days ago (default: {DEFAULT_DAYS})")
+    parser.add_argument('--limit', type=int,
+                        help="Stop after moving this many rides (the next run continues)")
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f"Rides read per page (default: {DEFAULT_PAGE_SIZE})")
+    parser.add_argument('--restart', action='store_true',
+                        help="Ignore the checkpoint and scan rideRequests from the start")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Count the rides that would move without writing anything")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print("\n" + "="*60)
+    print("🗄️  BTRIPS RIDE ARCHIVE" + (" (DRY RUN)" if args.dry_run else ""))
+    print("="*60)
+
+    if not initialize_firebase():
+        sys.exit(1)
+    db = get_firestore()
+
+    checkpoint = FirestoreCheckpointStore(db, CHECKPOINT_NAME)
+    if args.restart and not args.dry_run:
+        checkpoint.reset()
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=args.days)
+    print(f"   Archiving rides finished before {cutoff:%Y-%m-%d %H:%M} UTC")
+
+    summary = archive_rides(db, cutoff, checkpoint, args.page_size, args.limit, args.dry_run,
+                            resume=not args.restart)
+
+    verb = "would be " if args.dry_run else ""
+    print(f"\n📊 {summary['completed']} completed and {summary['cancelled']} cancelled rides {verb}moved")
+    print(f"   🆕 {summary['archived']} {verb}copied to {TARGET_COLLECTION}")
+    if summary['already_archived']:
+        print(f"   ⏭️  {summary['already_archived']} already in {TARGET_COLLECTION} ({verb}deleted only)")
+    if summary['changed']:
+        print(f"   🔁 {summary['changed']} changed while archiving, left for the next run")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Asyncio execution engine for the BTrips migration and seeding pipeline.
+
+Runs the same steps as migrate_to_unified_schema.py / seed_firestore_data.py
+on a Firestore AsyncClient, keeping up to `concurrency` documents in flight
+instead of waiting on each get/set in turn. Per driver, the users/ and
+drivers/ writes are independent and are issued together with asyncio.gather.
+
+Usage:
+    python3 scripts/migrate_to_unified_schema.py --async --concurrency 200
+
+    from async_migration import run_async_migration
+    asyncio.run(run_async_migration(resolver, concurrency=200))
+"""
+
+import asyncio
+from collections import Counter
+
+from auth_cache import MAX_LOOKUP_BATCH
+from firebase_client import get_async_firestore
+from unified_schema import new_driver_data, new_user_data, new_user_profile_data
+
+DEFAULT_CONCURRENCY = 100
+
+
+class BoundedTaskPool:
+    """Run coroutines as tasks with at most `limit` running at once.
+
+    submit() waits for a free slot, so producers reading a large stream
+    never get more than `limit` documents ahead of the writes.
+    """
+
+    def __init__(self, limit=DEFAULT_CONCURRENCY):
+        self._slots = asyncio.Semaphore(limit)
+        self._tasks = set()
+
+    async def submit(self, coro):
+        await self._slots.acquire()
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._release)
+        return task
+
+    def _release(self, task):
+        self._tasks.discard(task)
+        self._slots.release()
+
+    async def join(self):
+        """Wait for every submitted task to finish."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+
+async def _achunked(async_iterable, size):
+    """Async counterpart of firestore_bulk.chunked()."""
+    chunk = []
+    async for item in async_iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def _migrate_driver(db, driver_doc, user_uid, summary):
+    """Write users/{uid} and drivers/{uid} for one legacy driver concurrently."""
+    driver_data = driver_doc.to_dict()
+    user_ref = db.collection('users').document(user_uid)
+    driver_ref = db.collection('drivers').document(user_uid)
+
+    async def write_user():
+        user_doc = await user_ref.get()
+        if user_doc.exists:
+            await user_ref.update({'userType': 'driver'})
+        else:
+            await user_ref.set(new_user_data(driver_doc.id, driver_data))
+
+    try:
+        await asyncio.gather(write_user(), driver_ref.set(new_driver_data(driver_data)))
+        summary['migrated'] += 1
+    except Exception as e:
+        summary['failed'] += 1
+        print(f"   ❌ {driver_doc.id}: {e}")
+
+
+async def migrate_drivers_async(db, resolver, concurrency=DEFAULT_CONCURRENCY):
+    """Migrate 'Drivers' → users + drivers with bounded concurrency.
+
+    Returns:
+        Counter with 'migrated', 'skipped' and 'failed'
+    """
+    print("\n" + "="*60)
+    print(f"🚗 MIGRATING DRIVERS TO NEW SCHEMA (ASYNC, {concurrency} in flight)")
+    print("="*60)
+
+    pool = BoundedTaskPool(concurrency)
+    summary = Counter()
+
+    async for chunk in _achunked(db.collection('Drivers').stream(), MAX_LOOKUP_BATCH):
+        # Auth lookups are blocking; resolve the chunk off the event loop
+        uids = await asyncio.to_thread(resolver.resolve_many, [doc.id for doc in chunk])
+        for driver_doc in chunk:
+            user_uid = uids[driver_doc.id]
+            if not user_uid:
+                summary['skipped'] += 1
+                continue
+            await pool.submit(_migrate_driver(db, driver_doc, user_uid, summary))
+
+    await pool.join()
+
+    print(f"\n📊 Migration Summary:")
+    print(f"   ✅ Migrated: {summary['migrated']} drivers")
+    print(f"   ⚠️  Skipped: {summary['skipped']} (no Auth account)")
+    if summary['failed']:
+        print(f"   ❌ Failed: {summary['failed']}")
+    return summary
+
+
+async def _create_profile(profile_ref, summary):
+    """Create one userProfiles doc; an existing profile is left untouched."""
+    from google.api_core.exceptions import AlreadyExists
+
+    try:
+        await profile_ref.create(new_user_profile_data())
+        summary['created'] += 1
+    except AlreadyExists:
+        summary['existing'] += 1
+    except Exception as e:
+        summary['failed'] += 1
+        print(f"   ❌ userProfiles/{profile_ref.id}: {e}")
+
+
+async def create_user_profiles_async(db, concurrency=DEFAULT_CONCURRENCY):
+    """Create missing userProfiles for regular users with bounded concurrency.
+
+    Uses create() instead of get() + set(): one RPC per user, and an
+    ALREADY_EXISTS error means the profile is already there.
+    """
+    print("\n" + "="*60)
+    print(f"👤 CREATING USER PROFILES (ASYNC, {concurrency} in flight)")
+    print("="*60)
+
+    pool = BoundedTaskPool(concurrency)
+    summary = Counter()
+
+    async for user_doc in db.collection('users').stream():
+        if user_doc.to_dict().get('userType', 'user') != 'user':
+            continue
+        profile_ref = db.collection('userProfiles').document(user_doc.id)
+        await pool.submit(_create_profile(profile_ref, summary))
+
+    await pool.join()
+
+    print(f"\n📊 Created {summary['created']} user profiles ({summary['existing']} already existed)")
+    return summary
+
+
+async def _upsert_driver(collection, driver_data, doc_id_field, summary):
+    from google.api_core.exceptions import AlreadyExists
+
+    doc_ref = collection.document(str(driver_data[doc_id_field]))
+    try:
+        await doc_ref.create(driver_data)
+        summary['added'] += 1
+    except AlreadyExists:
+        try:
+            await doc_ref.set(driver_data, merge=True)
+            summary['updated'] += 1
+        except Exception as e:
+            summary['failed'] += 1
+            print(f"   ❌ {doc_ref.id}: {e}")
+    except Exception as e:
+        summary['failed'] += 1
+        print(f"   ❌ {doc_ref.id}: {e}")
+
+
+async def seed_drivers_async(db, drivers, concurrency=DEFAULT_CONCURRENCY, doc_id_field='email'):
+    """Upsert legacy 'Drivers' docs concurrently (create, then merge if it exists).
+
+    Returns:
+        Counter with 'added', 'updated' and 'failed'
+    """
+    pool = BoundedTaskPool(concurrency)
+    summary = Counter()
+    collection = db.collection('Drivers')
+
+    for driver_data in drivers:
+        await pool.submit(_upsert_driver(collection, driver_data, doc_id_field, summary))
+
+    await pool.join()
+    print(f"\n📊 Drivers: {summary['added']} added, {summary['updated']} updated")
+    if summary['failed']:
+        print(f"   ❌ Failed: {summary['failed']}")
+    return summary
+
+
+async def run_async_migration(resolver, concurrency=DEFAULT_CONCURRENCY):
+    """Run the driver and user-profile steps on the shared AsyncClient.
+
+    Returns:
+        (drivers migrated, profiles created)
+    """
+    db = get_async_firestore()
+
+    print("\n📍 Step 1: Migrating drivers...")
+    drivers = await migrate_drivers_async(db, resolver, concurrency)
+
+    print("\n📍 Step 2: Creating user profiles...")
+    profiles = await create_user_profiles_async(db, concurrency)
+
+    return drivers['migrated'], profiles['created']
@@ -0,0 +1,196 @@
+"""
+Bulk Firebase Auth email → UID resolution with a persistent on-disk cache.
+
+Lookups are batched through auth.get_users() (100 identifiers per call)
+and stored in a local SQLite file, so re-runs and other scripts reuse
+resolved UIDs. Emails with no Auth account are cached too (for a shorter
+time) so skipped drivers don't cost an RPC on every run. Entries are keyed
+by Auth target (project ID plus Auth emulator host), so UIDs resolved
+against the emulator or another project are never served for production.
+
+Usage:
+    from auth_cache import AuthUidResolver
+
+    resolver = AuthUidResolver()
+    uids = resolver.resolve_many(['ahmed.khan@driver.com', 'sara.ali@driver.com'])
+    uid = resolver.resolve('ahmed.khan@driver.com')  # None if no Auth user
+
+Cache location defaults to ~/.cache/btrips/auth_uids.sqlite3
+(override with BTRIPS_AUTH_CACHE).
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from firebase_client import auth_target, get_auth
+
+# auth.get_users() accepts at most 100 identifiers per call
+MAX_LOOKUP_BATCH = 100
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    'BTRIPS_AUTH_CACHE',
+    os.path.expanduser('~/.cache/btrips/auth_uids.sqlite3'),
+)
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_NEGATIVE_TTL_SECONDS = 6 * 3600
+
+
+def _normalize(email):
+    # Firebase Auth stores emails lowercased
+    return email.strip().lower()
+
+
+def _is_valid_email(email):
+    """Same check auth.EmailIdentifier applies, so a bad ID never fails a batch."""
+    local, _, domain = email.partition('@')
+    return bool(local and domain and '@' not in domain)
+
+
+class AuthUidResolver:
+    """Resolve emails to Firebase Auth UIDs with batched RPCs and a SQLite cache.
+
+    Safe to share between threads. `target` defaults to
+    firebase_client.auth_target().
+    """
+
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 negative_ttl_seconds=DEFAULT_NEGATIVE_TTL_SECONDS, target=None):
+        self.cache_path = cache_path
+        self.target = target or auth_target()
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.rpc_count = 0
+        self.cache_hits = 0
+        self._lock = threading.Lock()
+        # Emails this resolver already looked up or counted, so a prefetch
+        # followed by resolve() isn't reported as a cache hit
+        self._seen = set()
+
+        if cache_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        with self._conn:
+            columns = [row[1] for row in self._conn.execute('PRAGMA table_info(auth_uids)')]
+            if columns and 'target' not in columns:
+                # Caches written before entries were keyed by target can't be trusted
+                self._conn.execute('DROP TABLE auth_uids')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS auth_uids ('
+                ' target TEXT NOT NULL,'
+                ' email TEXT NOT NULL,'
+                ' uid TEXT,'
+                ' resolved_at REAL NOT NULL,'
+                ' PRIMARY KEY (target, email))'
+            )
+        self.evict_expired()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def evict_expired(self):
+        """Delete cache entries older than their TTL."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'DELETE FROM auth_uids WHERE (uid IS NOT NULL AND resolved_at < ?)'
+                ' OR (uid IS NULL AND resolved_at < ?)',
+                (now - self.ttl_seconds, now - self.negative_ttl_seconds),
+            )
+
+    def forget(self, email):
+        """Drop a cached entry, e.g. after the user registers."""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM auth_uids WHERE target = ? AND email = ?',
+                               (self.target, _normalize(email)))
+
+    def resolve(self, email):
+        """Return the UID for `email`, or None if there is no Auth user."""
+        return self.resolve_many([email])[email]
+
+    def resolve_many(self, emails):
+        """Resolve a list of emails.
+
+        Returns:
+            Dict of email (as given) → UID, or None for emails with no Auth
+            user and for IDs that aren't valid emails
+        """
+        wanted = {}
+        for email in emails:
+            wanted.setdefault(_normalize(email), []).append(email)
+
+        valid = [email for email in wanted if _is_valid_email(email)]
+        resolved = self._cached(valid)
+        missing = [email for email in valid if email not in resolved]
+
+        for start in range(0, len(missing), MAX_LOOKUP_BATCH):
+            batch = missing[start:start + MAX_LOOKUP_BATCH]
+            resolved.update(self._lookup(batch))
+
+        results = {}
+        for normalized, originals in wanted.items():
+            for email in originals:
+                results[email] = resolved.get(normalized)
+        return results
+
+    def _cached(self, emails):
+        """Return unexpired cache entries for the given normalized emails."""
+        found = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(emails), 500):
+                batch = emails[start:start + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = self._conn.execute(
+                    f'SELECT email, uid, resolved_at FROM auth_uids'
+                    f' WHERE target = ? AND email IN ({placeholders})',
+                    [self.target, *batch],
+                ).fetchall()
+                for email, uid, resolved_at in rows:
+                    ttl = self.ttl_seconds if uid is not None else self.negative_ttl_seconds
+                    if now - resolved_at < ttl:
+                        found[email] = uid
+            self.cache_hits += len(found.keys() - self._seen)
+            self._seen.update(found)
+        return found
+
+    def _lookup(self, emails):
+        """Resolve up to 100 normalized emails with a single get_users() call.
+
+        If the SDK still rejects the batch (ValueError), the emails are
+        looked up one by one and the rejected ones resolve to None.
+        """
+        auth = get_auth()
+        try:
+            result = auth.get_users([auth.EmailIdentifier(email) for email in emails])
+        except ValueError:
+            if len(emails) == 1:
+                return {emails[0]: None}
+            resolved = {}
+            for email in emails:
+                resolved.update(self._lookup([email]))
+            return resolved
+
+        resolved = {email: None for email in emails}
+        for user in result.users:
+            if user.email:
+                resolved[_normalize(user.email)] = user.uid
+
+        now = time.time()
+        with self._lock, self._conn:
+            self.rpc_count += 1
+            self._seen.update(resolved)
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO auth_uids (target, email, uid, resolved_at) VALUES (?, ?, ?, ?)',
+                [(self.target, email, uid, now) for email, uid in resolved.items()],
+            )
+        return resolved
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Backfill driverLoc.geohash on every driver so radius lookups can use
+geohash range queries (see firestore_geo.py) instead of scanning.
+
+Reads only the location fields, page by page, and writes the hash in
+batches of up to 500 updates. Documents whose hash is already correct are
+not rewritten, so the job is safe to re-run; progress is checkpointed per
+collection so an interrupted run resumes where it stopped.
+
+Run:
+    python3 scripts/backfill_geohash.py
+    python3 scripts/backfill_geohash.py --collections drivers --restart
+"""
+
+import argparse
+import sys
+
+from firebase_client import get_firestore, initialize_firebase
+from firestore_bulk import BatchWriter
+from firestore_geo import encode
+from firestore_paging import DEFAULT_PAGE_SIZE, iter_pages
+from migration_checkpoint import FileCheckpointStore
+
+DEFAULT_COLLECTIONS = ['Drivers', 'drivers']
+DEFAULT_CHECKPOINT_PATH = 'geohash_checkpoint.json'
+
+
+def geohash_updates(collection_name, data):
+    """Field updates needed to bring one driver's geohash up to date.
+
+    The unified drivers collection also keeps a top-level `geohash`, as
+    the app's DriverModel.toFirestore() writes it.
+
+    Returns:
+        Dict of field path → value ({} if already current), or None if the
+        document has no location
+    """
+    driver_loc = data.get('driverLoc') or {}
+    geopoint = driver_loc.get('geopoint')
+    if geopoint is None:
+        return None
+
+    geohash = encode(geopoint.latitude, geopoint.longitude)
+    updates = {}
+    if driver_loc.get('geohash') != geohash:
+        updates['driverLoc.geohash'] = geohash
+    if collection_name == 'drivers' and data.get('geohash') != geohash:
+        updates['geohash'] = geohash
+    return updates
+
+
+def backfill_collection(db, collection_name, checkpoint=None, page_size=DEFAULT_PAGE_SIZE):
+    """Write missing or stale geohashes for one collection.
+
+    Returns:
+        Dict with 'updated', 'current' and 'no_location' counts
+    """
+    print("\n" + "="*60)
+    print(f"📍 BACKFILLING GEOHASHES: {collection_name}")
+    print("="*60)
+
+    state = checkpoint.get(collection_name) if checkpoint else {}
+    counts = {key: state.get(key, 0) for key in ('updated', 'current', 'no_location')}
+    if state.get('done'):
+        print("   ⏭️  Already completed in a previous run")
+        return counts
+    if state.get('cursor'):
+        print(f"   ↩️  Resuming after document {state['cursor']}")
+
+    collection = db.collection(collection_name)
+    pages = iter_pages(collection, page_size, state.get('cursor'), field_paths=['driverLoc', 'geohash'])
+    for page in pages:
+        with BatchWriter(db) as writer:
+            for snapshot in page:
+                updates = geohash_updates(collection_name, snapshot.to_dict() or {})
+                if updates is None:
+                    counts['no_location'] += 1
+                elif updates:
+                    writer.update(collection.document(snapshot.id), updates)
+                    counts['updated'] += 1
+                else:
+                    counts['current'] += 1
+
+        if checkpoint:
+            checkpoint.save(collection_name, page[-1].id, **counts)
+        print(f"   ✍️  {counts['updated']} updated, {counts['current']} already current")
+
+    if checkpoint:
+        checkpoint.complete(collection_name, **counts)
+
+    print(f"\n📊 {collection_name}: {counts['updated']} updated, {counts['current']} already current, "
+          f"{counts['no_location']} without a location")
+    return counts
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill driverLoc.geohash on driver documents")
+    parser.add_argument('--collections', nargs='+', default=DEFAULT_COLLECTIONS,
+                        help="Collections to backfill (default: Drivers drivers)")
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f"Documents read per page (default: {DEFAULT_PAGE_SIZE})")
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT_PATH,
+                        help=f"Checkpoint file for resuming (default: {DEFAULT_CHECKPOINT_PATH})")
+    parser.add_argument('--restart', action='store_true',
+                        help="Ignore any saved checkpoint and start from the first document")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print("\n" + "="*60)
+    print("🌐 BTRIPS DRIVER GEOHASH BACKFILL")
+    print("="*60)
+
+    if not initialize_firebase():
+        sys.exit(1)
+    db = get_firestore()
+
+    checkpoint = FileCheckpointStore(args.checkpoint)
+    if args.restart:
+        checkpoint.reset()
+
+    for collection_name in args.collections:
+        backfill_collection(db, collection_name, checkpoint, args.page_size)
+
+    # Every collection finished: the next run should start fresh
+    checkpoint.reset()
+
+    print("\n" + "="*60)
+    print("✨ BACKFILL COMPLETE")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
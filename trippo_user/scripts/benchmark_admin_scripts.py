@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Benchmark the BTrips admin scripts against the local Firebase emulators.
+
+For each scale (number of legacy drivers) the emulators are wiped, Auth
+accounts and regular users are generated with synthetic_data.py, and then
+these steps are timed:
+
+    seed_drivers                            (seed_firestore_data.py)
+    migrate_drivers_to_new_schema           (migrate_to_unified_schema.py)
+    create_user_profiles_for_existing_users (migrate_to_unified_schema.py)
+    verify_migration                        (migrate_to_unified_schema.py)
+
+Each step reports wall time, docs/sec, Firestore RPCs, documents read and
+written, Auth calls and the process's peak RSS, all written to a JSON file
+so runs can be compared before and after a change.
+
+This script refuses to run without FIRESTORE_EMULATOR_HOST and
+FIREBASE_AUTH_EMULATOR_HOST: it deletes all emulator data between scales.
+
+Run:
+    firebase emulators:exec --only firestore,auth --project btrips-42089 \\
+        "python3 scripts/benchmark_admin_scripts.py --scales 1000,10000,100000"
+"""
+
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import urllib.request
+
+from auth_cache import AuthUidResolver
+from firebase_client import PROJECT_ID, get_auth, get_firestore, initialize_firebase
+from firestore_bulk import BatchWriter, chunked
+from firestore_metrics import RpcMetrics
+from migrate_to_unified_schema import (
+    create_user_profiles_for_existing_users,
+    migrate_drivers_to_new_schema,
+    verify_migration,
+)
+from seed_firestore_data import seed_drivers
+from synthetic_data import SyntheticFleet, driver_email, driver_uid, rider_uid
+
+DEFAULT_SCALES = [1000, 10000, 100000]
+DEFAULT_OUTPUT = 'benchmark_results.json'
+
+# auth.import_users() accepts at most 1000 accounts per call
+MAX_IMPORT_BATCH = 1000
+
+
+def require_emulators():
+    """Exit unless both the Firestore and Auth emulators are configured."""
+    missing = [name for name in ('FIRESTORE_EMULATOR_HOST', 'FIREBASE_AUTH_EMULATOR_HOST')
+               if not os.environ.get(name)]
+    if missing:
+        print(f"❌ {', '.join(missing)} not set")
+        print("\n📋 This benchmark wipes all data between runs and only runs against the emulators:")
+        print("   firebase emulators:exec --only firestore,auth --project btrips-42089 \\")
+        print('       "python3 scripts/benchmark_admin_scripts.py"')
+        sys.exit(1)
+
+
+def _emulator_delete(host, path):
+    request = urllib.request.Request(f"http://{host}{path}", method='DELETE')
+    with urllib.request.urlopen(request) as response:
+        response.read()
+
+
+def clear_emulators(project_id):
+    """Delete every Firestore document and Auth account in the emulators."""
+    _emulator_delete(os.environ['FIRESTORE_EMULATOR_HOST'],
+                     f"/emulator/v1/projects/{project_id}/databases/(default)/documents")
+    _emulator_delete(os.environ['FIREBASE_AUTH_EMULATOR_HOST'],
+                     f"/emulator/v1/projects/{project_id}/accounts")
+
+
+def create_auth_accounts(count):
+    """Create Auth accounts for every synthetic driver with auth.import_users()."""
+    auth = get_auth()
+    records = (auth.ImportUserRecord(uid=driver_uid(index), email=driver_email(index))
+               for index in range(count))
+    for chunk in chunked(records, MAX_IMPORT_BATCH):
+        result = auth.import_users(chunk)
+        if result.failure_count:
+            raise RuntimeError(f"{result.failure_count} Auth imports failed: {result.errors[0].reason}")
+
+
+def create_regular_users(db, fleet):
+    """Create the fleet's regular users/ documents for the userProfiles step."""
+    with BatchWriter(db) as writer:
+        for index in range(fleet.rider_count):
+            writer.set(db.collection('users').document(rider_uid(index)), fleet.rider(index))
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and KiB on Linux
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def run_step(name, fn, documents, metrics, verbose=False):
+    """Time one step and collect its RPC counts.
+
+    Args:
+        name: Step name for the report
+        fn: Zero-argument callable running the step
+        documents: Documents the step processes (for docs/sec), or None
+        metrics: RpcMetrics instance
+        verbose: Show the step's own output instead of discarding it
+    """
+    print(f"   ⏱️  {name}...", end='', flush=True)
+    metrics.reset()
+    output = sys.stdout if verbose else io.StringIO()
+
+    start = time.perf_counter()
+    with metrics.instrument(), redirect_stdout(output):
+        fn()
+    seconds = time.perf_counter() - start
+
+    result = {
+        'step': name,
+        'seconds': round(seconds, 3),
+        'documents': documents,
+        'docs_per_sec': round(documents / seconds, 1) if documents and seconds else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+    result.update(metrics.snapshot())
+    rate = f", {result['docs_per_sec']} docs/sec" if result['docs_per_sec'] else ""
+    print(f" {result['seconds']}s{rate}, {result['rpc_total']} RPCs")
+    return result
+
+
+def benchmark_scale(db, scale, users, seed, metrics, verbose=False):
+    """Reset the emulators and benchmark every step at one scale."""
+    print(f"\n📏 Scale: {scale} drivers, {users} users")
+    clear_emulators(db.project)
+
+    print("   🔧 Creating Auth accounts and users...")
+    fleet = SyntheticFleet(seed=seed, drivers=scale, riders=users)
+    create_auth_accounts(scale)
+    create_regular_users(db, fleet)
+    drivers = list(fleet.legacy_drivers())
+
+    # A fresh UID cache per scale so every run pays for its Auth lookups
+    with tempfile.TemporaryDirectory() as tmp, \
+            AuthUidResolver(cache_path=os.path.join(tmp, 'auth_uids.sqlite3')) as resolver:
+        steps = [
+            run_step('seed_drivers', lambda: seed_drivers(db, drivers), scale, metrics, verbose),
+            run_step('migrate_drivers_to_new_schema',
+                     lambda: migrate_drivers_to_new_schema(db, resolver), scale, metrics, verbose),
+            run_step('create_user_profiles_for_existing_users',
+                     lambda: create_user_profiles_for_existing_users(db), users, metrics, verbose),
+            run_step('verify_migration', lambda: verify_migration(db), None, metrics, verbose),
+        ]
+
+    return {'scale': scale, 'drivers': scale, 'users': users, 'steps': steps}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the admin scripts against the Firebase emulators")
+    parser.add_argument('--scales', default=','.join(str(s) for s in DEFAULT_SCALES),
+                        help="Comma-separated driver counts (default: 1000,10000,100000)")
+    parser.add_argument('--users', type=int, default=None,
+                        help="Regular users per scale (default: same as the driver count)")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT,
+                        help=f"JSON report path (default: {DEFAULT_OUTPUT})")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed for synthetic data")
+    parser.add_argument('--verbose', action='store_true', help="Show each step's own output")
+    args = parser.parse_args(argv)
+    args.scales = [int(s) for s in args.scales.split(',') if s]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    require_emulators()
+
+    print("\n" + "="*60)
+    print("⏱️  BTRIPS ADMIN SCRIPT BENCHMARK")
+    print("="*60)
+
+    if not initialize_firebase():
+        sys.exit(1)
+    db = get_firestore()
+    metrics = RpcMetrics()
+
+    results = []
+    for scale in args.scales:
+        users = args.users if args.users is not None else scale
+        results.append(benchmark_scale(db, scale, users, args.seed, metrics, args.verbose))
+
+    report = {
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'project_id': db.project or PROJECT_ID,
+        'firestore_emulator': os.environ['FIRESTORE_EMULATOR_HOST'],
+        'auth_emulator': os.environ['FIREBASE_AUTH_EMULATOR_HOST'],
+        'python': platform.python_version(),
+        'seed': args.seed,
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print("\n" + "="*60)
+    print("✨ BENCHMARK COMPLETE")
+    print("="*60)
+    print(f"📄 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
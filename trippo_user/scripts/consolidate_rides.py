@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Move the old per-user ride collections into rideRequests / rideHistory.
+
+Before the unified schema, each user's rides lived in a top-level
+collection named after their email (see
+seed_firestore_data.seed_test_user_rides), with
+OriginLat/OriginLng/destinationLat/... fields. This step rewrites every
+such ride in the unified ride shape, so ride history is one indexed query
+(rideHistory where userId == uid) instead of thousands of collections.
+
+Collections are processed in parallel on a worker pool; each worker pages
+through its collection, resolves emails to UIDs in bulk and writes in
+batches of up to 500. Progress is checkpointed per collection, and target
+document IDs are derived from the source path, so re-runs never duplicate
+rides. Source collections are kept unless --delete-source is given.
+
+Run:
+    python3 scripts/consolidate_rides.py
+    python3 scripts/consolidate_rides.py --workers 16 --delete-source
+    python3 scripts/migrate_to_unified_schema.py --consolidate-rides
+"""
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import argparse
+import hashlib
+import sys
+
+from auth_cache import DEFAULT_CACHE_PATH, AuthUidResolver
+from fares import estimate_trip
+from firebase_client import get_firestore, initialize_firebase
+from firestore_bulk import BatchWriter
+from firestore_counts import count_documents
+from firestore_paging import DEFAULT_PAGE_SIZE, iter_pages
+from migration_checkpoint import FileCheckpointStore
+
+# Separate from migration_checkpoint.json, so resetting it never touches the
+# drivers / userProfiles progress of an interrupted migration
+DEFAULT_CHECKPOINT_PATH = 'rides_checkpoint.json'
+DEFAULT_WORKERS = 8
+
+HISTORY_STATUSES = ('completed', 'cancelled')
+
+CHECKPOINT_PREFIX = 'rides:'
+
+
+def list_user_ride_collections(db):
+    """Old per-user ride collections, named after the user's email."""
+    return [collection.id for collection in db.collections() if '@' in collection.id]
+
+
+def count_user_rides(db, collection_names, workers=DEFAULT_WORKERS):
+    """Count several collections concurrently (one count() RPC each).
+
+    Returns:
+        Dict of collection name → document count, in the given order
+    """
+    if not collection_names:
+        return {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        counts = executor.map(lambda name: count_documents(db, name), collection_names)
+        return dict(zip(collection_names, counts))
+
+
+def unified_ride_id(collection_name, doc_id):
+    """Stable target ID for a legacy ride, so re-runs overwrite instead of duplicating."""
+    return hashlib.sha1(f"{collection_name}/{doc_id}".encode()).hexdigest()[:20]
+
+
+def unified_ride_data(collection_name, doc_id, ride, user_uid, driver_uid):
+    """Map a legacy per-user ride to the rideRequests / rideHistory schema.
+
+    Legacy rides are finished trips, so they become completed unless they
+    carry their own status.
+    """
+    from google.cloud.firestore import GeoPoint
+
+    pickup = (ride['OriginLat'], ride['OriginLng'])
+    dropoff = (ride['destinationLat'], ride['destinationLng'])
+    vehicle_type = ride.get('vehicleType', 'Sedan')
+    distance, duration, fare = estimate_trip(*pickup, *dropoff, vehicle_type)
+    status = ride.get('status', 'completed')
+    ride_time = ride.get('time')
+
+    return {
+        'userId': user_uid,
+        'driverId': driver_uid,
+        'userEmail': ride.get('userEmail') or collection_name,
+        'driverEmail': ride.get('driverEmail'),
+        'status': status,
+        'pickupLocation': GeoPoint(*pickup),
+        'pickupAddress': ride.get('OriginAddress', ''),
+        'dropoffLocation': GeoPoint(*dropoff),
+        'dropoffAddress': ride.get('destinationAddress', ''),
+        'scheduledTime': None,
+        'requestedAt': ride_time,
+        'acceptedAt': ride_time if driver_uid else None,
+        'startedAt': ride_time if status in ('ongoing', 'completed') else None,
+        'completedAt': ride_time if status == 'completed' else None,
+        'vehicleType': vehicle_type,
+        'fare': ride.get('fare', fare),
+        'distance': ride.get('distance', distance),
+        'duration': ride.get('duration', duration),
+        'route': None,
+        'legacySource': f"{collection_name}/{doc_id}",
+    }
+
+
+def consolidate_collection(db, collection_name, resolver, checkpoint=None,
+                           page_size=DEFAULT_PAGE_SIZE, delete_source=False):
+    """Move one per-user collection into rideRequests / rideHistory.
+
+    Each page's writes (and deletes) are committed before its checkpoint is
+    saved. A ride's delete is queued after its copy, so a source document
+    is never removed before its unified copy exists.
+
+    Returns:
+        Counter with 'moved' and 'skipped'
+    """
+    step = CHECKPOINT_PREFIX + collection_name
+    state = checkpoint.get(step) if checkpoint else {}
+    summary = Counter({key: state.get(key, 0) for key in ('moved', 'skipped')})
+    if state.get('done'):
+        return summary
+
+    source = db.collection(collection_name)
+    for page in iter_pages(source, page_size, state.get('cursor')):
+        rides = [(snapshot.id, snapshot.to_dict() or {}) for snapshot in page]
+        emails = {collection_name}
+        for _, ride in rides:
+            emails.update(e for e in (ride.get('userEmail'), ride.get('driverEmail')) if e)
+        uids = resolver.resolve_many(sorted(emails))
+
+        with BatchWriter(db) as writer:
+            for doc_id, ride in rides:
+                if any(ride.get(f) is None for f in ('OriginLat', 'OriginLng', 'destinationLat', 'destinationLng')):
+                    summary['skipped'] += 1
+                    continue
+                user_email = ride.get('userEmail') or collection_name
+                data = unified_ride_data(collection_name, doc_id, ride,
+                                         uids.get(user_email), uids.get(ride.get('driverEmail')))
+                target = 'rideHistory' if data['status'] in HISTORY_STATUSES else 'rideRequests'
+                writer.set(db.collection(target).document(unified_ride_id(collection_name, doc_id)), data)
+                if delete_source:
+                    writer.delete(source.document(doc_id))
+                summary['moved'] += 1
+
+        if checkpoint:
+            checkpoint.save(step, page[-1].id, **summary)
+
+    if checkpoint:
+        checkpoint.complete(step, **summary)
+    return summary
+
+
+def consolidate_user_rides(db, resolver=None, checkpoint=None, workers=DEFAULT_WORKERS,
+                           page_size=DEFAULT_PAGE_SIZE, delete_source=False):
+    """Move every per-user ride collection, several collections at a time.
+
+    Returns:
+        Counter with 'moved', 'skipped', 'collections' and 'failed'
+    """
+    print("\n" + "="*60)
+    print(f"🚕 CONSOLIDATING PER-USER RIDE COLLECTIONS ({workers} workers)")
+    print("="*60)
+
+    resolver = resolver or AuthUidResolver()
+    names = list_user_ride_collections(db)
+    print(f"   Found {len(names)} per-user ride collection(s)")
+
+    total = Counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(consolidate_collection, db, name, resolver, checkpoint,
+                            page_size, delete_source): name
+            for name in names
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                total['failed'] += 1
+                print(f"   ❌ {name}: {e}")
+                continue
+            total.update(summary)
+            total['collections'] += 1
+            print(f"   ✅ {name}: {summary['moved']} moved, {summary['skipped']} skipped "
+                  f"({total['collections']}/{len(names)})")
+
+    print(f"\n📊 Rides: {total['moved']} moved from {total['collections']} collection(s), "
+          f"{total['skipped']} without coordinates")
+    if total['failed']:
+        print(f"   ❌ {total['failed']} collection(s) failed - re-run to resume them")
+    return total
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Move per-user ride collections into rideRequests / rideHistory")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f"Collections processed in parallel (default: {DEFAULT_WORKERS})")
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f"Documents read per page (default: {DEFAULT_PAGE_SIZE})")
+    parser.add_argument('--delete-source', action='store_true',
+                        help="Delete each legacy ride once its unified copy is written")
+    parser.add_argument('--auth-cache', default=DEFAULT_CACHE_PATH,
+                        help=f"SQLite email→UID cache (default: {DEFAULT_CACHE_PATH})")
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT_PATH,
+                        help=f"Checkpoint file for resuming (default: {DEFAULT_CHECKPOINT_PATH})")
+    parser.add_argument('--restart', action='store_true',
+                        help="Ignore saved progress and start every collection over")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if not initialize_firebase():
+        sys.exit(1)
+    db = get_firestore()
+
+    checkpoint = FileCheckpointStore(args.checkpoint)
+    if args.restart:
+        checkpoint.reset()
+
+    total = consolidate_user_rides(db, AuthUidResolver(args.auth_cache), checkpoint,
+                                   args.workers, args.page_size, args.delete_source)
+    if not total['failed']:
+        checkpoint.reset()
+
+
+if __name__ == "__main__":
+    main()
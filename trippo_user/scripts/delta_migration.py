@@ -0,0 +1,165 @@
+"""
+Incremental driver migration: only legacy 'Drivers' documents changed
+since the last run are copied to users/{uid} + drivers/{uid}.
+
+The high-water mark lives in _migrations/drivers_delta:
+
+    updatedAtMark   newest `updatedAt` value synced
+    updateTimeMark  server time the last full scan started
+
+Normal runs query `updatedAt >= updatedAtMark` ordered by updatedAt, so
+they read only changed drivers and the mark advances after every page.
+`updatedAt` must be a server timestamp, so values grow in commit order.
+Writers that don't stamp `updatedAt` are caught with --scan, which reads
+the whole collection and processes documents whose Firestore update time
+is newer than updateTimeMark. The first run is always a full scan.
+
+Existing drivers/{uid} documents are merged, not replaced: only the fields
+mapped from the legacy document are written, so rating, totalRides,
+earnings and the other fields the app maintains are kept. Re-processing a
+document is harmless, which is why the mark is compared with >=.
+
+Deleted legacy drivers are not detected.
+
+Usage:
+    python3 scripts/migrate_to_unified_schema.py --incremental
+    python3 scripts/migrate_to_unified_schema.py --incremental --scan
+"""
+
+from auth_cache import AuthUidResolver
+from firestore_bulk import BatchWriter, find_missing
+from firestore_paging import DEFAULT_PAGE_SIZE, iter_pages
+from unified_schema import new_driver_data, new_user_data
+from migration_checkpoint import CHECKPOINT_COLLECTION
+
+SYNC_DOC = 'drivers_delta'
+UPDATED_AT_FIELD = 'updatedAt'
+
+# Fields the app maintains on drivers/{uid}; a delta run never overwrites them
+APP_OWNED_FIELDS = ('rating', 'totalRides', 'earnings', 'licenseNumber', 'vehicleRegistration', 'isVerified')
+
+
+def delta_driver_fields(driver_data):
+    """Fields of new_driver_data() that come from the legacy document."""
+    data = new_driver_data(driver_data)
+    for field in APP_OWNED_FIELDS:
+        data.pop(field, None)
+    return data
+
+
+def _newest(current, value):
+    if value is None:
+        return current
+    return value if current is None or value > current else current
+
+
+def sync_drivers(db, snapshots, resolver, known_uids=None):
+    """Write users + drivers for changed legacy driver snapshots.
+
+    Args:
+        db: Firestore client
+        snapshots: Changed 'Drivers' snapshots
+        resolver: AuthUidResolver mapping driver emails to UIDs
+        known_uids: Optional set of UIDs already migrated. Their drivers/{uid}
+            is merged without an existence check or users/{uid} write; the
+            set is updated with newly migrated UIDs.
+
+    Returns:
+        (migrated, skipped)
+    """
+    uids = resolver.resolve_many([snapshot.id for snapshot in snapshots])
+    resolved = [(snapshot, uids[snapshot.id]) for snapshot in snapshots if uids[snapshot.id]]
+    if not resolved:
+        return 0, len(snapshots)
+
+    known = known_uids if known_uids is not None else set()
+    new = [(snapshot, uid) for snapshot, uid in resolved if uid not in known]
+    user_refs = {uid: db.collection('users').document(uid) for _, uid in new}
+    driver_refs = {uid: db.collection('drivers').document(uid) for _, uid in resolved}
+    missing = {ref.path for ref in find_missing(db, list(user_refs.values())
+                                                + [driver_refs[uid] for _, uid in new])}
+
+    with BatchWriter(db) as writer:
+        for snapshot, uid in resolved:
+            driver_data = snapshot.to_dict() or {}
+            user_ref, driver_ref = user_refs.get(uid), driver_refs[uid]
+            if user_ref is not None:
+                if user_ref.path in missing:
+                    writer.set(user_ref, new_user_data(snapshot.id, driver_data))
+                else:
+                    writer.update(user_ref, {'userType': 'driver'})
+
+            if driver_ref.path in missing:
+                writer.set(driver_ref, new_driver_data(driver_data))
+            else:
+                writer.set(driver_ref, delta_driver_fields(driver_data), merge=True)
+
+    if known_uids is not None:
+        known_uids.update(uid for _, uid in new)
+    return len(resolved), len(snapshots) - len(resolved)
+
+
+def migrate_drivers_incremental(db, resolver=None, page_size=DEFAULT_PAGE_SIZE, scan=False):
+    """Migrate legacy drivers changed since the last incremental run.
+
+    Returns:
+        Number of migrated drivers
+    """
+    from google.cloud.firestore import SERVER_TIMESTAMP
+    from google.cloud.firestore_v1.base_query import FieldFilter
+
+    print("\n" + "="*60)
+    print("🔁 INCREMENTAL DRIVER MIGRATION")
+    print("="*60)
+
+    resolver = resolver or AuthUidResolver()
+    sync_ref = db.collection(CHECKPOINT_COLLECTION).document(SYNC_DOC)
+    state = sync_ref.get().to_dict() or {}
+    field_mark = state.get('updatedAtMark')
+    time_mark = state.get('updateTimeMark')
+    scan = scan or time_mark is None
+
+    drivers = db.collection('Drivers')
+    if scan:
+        print(f"   🔎 Full scan, documents updated after {time_mark or 'the beginning'}")
+        pages = iter_pages(drivers, page_size)
+    else:
+        print(f"   ⏩ Drivers with {UPDATED_AT_FIELD} >= {field_mark}")
+        query = drivers
+        if field_mark is not None:
+            query = query.where(filter=FieldFilter(UPDATED_AT_FIELD, '>=', field_mark))
+        # Ordering by the field also leaves out documents that don't have it
+        pages = iter_pages(query, page_size, order_by=UPDATED_AT_FIELD)
+
+    migrated = skipped = unchanged = 0
+    scan_started = None
+    for page in pages:
+        # Changes committed after the first read are picked up next run
+        scan_started = scan_started or page[0].read_time
+        changed = page
+        if scan:
+            changed = [s for s in page if time_mark is None or s.update_time > time_mark]
+            unchanged += len(page) - len(changed)
+        if changed:
+            page_migrated, page_skipped = sync_drivers(db, changed, resolver)
+            migrated += page_migrated
+            skipped += page_skipped
+
+        if not scan:
+            # Pages arrive in updatedAt order, so everything up to here is synced
+            for snapshot in page:
+                field_mark = _newest(field_mark, (snapshot.to_dict() or {}).get(UPDATED_AT_FIELD))
+            sync_ref.set({'updatedAtMark': field_mark, 'lastRunAt': SERVER_TIMESTAMP}, merge=True)
+
+    update = {'lastRunAt': SERVER_TIMESTAMP}
+    if scan and scan_started:
+        # A scan saw every change committed before it started, so both marks move there
+        update.update({'updatedAtMark': scan_started, 'updateTimeMark': scan_started})
+    sync_ref.set(update, merge=True)
+
+    print(f"\n📊 Incremental Summary:")
+    print(f"   ✅ Migrated: {migrated} changed drivers")
+    print(f"   ⚠️  Skipped: {skipped} (no Auth account)")
+    if scan:
+        print(f"   💤 Unchanged: {unchanged}")
+    return migrated
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+In-memory nearest-driver index for offline matching analysis.
+
+Loads one snapshot of driver locations into NumPy arrays partitioned by
+(carType, driverStatus) and answers batched k-nearest and radius queries
+for many pickups at once. Capacity-planning questions ("nearest idle SUV
+for each of these 2M pickups") run in seconds instead of one Firestore
+query per pickup.
+
+Points are stored as unit vectors on the sphere. Straight-line (chord)
+distance between unit vectors orders points exactly like great-circle
+distance, so a KD-tree over (x, y, z) gives exact haversine neighbours:
+    great-circle km = 2R * asin(chord / 2)
+
+Requires NumPy; uses scipy's cKDTree when installed and falls back to a
+chunked brute-force search otherwise (fine up to a few thousand drivers).
+
+Usage:
+    from driver_index import DriverIndex, load_pickups
+
+    index = DriverIndex.from_firestore(db)                      # drivers/
+    lats, lngs, types = load_pickups(db)                        # pending rideRequests
+    km, ids = index.nearest(lats, lngs, k=3, car_type='SUV')    # shape (n, 3)
+    counts = index.count_within(lats, lngs, 5.0)                # idle drivers within 5 km
+
+    python3 scripts/driver_index.py --radius-km 5 --k 3
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from firestore_paging import iter_documents
+
+EARTH_RADIUS_KM = 6371.0
+
+# Pickup-by-driver distance matrix entries per brute-force block
+BRUTE_FORCE_BLOCK = 4_000_000
+
+
+def to_unit_vectors(lats, lngs):
+    """(n, 3) unit vectors for arrays of latitudes / longitudes in degrees."""
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lng = np.radians(np.asarray(lngs, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)))
+
+
+def chord_to_km(chord):
+    """Great-circle km for unit-sphere chord lengths (inf stays inf)."""
+    chord = np.asarray(chord, dtype=np.float64)
+    km = 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.nan_to_num(chord / 2, posinf=1.0), 0.0, 1.0))
+    return np.where(np.isfinite(chord), km, np.inf)
+
+
+def km_to_chord(km):
+    return 2 * np.sin(np.minimum(km / EARTH_RADIUS_KM, np.pi) / 2)
+
+
+def _kdtree(points):
+    """scipy cKDTree over `points`, or None if scipy isn't installed."""
+    try:
+        from scipy.spatial import cKDTree
+    except ImportError:
+        return None
+    return cKDTree(points)
+
+
+def _code(categories, value):
+    """Position of `value` in sorted `categories`, or -1 if absent."""
+    position = np.searchsorted(categories, value)
+    if position < len(categories) and categories[position] == value:
+        return position
+    return -1
+
+
+class _Partition:
+    """Unit vectors and positions (into DriverIndex.ids) for one driver subset."""
+
+    def __init__(self, points, positions):
+        self.points = points
+        self.positions = positions
+        self.tree = _kdtree(points) if len(points) else None
+
+    def __len__(self):
+        return len(self.positions)
+
+    def nearest(self, queries, k):
+        """Chord distances and partition-local indices, shape (n, k).
+
+        Missing neighbours (fewer than k drivers) have distance inf and
+        index len(self).
+        """
+        n = len(queries)
+        if not len(self):
+            return np.full((n, k), np.inf), np.full((n, k), 0, dtype=np.intp)
+        if self.tree is not None:
+            chord, local = self.tree.query(queries, k=k, workers=-1)
+            return chord.reshape(n, k), local.reshape(n, k)
+        return self._brute_nearest(queries, k)
+
+    def _brute_nearest(self, queries, k):
+        size = len(self)
+        kk = min(k, size)
+        chord = np.full((len(queries), k), np.inf)
+        local = np.full((len(queries), k), size, dtype=np.intp)
+        block = max(1, BRUTE_FORCE_BLOCK // size)
+        for start in range(0, len(queries), block):
+            batch = queries[start:start + block]
+            # For unit vectors the largest dot products are the nearest points
+            dots = batch @ self.points.T
+            top = np.argpartition(-dots, kk - 1, axis=1)[:, :kk]
+            # Exact chords for the k winners (2 - 2a.b loses precision at short range)
+            top_chord = np.linalg.norm(self.points[top] - batch[:, None, :], axis=2)
+            order = np.argsort(top_chord, axis=1)
+            chord[start:start + block, :kk] = np.take_along_axis(top_chord, order, axis=1)
+            local[start:start + block, :kk] = np.take_along_axis(top, order, axis=1)
+        return chord, local
+
+    def count_within(self, queries, chord_radius):
+        if not len(self):
+            return np.zeros(len(queries), dtype=np.intp)
+        if self.tree is not None:
+            return np.asarray(self.tree.query_ball_point(queries, chord_radius, return_length=True, workers=-1))
+        min_dot = 1 - chord_radius ** 2 / 2
+        block = max(1, BRUTE_FORCE_BLOCK // len(self))
+        return np.concatenate([
+            (queries[start:start + block] @ self.points.T >= min_dot).sum(axis=1)
+            for start in range(0, len(queries), block)
+        ])
+
+    def within(self, queries, chord_radius):
+        if not len(self):
+            return [np.empty(0, dtype=np.intp) for _ in range(len(queries))]
+        if self.tree is not None:
+            return [np.asarray(hits, dtype=np.intp)
+                    for hits in self.tree.query_ball_point(queries, chord_radius, workers=-1)]
+        min_dot = 1 - chord_radius ** 2 / 2
+        return [np.flatnonzero(self.points @ query >= min_dot) for query in queries]
+
+
+class DriverIndex:
+    """Spatial index over a driver snapshot, partitioned by car type and status.
+
+    Args:
+        ids: Driver document IDs
+        lats, lngs: Driver locations in degrees
+        car_types: carType per driver
+        statuses: driverStatus per driver
+    """
+
+    def __init__(self, ids, lats, lngs, car_types, statuses):
+        self.ids = np.asarray(ids, dtype=object)
+        self.points = to_unit_vectors(lats, lngs)
+        # Categorical codes keep partitioning cheap for large fleets
+        self.car_types, self._type_codes = np.unique(np.asarray(car_types, dtype=str), return_inverse=True)
+        self.statuses, self._status_codes = np.unique(np.asarray(statuses, dtype=str), return_inverse=True)
+        self._partitions = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_records(cls, records):
+        """Build from an iterable of (id, lat, lng, car_type, status) tuples."""
+        columns = list(zip(*records)) or [[], [], [], [], []]
+        return cls(*columns)
+
+    @classmethod
+    def from_firestore(cls, db, collection_name='drivers'):
+        """Snapshot driver locations from Firestore, reading only the needed fields.
+
+        Legacy 'Drivers' documents use 'Car Type' instead of carType.
+        """
+        type_field = 'Car Type' if collection_name == 'Drivers' else 'carType'
+        records = []
+        for doc_id, data in iter_documents(db.collection(collection_name),
+                                           ['driverLoc', type_field, 'driverStatus']):
+            geopoint = (data.get('driverLoc') or {}).get('geopoint')
+            if geopoint is None:
+                continue
+            records.append((doc_id, geopoint.latitude, geopoint.longitude,
+                            data.get(type_field, ''), data.get('driverStatus', 'Offline')))
+        return cls.from_records(records)
+
+    def partition(self, car_type=None, status='Idle'):
+        """Drivers matching car_type and status (None matches any)."""
+        key = (car_type, status)
+        if key not in self._partitions:
+            mask = np.ones(len(self), dtype=bool)
+            if car_type is not None:
+                mask &= self._type_codes == _code(self.car_types, car_type)
+            if status is not None:
+                mask &= self._status_codes == _code(self.statuses, status)
+            positions = np.flatnonzero(mask)
+            self._partitions[key] = _Partition(self.points[positions], positions)
+        return self._partitions[key]
+
+    def nearest(self, lats, lngs, k=1, car_type=None, status='Idle'):
+        """k nearest matching drivers for each pickup.
+
+        Returns:
+            (distances in km, driver IDs), both shape (n, k), nearest first;
+            missing neighbours are inf / None
+        """
+        part = self.partition(car_type, status)
+        chord, local = part.nearest(to_unit_vectors(lats, lngs), k)
+        ids = np.empty(local.shape, dtype=object)
+        found = np.isfinite(chord)
+        ids[found] = self.ids[part.positions[local[found]]]
+        return chord_to_km(chord), ids
+
+    def nearest_by_type(self, lats, lngs, vehicle_types, k=1, status='Idle'):
+        """Like nearest(), but each pickup only matches its own vehicle type."""
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        types, inverse = np.unique(np.asarray(vehicle_types, dtype=str), return_inverse=True)
+        km = np.full((len(lats), k), np.inf)
+        ids = np.empty((len(lats), k), dtype=object)
+        for code, vehicle_type in enumerate(types):
+            rows = np.flatnonzero(inverse == code)
+            km[rows], ids[rows] = self.nearest(lats[rows], lngs[rows], k, vehicle_type, status)
+        return km, ids
+
+    def count_within(self, lats, lngs, radius_km, car_type=None, status='Idle'):
+        """Number of matching drivers within radius_km of each pickup."""
+        part = self.partition(car_type, status)
+        return part.count_within(to_unit_vectors(lats, lngs), km_to_chord(radius_km))
+
+    def within(self, lats, lngs, radius_km, car_type=None, status='Idle'):
+        """Driver IDs within radius_km of each pickup (one array per pickup)."""
+        part = self.partition(car_type, status)
+        hits = part.within(to_unit_vectors(lats, lngs), km_to_chord(radius_km))
+        return [self.ids[part.positions[local]] for local in hits]
+
+
+def load_pickups(db, collection_name='rideRequests', status='pending'):
+    """Pickup coordinates and vehicle types from a ride collection.
+
+    Returns:
+        (lats, lngs, vehicle_types) NumPy arrays
+    """
+    from firestore_counts import build_query
+
+    query = build_query(db, collection_name, [('status', '==', status)] if status else None)
+    lats, lngs, types = [], [], []
+    for _, ride in iter_documents(query, ['pickupLocation', 'vehicleType']):
+        pickup = ride.get('pickupLocation')
+        if pickup is None:
+            continue
+        lats.append(pickup.latitude)
+        lngs.append(pickup.longitude)
+        types.append(ride.get('vehicleType') or 'Sedan')
+    return np.array(lats), np.array(lngs), np.array(types, dtype=str)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Nearest idle driver report for pending pickups")
+    parser.add_argument('--drivers', default='drivers', help="Driver collection (default: drivers)")
+    parser.add_argument('--rides', default='rideRequests', help="Ride collection (default: rideRequests)")
+    parser.add_argument('--ride-status', default='pending', help="Ride status to analyse (default: pending)")
+    parser.add_argument('--driver-status', default='Idle', help="Driver status to match (default: Idle)")
+    parser.add_argument('--k', type=int, default=1, help="Neighbours per pickup (default: 1)")
+    parser.add_argument('--radius-km', type=float, default=5.0,
+                        help="Radius for the drivers-in-range count (default: 5)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from firebase_client import get_firestore, initialize_firebase
+
+    print("\n" + "="*60)
+    print("🧭 NEAREST DRIVER ANALYSIS")
+    print("="*60)
+
+    if not initialize_firebase():
+        sys.exit(1)
+    db = get_firestore()
+
+    start = time.perf_counter()
+    index = DriverIndex.from_firestore(db, args.drivers)
+    lats, lngs, types = load_pickups(db, args.rides, args.ride_status)
+    print(f"📥 Loaded {len(index)} drivers and {len(lats)} pickups in {time.perf_counter() - start:.1f}s")
+    if not len(lats):
+        return
+
+    start = time.perf_counter()
+    km, _ = index.nearest_by_type(lats, lngs, types, args.k, args.driver_status)
+    counts = index.count_within(lats, lngs, args.radius_km, status=args.driver_status)
+    print(f"⚡ Queried in {time.perf_counter() - start:.2f}s")
+
+    print(f"\n📊 Distance to nearest {args.driver_status} driver of the requested type (km):")
+    for vehicle_type in np.unique(types):
+        nearest = km[types == vehicle_type, 0]
+        matched = nearest[np.isfinite(nearest)]
+        if not len(matched):
+            print(f"   {vehicle_type}: no matching drivers")
+            continue
+        p50, p90 = np.percentile(matched, [50, 90])
+        print(f"   {vehicle_type}: {len(matched)}/{len(nearest)} matched, "
+              f"median {p50:.2f}, p90 {p90:.2f}")
+    print(f"\n📍 Pickups with no {args.driver_status} driver within {args.radius_km} km: "
+          f"{int((counts == 0).sum())}/{len(counts)}")
+
+
+if __name__ == "__main__":
+    main()
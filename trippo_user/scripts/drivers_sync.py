@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Keep drivers/{uid} in sync with the legacy 'Drivers' collection in real time.
+
+While both schemas are live, the app keeps writing location and status
+updates to 'Drivers'. This daemon listens with on_snapshot and applies the
+same mapping as the incremental migration (delta_migration.sync_drivers):
+existing drivers/{uid} documents are merged, so rating, totalRides and
+earnings are never reset.
+
+Changes are coalesced: every --window seconds the latest snapshot of each
+changed driver is written in one batch, so a driver sending ten location
+updates inside a window costs one write. Only the first sync of a driver
+checks users/{uid} and drivers/{uid}; after that each change is a single
+merge write.
+
+Every --report-interval seconds it prints throughput (changes received,
+drivers written, coalesced) and lag: how long changes waited in the queue,
+and the end-to-end delay from the Firestore update time to the commit.
+With --metrics-file the same numbers are written as JSON for monitoring.
+
+The first snapshot contains every driver, so startup doubles as a full
+catch-up sync; pass --skip-initial to only follow new changes.
+
+Run:
+    python3 scripts/drivers_sync.py
+    python3 scripts/drivers_sync.py --window 2 --metrics-file drivers_sync_metrics.json
+"""
+
+from collections import Counter, deque
+from datetime import datetime, timezone
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+from auth_cache import DEFAULT_CACHE_PATH, AuthUidResolver
+from delta_migration import sync_drivers
+from firebase_client import get_firestore, initialize_firebase
+from firestore_bulk import retryable_exceptions
+
+DEFAULT_WINDOW_SECONDS = 1.0
+DEFAULT_REPORT_SECONDS = 10.0
+
+# Most recent dropped drivers kept for the metrics report
+DEAD_LETTER_LIMIT = 100
+
+
+def _retryable():
+    """Errors worth re-queueing: retryable gRPC errors from Firestore and
+    transient errors from the Auth lookups."""
+    from firebase_admin import exceptions as firebase_exceptions
+
+    return retryable_exceptions() + (
+        firebase_exceptions.UnavailableError,
+        firebase_exceptions.DeadlineExceededError,
+        firebase_exceptions.InternalError,
+        firebase_exceptions.ResourceExhaustedError,
+    )
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def _summary(values):
+    """p50 / p95 / max of a list of seconds, in milliseconds."""
+    values = sorted(values)
+    return {
+        name: None if value is None else round(value * 1000, 1)
+        for name, value in (('p50', _percentile(values, 0.50)),
+                            ('p95', _percentile(values, 0.95)),
+                            ('max', values[-1] if values else None))
+    }
+
+
+class DriverSync:
+    """Coalesces 'Drivers' snapshot changes and writes them in batches.
+
+    on_change() runs on the listener thread; flush() and report() are
+    called from the main loop. Drivers that fail with a non-retryable
+    error are dropped and listed in `dead_letters`; the next change to
+    the driver tries again.
+    """
+
+    def __init__(self, db, resolver, skip_initial=False):
+        self.db = db
+        self.resolver = resolver
+        self.skip_initial = skip_initial
+        self.known_uids = set()
+        self.dead_letters = deque(maxlen=DEAD_LETTER_LIMIT)
+        self.totals = Counter()
+        self._interval = Counter()
+        self._queue_lag = []
+        self._commit_lag = []
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._initial = True
+        self._started = self._interval_started = time.monotonic()
+
+    def on_change(self, docs, changes, read_time):
+        """on_snapshot callback: remember the newest snapshot per driver."""
+        if self._initial:
+            self._initial = False
+            if self.skip_initial:
+                return
+        received = time.monotonic()
+        with self._lock:
+            for change in changes:
+                if change.type.name == 'REMOVED':
+                    # The unified driver is kept; deletes are not mirrored
+                    self._interval['removed'] += 1
+                    continue
+                self._interval['received'] += 1
+                if change.document.id in self._pending:
+                    self._interval['coalesced'] += 1
+                    received_at = self._pending[change.document.id][1]
+                else:
+                    received_at = received
+                self._pending[change.document.id] = (change.document, received_at)
+
+    def flush(self):
+        """Write the latest snapshot of every driver changed since the last flush."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        try:
+            migrated, skipped = sync_drivers(self.db, [snapshot for snapshot, _ in pending.values()],
+                                             self.resolver, self.known_uids)
+            retry, dropped = {}, set()
+        except _retryable() as e:
+            self._requeue(pending)
+            print(f"   ❌ Sync of {len(pending)} driver(s) failed, retrying next window: {e}")
+            return
+        except Exception as e:
+            # Find the driver(s) that can never succeed instead of failing every window
+            print(f"   ⚠️  Sync of {len(pending)} driver(s) failed ({e}), retrying one by one")
+            migrated, skipped, retry, dropped = self._flush_one_by_one(pending)
+            self._requeue(retry)
+
+        committed = time.monotonic()
+        now = datetime.now(timezone.utc)
+        synced = [entry for doc_id, entry in pending.items()
+                  if doc_id not in retry and doc_id not in dropped]
+        with self._lock:
+            self._interval['written'] += migrated
+            self._interval['skipped'] += skipped
+            self._interval['batches'] += 1
+            self._queue_lag.extend(committed - received for _, received in synced)
+            self._commit_lag.extend((now - snapshot.update_time).total_seconds()
+                                    for snapshot, _ in synced if snapshot.update_time)
+
+    def _flush_one_by_one(self, pending):
+        """Sync each pending driver on its own.
+
+        Returns:
+            (migrated, skipped, {doc_id: entry} to retry, dropped doc IDs);
+            drivers failing with a non-retryable error are dead-lettered
+        """
+        migrated = skipped = 0
+        retry = {}
+        dropped = set()
+        for doc_id, entry in pending.items():
+            try:
+                written, missed = sync_drivers(self.db, [entry[0]], self.resolver, self.known_uids)
+            except _retryable():
+                retry[doc_id] = entry
+                continue
+            except Exception as e:
+                with self._lock:
+                    self._interval['dropped'] += 1
+                    self.dead_letters.append({
+                        'id': doc_id,
+                        'error': f"{e.__class__.__name__}: {e}",
+                        'time': datetime.now(timezone.utc).isoformat(),
+                    })
+                print(f"   🗑️  Dropped driver {doc_id}: {e}")
+                dropped.add(doc_id)
+                continue
+            migrated += written
+            skipped += missed
+        return migrated, skipped, retry, dropped
+
+    def _requeue(self, pending):
+        """Put changes back unless newer ones arrived meanwhile."""
+        if not pending:
+            return
+        with self._lock:
+            for doc_id, entry in pending.items():
+                self._pending.setdefault(doc_id, entry)
+            self._interval['errors'] += 1
+
+    def report(self, metrics_file=None):
+        """Print (and optionally save) throughput and lag since the last report."""
+        now = time.monotonic()
+        with self._lock:
+            interval, self._interval = self._interval, Counter()
+            queue_lag, self._queue_lag = self._queue_lag, []
+            commit_lag, self._commit_lag = self._commit_lag, []
+            pending = len(self._pending)
+        self.totals.update(interval)
+        elapsed = max(now - self._interval_started, 1e-9)
+        self._interval_started = now
+
+        metrics = {
+            'time': datetime.now(timezone.utc).isoformat(),
+            'uptimeSeconds': round(now - self._started, 1),
+            'interval': dict(interval),
+            'totals': dict(self.totals),
+            'pending': pending,
+            'knownDrivers': len(self.known_uids),
+            'changesPerSecond': round(interval['received'] / elapsed, 1),
+            'writesPerSecond': round(interval['written'] / elapsed, 1),
+            'queueLagMs': _summary(queue_lag),
+            'commitLagMs': _summary(commit_lag),
+            'deadLetters': list(self.dead_letters),
+        }
+
+        print(f"   📈 {metrics['changesPerSecond']} changes/s → {metrics['writesPerSecond']} writes/s, "
+              f"{interval['coalesced']} coalesced, {pending} pending | "
+              f"queue p95 {metrics['queueLagMs']['p95']} ms, "
+              f"end-to-end p95 {metrics['commitLagMs']['p95']} ms"
+              + (f" | ❌ {interval['errors']} failed flush(es)" if interval['errors'] else "")
+              + (f" | 🗑️  {interval['dropped']} dropped" if interval['dropped'] else ""))
+
+        if metrics_file:
+            tmp_path = f"{metrics_file}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(metrics, f, indent=2)
+            os.replace(tmp_path, metrics_file)
+        return metrics
+
+
+def run(db, sync, window=DEFAULT_WINDOW_SECONDS, report_interval=DEFAULT_REPORT_SECONDS,
+        metrics_file=None):
+    """Listen to 'Drivers' and flush every `window` seconds until interrupted."""
+    watch = db.collection('Drivers').on_snapshot(sync.on_change)
+    print(f"\n👂 Listening to 'Drivers' (window {window}s, reports every {report_interval}s). Ctrl+C to stop.")
+
+    next_report = time.monotonic() + report_interval
+    try:
+        while True:
+            time.sleep(window)
+            sync.flush()
+            if time.monotonic() >= next_report:
+                sync.report(metrics_file)
+                next_report += report_interval
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping...")
+    finally:
+        watch.unsubscribe()
+        sync.flush()
+        sync.report(metrics_file)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Mirror legacy 'Drivers' changes into drivers/{uid} in real time")
+    parser.add_argument('--window', type=float, default=DEFAULT_WINDOW_SECONDS,
+                        help=f"Seconds of changes coalesced into one batch (default: {DEFAULT_WINDOW_SECONDS})")
+    parser.add_argument('--report-interval', type=float, default=DEFAULT_REPORT_SECONDS,
+                        help=f"Seconds between metrics reports (default: {DEFAULT_REPORT_SECONDS})")
+    parser.add_argument('--metrics-file',
+                        help="Also write each metrics report to this JSON file")
+    parser.add_argument('--skip-initial', action='store_true',
+                        help="Don't sync the drivers in the first snapshot, only later changes")
+    parser.add_argument('--auth-cache', default=DEFAULT_CACHE_PATH,
+                        help=f"SQLite email→UID cache (default: {DEFAULT_CACHE_PATH})")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print("\n" + "="*60)
+    print("🔄 BTRIPS DRIVERS → drivers SYNC")
+    print("="*60)
+
+    if not initialize_firebase():
+        sys.exit(1)
+    db = get_firestore()
+
+    sync = DriverSync(db, AuthUidResolver(args.auth_cache), args.skip_initial)
+    run(db, sync, args.window, args.report_interval, args.metrics_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Trip distance, duration and fare estimates using the BTrips app's pricing.
+
+The app prices a ride from the Google Directions road distance and
+duration. Without a route, these estimates use the app's offline fallback
+(direction_polylines_repo._getFallbackDirections), so they approximate the
+fare a rider was quoted rather than reproduce it:
+    - road distance = haversine distance * 1.35 (urban route multiplier)
+    - duration at 25 mph under 10 miles, 45 mph otherwise, in whole seconds
+    - base rate = $0.25/min (per second) + $1.50/mile (calculateRideRate)
+    - fare = base rate * vehicle multiplier * 5 (vehicle_type_selection_sheet.dart)
+
+estimate_trips() is the NumPy-vectorized version for whole columns of
+rides (NumPy is only imported when it is called).
+
+Usage:
+    from fares import estimate_trip, estimate_trips
+
+    distance_miles, duration_min, fare = estimate_trip(40.6413, -73.7781, 40.7589, -73.9851, 'SUV')
+    distances, durations, fares = estimate_trips(pickup_lats, pickup_lngs,
+                                                 dropoff_lats, dropoff_lngs, vehicle_types)
+"""
+
+import math
+
+# DistanceCalculator's constants
+EARTH_RADIUS_METERS = 6371000.0
+METERS_PER_MILE = 1609.34
+EARTH_RADIUS_MILES = EARTH_RADIUS_METERS / METERS_PER_MILE
+
+ROAD_DISTANCE_FACTOR = 1.35
+CITY_SPEED_MPH = 25.0
+HIGHWAY_SPEED_MPH = 45.0
+# Routes this long or longer are timed at highway speed
+HIGHWAY_MIN_MILES = 10.0
+
+PER_MINUTE_RATE = 0.25
+PER_MILE_RATE = 1.50
+SERVICE_MULTIPLIER = 5
+
+VEHICLE_MULTIPLIERS = {
+    'Sedan': 1.0,
+    'SUV': 1.5,
+    'Luxury SUV': 2.0,
+}
+
+
+def haversine_miles(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in miles."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(a))
+
+
+def driving_seconds(distance_miles):
+    """Estimated driving time in whole seconds (DistanceCalculator.estimateDrivingTimeSeconds)."""
+    speed_mph = CITY_SPEED_MPH if distance_miles < HIGHWAY_MIN_MILES else HIGHWAY_SPEED_MPH
+    return round(distance_miles / speed_mph * 3600)
+
+
+def _round_cents(amount):
+    # round(x * 100) / 100 matches numpy.round(x, 2) exactly, so scalar and
+    # vectorized estimates agree to the cent
+    return round(amount * 100) / 100
+
+
+def estimate_fare(distance_miles, duration_min, vehicle_type='Sedan'):
+    """Fare for a trip, rounded to cents like the app.
+
+    duration_min may be fractional; the app charges per second.
+    """
+    base_rate = _round_cents(duration_min * PER_MINUTE_RATE + distance_miles * PER_MILE_RATE)
+    multiplier = VEHICLE_MULTIPLIERS.get(vehicle_type, 1.0)
+    return _round_cents(base_rate * multiplier * SERVICE_MULTIPLIER)
+
+
+def estimate_trip(pickup_lat, pickup_lng, dropoff_lat, dropoff_lng, vehicle_type='Sedan'):
+    """Estimate a trip from its endpoints.
+
+    Returns:
+        (distance in miles, duration in whole minutes, fare)
+    """
+    distance = haversine_miles(pickup_lat, pickup_lng, dropoff_lat, dropoff_lng) * ROAD_DISTANCE_FACTOR
+    seconds = driving_seconds(distance)
+    fare = estimate_fare(distance, seconds / 60, vehicle_type)
+    return _round_cents(distance), max(1, round(seconds / 60)), fare
+
+
+def estimate_trips(pickup_lats, pickup_lngs, dropoff_lats, dropoff_lngs, vehicle_types,
+                   per_minute=PER_MINUTE_RATE, per_mile=PER_MILE_RATE,
+                   service_multiplier=SERVICE_MULTIPLIER, vehicle_multipliers=None):
+    """Vectorized estimate_trip() over arrays of trips.
+
+    Pricing arguments default to the app's current rates, so a pricing
+    change can be previewed or applied by passing new values.
+
+    Returns:
+        (distances in miles, durations in whole minutes, fares) NumPy arrays
+    """
+    import numpy as np
+
+    multipliers = VEHICLE_MULTIPLIERS if vehicle_multipliers is None else vehicle_multipliers
+    phi1 = np.radians(np.asarray(pickup_lats, dtype=np.float64))
+    phi2 = np.radians(np.asarray(dropoff_lats, dtype=np.float64))
+    dlambda = np.radians(np.asarray(dropoff_lngs, dtype=np.float64) - np.asarray(pickup_lngs, dtype=np.float64))
+    a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    distance = 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(a)) * ROAD_DISTANCE_FACTOR
+
+    speed = np.where(distance < HIGHWAY_MIN_MILES, CITY_SPEED_MPH, HIGHWAY_SPEED_MPH)
+    seconds = np.rint(distance / speed * 3600)
+    duration = np.maximum(1, np.rint(seconds / 60))
+    base_rate = np.round(seconds / 60 * per_minute + distance * per_mile, 2)
+
+    # Look up each distinct vehicle type once
+    types, inverse = np.unique(np.asarray(vehicle_types, dtype=str), return_inverse=True)
+    multiplier = np.array([multipliers.get(t, 1.0) for t in types])[inverse]
+    fare = np.round(base_rate * multiplier * service_multiplier, 2)
+
+    return np.round(distance, 2), duration.astype(np.int64), fare
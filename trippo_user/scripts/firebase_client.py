@@ -0,0 +1,205 @@
+"""
+Shared, lazily initialised Firebase clients for the BTrips admin scripts.
+
+firebase_admin and google-cloud-firestore are only imported the first time
+a client is requested, so `--help` and dry runs start instantly. The app,
+Firestore client (and its gRPC channel) and Auth client are built once per
+process and reused by every step and every script run in that process
+(the AsyncClient once per event loop).
+
+Credential search order:
+    1. GOOGLE_APPLICATION_CREDENTIALS
+    2. BTRIPS_CREDENTIAL_PATHS (os.pathsep-separated), or DEFAULT_CREDENTIAL_PATHS
+    3. Application Default Credentials
+
+When FIRESTORE_EMULATOR_HOST is set no credentials are needed.
+
+Usage:
+    from firebase_client import initialize_firebase, get_firestore, get_auth, get_async_firestore
+
+    if not initialize_firebase():
+        sys.exit(1)
+    db = get_firestore()
+    auth = get_auth()
+    async_db = get_async_firestore()  # inside a running event loop
+"""
+
+import os
+import threading
+
+PROJECT_ID = "btrips-42089"
+
+DEFAULT_CREDENTIAL_PATHS = [
+    'firestore_credentials.json',
+    'btrips_user/firestore_credentials.json',
+    'serviceAccountKey.json',
+    'btrips_user/serviceAccountKey.json',
+    os.path.expanduser('~/Downloads/serviceAccountKey.json'),
+]
+
+_lock = threading.RLock()
+_config = {
+    'project_id': os.environ.get('GCLOUD_PROJECT', PROJECT_ID),
+    'credential_paths': None,
+}
+_clients = {}
+
+
+def configure(project_id=None, credential_paths=None):
+    """Override the project or credential search order before first use."""
+    with _lock:
+        if _clients:
+            raise RuntimeError("Firebase clients already initialised; configure() must run first")
+        if project_id:
+            _config['project_id'] = project_id
+        if credential_paths is not None:
+            _config['credential_paths'] = list(credential_paths)
+
+
+def credential_paths():
+    """Service account key locations, in search order."""
+    if _config['credential_paths'] is not None:
+        return _config['credential_paths']
+    env_paths = os.environ.get('BTRIPS_CREDENTIAL_PATHS')
+    if env_paths:
+        return [os.path.expanduser(p) for p in env_paths.split(os.pathsep) if p]
+    return DEFAULT_CREDENTIAL_PATHS
+
+
+def using_emulator():
+    return bool(os.environ.get('FIRESTORE_EMULATOR_HOST'))
+
+
+def auth_target():
+    """Identify the Auth backend UIDs are resolved against.
+
+    The project ID plus FIREBASE_AUTH_EMULATOR_HOST (if set), so UIDs from
+    the emulator or another project are never reused for production.
+    """
+    app = _clients.get('app')
+    project_id = (app.project_id if app else None) or _config['project_id']
+    emulator = os.environ.get('FIREBASE_AUTH_EMULATOR_HOST')
+    return f"{project_id}@{emulator}" if emulator else project_id
+
+
+def _emulator_credential():
+    """firebase_admin credential that sends no auth, for the local emulators."""
+    from firebase_admin import credentials
+    from google.auth.credentials import AnonymousCredentials
+
+    class EmulatorCredential(credentials.Base):
+        def get_credential(self):
+            return AnonymousCredentials()
+
+    return EmulatorCredential()
+
+
+def _print_credentials_help(error):
+    print("❌ Could not initialize Firebase Admin SDK")
+    print(f"\nError: {error}")
+    print("\n📋 To use this script, you need Firebase credentials:")
+    print("\nOption 1 - Download Service Account Key:")
+    print(f"1. Go to: https://console.firebase.google.com/project/{PROJECT_ID}/settings/serviceaccounts/adminsdk")
+    print("2. Click 'Generate New Private Key'")
+    print("3. Save as 'serviceAccountKey.json' in the btrips_user directory")
+    print("4. Run the script again")
+    print("\nOption 2 - Set Environment Variable:")
+    print("   export GOOGLE_APPLICATION_CREDENTIALS='path/to/serviceAccountKey.json'")
+
+
+def initialize_firebase():
+    """Initialize (or reuse) the Firebase Admin app. Returns None on failure."""
+    with _lock:
+        if 'app' in _clients:
+            return _clients['app']
+
+        import firebase_admin
+        from firebase_admin import credentials
+
+        try:
+            app = firebase_admin.get_app()
+            print("✅ Using existing Firebase app")
+            _clients['app'] = app
+            return app
+        except ValueError:
+            pass
+
+        print("🔄 Initializing Firebase Admin SDK...")
+        options = {'projectId': _config['project_id']}
+
+        if using_emulator():
+            app = firebase_admin.initialize_app(_emulator_credential(), options)
+            print(f"✅ Initialized for emulator at {os.environ['FIRESTORE_EMULATOR_HOST']}")
+            _clients['app'] = app
+            return app
+
+        # Option 1: Use service account key file (if provided)
+        cred_path = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS')
+        candidates = ([cred_path] if cred_path else []) + credential_paths()
+
+        # Option 2: Try to find service account key in configured locations
+        for path in candidates:
+            if os.path.exists(path):
+                print(f"📁 Found service account key at: {path}")
+                app = firebase_admin.initialize_app(credentials.Certificate(path), options)
+                print("✅ Initialized with service account key")
+                _clients['app'] = app
+                return app
+
+        # Option 3: Use Application Default Credentials
+        try:
+            app = firebase_admin.initialize_app(credentials.ApplicationDefault(), options)
+            print("✅ Initialized with Application Default Credentials")
+            _clients['app'] = app
+            return app
+        except Exception as e:
+            _print_credentials_help(e)
+            return None
+
+
+def get_firestore():
+    """Return the shared Firestore client, initializing Firebase on first use."""
+    with _lock:
+        if 'firestore' not in _clients:
+            if not initialize_firebase():
+                raise RuntimeError("Firebase Admin SDK is not initialized")
+            from firebase_admin import firestore
+            _clients['firestore'] = firestore.client(_clients['app'])
+        return _clients['firestore']
+
+
+def get_async_firestore():
+    """Return the Firestore AsyncClient for the running event loop.
+
+    An AsyncClient's gRPC channel is bound to the loop it is created in,
+    so one client is kept per loop (clients of closed loops are dropped).
+    Call this from inside the coroutine passed to asyncio.run().
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _clients.setdefault('async_firestore', {})
+        if loop not in clients:
+            app = initialize_firebase()
+            if not app:
+                raise RuntimeError("Firebase Admin SDK is not initialized")
+            from google.cloud.firestore import AsyncClient
+            for closed in [other for other in clients if other.is_closed()]:
+                del clients[closed]
+            clients[loop] = AsyncClient(
+                project=app.project_id or _config['project_id'],
+                credentials=app.credential.get_credential(),
+            )
+        return clients[loop]
+
+
+def get_auth():
+    """Return the firebase_admin.auth module bound to the shared app."""
+    with _lock:
+        if 'auth' not in _clients:
+            if not initialize_firebase():
+                raise RuntimeError("Firebase Admin SDK is not initialized")
+            from firebase_admin import auth
+            _clients['auth'] = auth
+        return _clients['auth']
@@ -0,0 +1,486 @@
+"""
+Shared batched write engine for the BTrips Firestore admin scripts.
+
+Writes are queued and committed in chunks (at most 500 operations, the
+Firestore WriteBatch limit) instead of one round trip per document.
+Upserts go through BulkWriter so documents are written without reading
+them first while still reporting how many were added vs. updated.
+
+All writers share one RampLimiter that follows Firestore's 500/50/5 rule:
+start at 500 writes/s and raise the rate by 50% every 5 minutes. Bursts
+into new collections, or onto email / sequential document IDs, therefore
+ramp up instead of hotspotting. A RESOURCE_EXHAUSTED or contention error
+halves the rate and restarts the ramp from there, and the failed writes
+are retried with jittered backoff instead of being dropped.
+
+Usage:
+    from firestore_bulk import BatchWriter, bulk_upsert
+
+    summary = bulk_upsert(db, 'Drivers', drivers, doc_id_field='email')
+    print(f"{summary.added} added, {summary.updated} updated")
+
+    with BatchWriter(db) as writer:
+        for doc in docs:
+            writer.set(db.collection('drivers').document(doc.id), data, merge=True)
+
+    missing = find_missing(db, profile_refs)   # existence only, no fields read
+
+    call_with_backoff(lambda: ref.set(data))   # a single write, rate limited and retried
+"""
+
+from collections import Counter, deque
+from functools import lru_cache
+import os
+import random
+import threading
+import time
+
+# Firestore rejects WriteBatches with more than 500 operations
+MAX_BATCH_SIZE = 500
+
+# gRPC status codes (google.rpc.code_pb2) reported by BulkWriter failures
+ALREADY_EXISTS = 6
+RETRYABLE_CODES = {
+    4,   # DEADLINE_EXCEEDED
+    8,   # RESOURCE_EXHAUSTED
+    10,  # ABORTED
+    13,  # INTERNAL
+    14,  # UNAVAILABLE
+}
+
+
+@lru_cache(maxsize=None)
+def retryable_exceptions():
+    """Exceptions raised by WriteBatch.commit() that are safe to retry.
+
+    Imported lazily so importing this module stays cheap.
+    """
+    from google.api_core import exceptions as gax_exceptions
+
+    return (
+        gax_exceptions.ResourceExhausted,
+        gax_exceptions.Aborted,
+        gax_exceptions.DeadlineExceeded,
+        gax_exceptions.InternalServerError,
+        gax_exceptions.ServiceUnavailable,
+    )
+
+
+class RampLimiter:
+    """Thread-safe token bucket that ramps up by the 500/50/5 rule.
+
+    The rate starts at `initial_rate` ops/s and grows by `ramp` every
+    `ramp_interval` seconds, up to `max_rate` (unbounded if None). Bursts of
+    up to one second's worth of tokens are allowed. acquire() reserves
+    tokens and sleeps until they are paid for, so callers queue fairly.
+
+    throttle() reacts to RESOURCE_EXHAUSTED / contention errors: the rate
+    is cut by `decrease` (never below `min_rate`) and the ramp restarts.
+    Errors from several threads within `cooldown` seconds count once.
+
+    Args:
+        initial_rate: Starting ops/s, or None for no limit
+    """
+
+    def __init__(self, initial_rate=500, ramp=1.5, ramp_interval=300.0, max_rate=None,
+                 min_rate=50, decrease=0.5, cooldown=1.0, clock=time.monotonic, sleep=time.sleep):
+        self.ramp = ramp
+        self.ramp_interval = ramp_interval
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.throttles = 0
+        self.waited = 0.0
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._base_rate = initial_rate
+        self._ramp_start = self._updated = clock()
+        self._last_throttle = None
+        self._tokens = initial_rate or 0
+
+    def _rate(self, now):
+        if self._base_rate is None:
+            return None
+        steps = int((now - self._ramp_start) // self.ramp_interval)
+        rate = self._base_rate * self.ramp ** steps
+        return min(rate, self.max_rate) if self.max_rate else rate
+
+    @property
+    def rate(self):
+        """Current ops/s (None when unlimited)."""
+        with self._lock:
+            return self._rate(self._clock())
+
+    def acquire(self, ops=1):
+        """Block until `ops` writes may be sent."""
+        with self._lock:
+            now = self._clock()
+            rate = self._rate(now)
+            if rate is None:
+                return
+            self._tokens = min(rate, self._tokens + (now - self._updated) * rate) - ops
+            self._updated = now
+            wait = -self._tokens / rate if self._tokens < 0 else 0.0
+            self.waited += wait
+        if wait:
+            self._sleep(wait)
+
+    def throttle(self):
+        """Back off after a throttling or contention error."""
+        with self._lock:
+            now = self._clock()
+            rate = self._rate(now)
+            if rate is None or (self._last_throttle is not None and now - self._last_throttle < self.cooldown):
+                return
+            self.throttles += 1
+            self._last_throttle = now
+            self._base_rate = max(self.min_rate, rate * self.decrease)
+            self._ramp_start = now
+            self._tokens = min(self._tokens, 0)
+
+
+@lru_cache(maxsize=None)
+def shared_limiter():
+    """Process-wide RampLimiter used by BatchWriter and call_with_backoff().
+
+    Unlimited against the emulator, which doesn't hotspot.
+    """
+    if os.environ.get('FIRESTORE_EMULATOR_HOST'):
+        return RampLimiter(initial_rate=None)
+    return RampLimiter()
+
+
+def call_with_backoff(fn, ops=1, limiter=None, max_attempts=8):
+    """Call `fn` (one write RPC of `ops` operations) through the limiter.
+
+    Throttling and contention errors slow the limiter down and are retried
+    with jittered exponential backoff; the last one is re-raised.
+    """
+    limiter = limiter or shared_limiter()
+    for attempt in range(1, max_attempts + 1):
+        limiter.acquire(ops)
+        try:
+            return fn()
+        except retryable_exceptions():
+            if attempt == max_attempts:
+                raise
+            limiter.throttle()
+            time.sleep(_backoff_delay(attempt))
+
+
+def _clamp_chunk_size(chunk_size):
+    """Keep chunk sizes within 1..MAX_BATCH_SIZE."""
+    return max(1, min(int(chunk_size), MAX_BATCH_SIZE))
+
+
+def _backoff_delay(attempt, base=0.5, cap=30.0):
+    """Exponential backoff with jitter for the given (1-based) attempt."""
+    return min(cap, base * (2 ** (attempt - 1))) * random.uniform(0.5, 1.5)
+
+
+def chunked(items, size):
+    """Yield lists of up to `size` items without materialising `items`."""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class BatchWriter:
+    """Queue writes and commit them as WriteBatches of up to 500 operations.
+
+    Commits go through a RampLimiter (shared_limiter() by default). A batch
+    that fails with a throttling or contention error slows the limiter and
+    is retried with exponential backoff. Batches are atomic, so a retry
+    never half-applies. A batch still failing after `max_attempts` is split
+    in two and both halves are re-queued in order, since smaller batches
+    contend less; pass split=False to keep every batch whole (e.g. when
+    operations in a batch must commit together). Use as a context manager
+    so the final partial batch is committed.
+    """
+
+    def __init__(self, db, chunk_size=MAX_BATCH_SIZE, max_attempts=5, limiter=None, split=True):
+        self._db = db
+        self.chunk_size = _clamp_chunk_size(chunk_size)
+        self.max_attempts = max_attempts
+        self.limiter = limiter or shared_limiter()
+        self.split = split
+        self._ops = []
+        self.committed = 0
+        self.batches = 0
+        self.retries = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        return False
+
+    def set(self, ref, data, merge=False):
+        self._add('set', ref, data, merge=merge)
+
+    def create(self, ref, data):
+        self._add('create', ref, data)
+
+    def update(self, ref, data, option=None):
+        self._add('update', ref, data, option=option)
+
+    def delete(self, ref, option=None):
+        """Queue a delete; `option` is a precondition from db.write_option()."""
+        self._add('delete', ref, option=option)
+
+    def _add(self, method, *args, **kwargs):
+        self._ops.append((method, args, kwargs))
+        if len(self._ops) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Commit all queued operations."""
+        if not self._ops:
+            return []
+        queue = deque([(self._ops, 1)])
+        self._ops = []
+        results = []
+
+        while queue:
+            ops, attempt = queue.popleft()
+            batch = self._db.batch()
+            for method, args, kwargs in ops:
+                getattr(batch, method)(*args, **kwargs)
+            self.limiter.acquire(len(ops))
+            try:
+                results.extend(batch.commit())
+            except retryable_exceptions() as e:
+                self.limiter.throttle()
+                self.retries += 1
+                if attempt < self.max_attempts:
+                    delay = _backoff_delay(attempt)
+                    print(f"   ⏳ Batch of {len(ops)} throttled ({e.__class__.__name__}), retrying in {delay:.1f}s")
+                    time.sleep(delay)
+                    queue.appendleft((ops, attempt + 1))
+                elif self.split and len(ops) > 1:
+                    middle = len(ops) // 2
+                    print(f"   ✂️  Batch of {len(ops)} still throttled, re-queueing as two batches")
+                    queue.extendleft([(ops[middle:], 1), (ops[:middle], 1)])
+                else:
+                    # Unsent operations stay queued for the caller
+                    self._ops = ops + [op for pending, _ in queue for op in pending] + self._ops
+                    raise
+                continue
+
+            self.committed += len(ops)
+            self.batches += 1
+        return results
+
+
+def find_missing(db, refs, chunk_size=MAX_BATCH_SIZE):
+    """Return the refs whose documents don't exist.
+
+    Existence is probed with get_all(field_paths=[]), which returns
+    metadata only, so no document fields are downloaded.
+    """
+    missing = []
+    for chunk in chunked(refs, chunk_size):
+        found = {
+            snapshot.reference.path
+            for snapshot in db.get_all(chunk, field_paths=[])
+            if snapshot.exists
+        }
+        missing.extend(ref for ref in chunk if ref.path not in found)
+    return missing
+
+
+class UpsertSummary:
+    """Counts reported by bulk_upsert()."""
+
+    def __init__(self):
+        self.added = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+
+    @property
+    def total(self):
+        return self.added + self.updated
+
+
+def bulk_upsert(db, collection_name, documents, doc_id_field='email',
+                chunk_size=MAX_BATCH_SIZE, max_attempts=5,
+                initial_ops_per_second=500, on_written=None):
+    """Upsert documents without reading them first.
+
+    Each document is sent as a create. Documents that already exist come
+    back with ALREADY_EXISTS and are re-sent as an update, so the
+    added/updated counts come straight from the write results. As with
+    DocumentReference.update(), each top-level field is replaced whole
+    (nested maps such as driverLoc included) and other fields are kept.
+
+    BulkWriter ramps up from `initial_ops_per_second` by the 500/50/5 rule
+    itself. Writes still throttled after `max_attempts` are re-queued after
+    a jittered backoff, up to `max_attempts` more rounds, before they are
+    reported as failed.
+
+    Args:
+        db: Firestore client
+        collection_name: Target collection
+        documents: Iterable of dicts, consumed in chunks of `chunk_size`
+        doc_id_field: Field whose value is used as the document ID
+        chunk_size: Documents queued before each flush (max 500)
+        max_attempts: Attempts per write on throttling/contention errors
+        initial_ops_per_second: BulkWriter starting throughput
+        on_written: Optional callback(status, data), status is 'Added' or 'Updated'
+
+    Returns:
+        UpsertSummary
+    """
+    chunk_size = _clamp_chunk_size(chunk_size)
+    collection = db.collection(collection_name)
+    summary = UpsertSummary()
+    lock = threading.Lock()
+    pending = {}
+    merged = set()
+    conflicts = []
+    throttled = []
+    requeued = Counter()
+
+    def handle_result(reference, result, bulk_writer):
+        with lock:
+            data = pending.pop(reference.path, None)
+            if reference.path in merged:
+                merged.discard(reference.path)
+                status = 'Updated'
+                summary.updated += 1
+            else:
+                status = 'Added'
+                summary.added += 1
+        if on_written and data is not None:
+            on_written(status, data)
+
+    def handle_error(failure, bulk_writer):
+        if failure.code == ALREADY_EXISTS:
+            with lock:
+                conflicts.append(failure.operation)
+            return False
+        if failure.code in RETRYABLE_CODES:
+            if failure.attempts < max_attempts:
+                return True
+            with lock:
+                if requeued[failure.operation.reference.path] < max_attempts:
+                    throttled.append(failure.operation)
+                    return False
+        with lock:
+            pending.pop(failure.operation.reference.path, None)
+            summary.failed += 1
+            summary.errors.append((failure.operation.reference.id, failure.message))
+        return False
+
+    def merge_existing():
+        """Re-send documents that already existed as updates."""
+        with lock:
+            existing, conflicts[:] = list(conflicts), []
+            merged.update(op.reference.path for op in existing)
+        for op in existing:
+            writer.update(op.reference, op.document_data)
+        if existing:
+            writer.flush()
+
+    from google.cloud.firestore_v1.bulk_writer import BulkWriterOptions
+
+    writer = db.bulk_writer(options=BulkWriterOptions(
+        initial_ops_per_second=initial_ops_per_second,
+    ))
+    writer.on_write_result(handle_result)
+    writer.on_write_error(handle_error)
+
+    try:
+        for chunk in chunked(documents, chunk_size):
+            for data in chunk:
+                ref = collection.document(str(data[doc_id_field]))
+                pending[ref.path] = data
+                writer.create(ref, data)
+            writer.flush()
+            merge_existing()
+
+            # Writes that ran out of attempts: back off and send them again
+            attempt = 0
+            while True:
+                with lock:
+                    retry, throttled[:] = list(throttled), []
+                    requeued.update(op.reference.path for op in retry)
+                if not retry:
+                    break
+                attempt += 1
+                shared_limiter().throttle()
+                delay = _backoff_delay(attempt)
+                print(f"   ⏳ {len(retry)} throttled write(s) re-queued, retrying in {delay:.1f}s")
+                time.sleep(delay)
+                for op in retry:
+                    # Update operations carry field_updates, so re-send the original document
+                    data = pending[op.reference.path]
+                    if op.reference.path in merged:
+                        writer.update(op.reference, data)
+                    else:
+                        writer.create(op.reference, data)
+                writer.flush()
+                merge_existing()
+    finally:
+        writer.close()
+
+    return summary
+
+
+def bulk_create(db, documents, max_attempts=5, initial_ops_per_second=500):
+    """Create documents, leaving any that already exist untouched.
+
+    Each document is sent as a create through BulkWriter, so a document
+    written by someone else after the caller checked for it comes back
+    with ALREADY_EXISTS and is counted as existing instead of overwritten.
+
+    Args:
+        db: Firestore client
+        documents: Iterable of (ref, data)
+        max_attempts: Attempts per write on throttling/contention errors
+        initial_ops_per_second: BulkWriter starting throughput
+
+    Returns:
+        (created refs, Counter of 'created', 'existing' and 'failed')
+    """
+    from google.cloud.firestore_v1.bulk_writer import BulkWriterOptions
+
+    lock = threading.Lock()
+    created = []
+    counts = Counter()
+
+    def handle_result(reference, result, bulk_writer):
+        with lock:
+            created.append(reference)
+            counts['created'] += 1
+
+    def handle_error(failure, bulk_writer):
+        if failure.code in RETRYABLE_CODES and failure.attempts < max_attempts:
+            return True
+        with lock:
+            counts['existing' if failure.code == ALREADY_EXISTS else 'failed'] += 1
+        if failure.code != ALREADY_EXISTS:
+            print(f"   ❌ {failure.operation.reference.path}: {failure.message}")
+        return False
+
+    writer = db.bulk_writer(options=BulkWriterOptions(
+        initial_ops_per_second=initial_ops_per_second,
+    ))
+    writer.on_write_result(handle_result)
+    writer.on_write_error(handle_error)
+    try:
+        for ref, data in documents:
+            writer.create(ref, data)
+    finally:
+        writer.close()
+    return created, counts
@@ -0,0 +1,59 @@
+"""
+Server-side document counts for the BTrips Firestore admin scripts.
+
+Uses Firestore aggregation queries (count()) so counting a collection
+costs one request and no document downloads, instead of
+len(list(collection.stream())).
+
+Usage:
+    from firestore_counts import count_documents, count_collections
+
+    count_documents(db, 'drivers')
+    count_documents(db, 'rideRequests', [('status', '==', 'pending')])
+    count_collections(db, ['users', 'drivers'], filters={'users': [('userType', '==', 'driver')]})
+"""
+
+
+def build_query(db, collection_name, filters=None):
+    """Return a query on `collection_name` with (field, op, value) filters applied."""
+    from google.cloud.firestore_v1.base_query import FieldFilter
+
+    query = db.collection(collection_name)
+    for field, op, value in filters or []:
+        query = query.where(filter=FieldFilter(field, op, value))
+    return query
+
+
+def count_query(query):
+    """Count the documents matched by a query with a count() aggregation."""
+    result = query.count(alias='count').get()
+    return int(result[0][0].value)
+
+
+def count_documents(db, collection_name, filters=None):
+    """Count documents in a collection, optionally filtered.
+
+    Args:
+        db: Firestore client
+        collection_name: Collection to count
+        filters: Optional list of (field, op, value) tuples, e.g. [('status', '==', 'pending')]
+    """
+    return count_query(build_query(db, collection_name, filters))
+
+
+def count_collections(db, collection_names, filters=None):
+    """Count several collections.
+
+    Args:
+        db: Firestore client
+        collection_names: Collections to count
+        filters: Optional dict of collection name → list of (field, op, value)
+
+    Returns:
+        Dict of collection name → document count
+    """
+    filters = filters or {}
+    return {
+        name: count_documents(db, name, filters.get(name))
+        for name in collection_names
+    }
@@ -0,0 +1,205 @@
+"""
+Geohash encoding and radius queries for driver locations.
+
+Driver documents store their location the way the app's geoflutterfire2
+GeoFirePoint.data does:
+
+    driverLoc: {geopoint: GeoPoint(lat, lng), geohash: '<9 chars>'}
+
+With driverLoc.geohash present, "drivers within R km" becomes a handful
+of order_by('driverLoc.geohash') range queries over the geohash cells that
+cover the circle, instead of a scan of the whole collection. Candidates
+are then filtered by exact distance.
+
+Usage:
+    from firestore_geo import drivers_within, encode, geo_point
+
+    encode(40.6413, -73.7781)              # 'dr5x1ns2t'
+    driver_data['driverLoc'] = geo_point(40.6413, -73.7781)
+    for doc_id, driver, km in drivers_within(db, 'drivers', 40.7589, -73.9851, 5,
+                                             filters=[('driverStatus', '==', 'Idle')]):
+        ...
+"""
+
+import math
+
+from firestore_counts import build_query
+from firestore_paging import project
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Same precision as geoflutterfire2's GeoFirePoint.hash
+DEFAULT_PRECISION = 9
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+# Sorts after every base32 character, closing a prefix range
+RANGE_END = '~'
+
+# Most geohash ranges (one query each) a radius search is split into
+MAX_COVER_CELLS = 16
+
+
+def encode(lat, lng, precision=DEFAULT_PRECISION):
+    """Encode a coordinate as a geohash string."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        value, bounds = (lng, lng_range) if even else (lat, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            bounds[0] = mid
+        else:
+            bits <<= 1
+            bounds[1] = mid
+        even = not even
+
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(lat degrees, lng degrees) spanned by one cell at `precision`."""
+    total_bits = 5 * precision
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def distance_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def _bounding_box(lat, lng, radius_km):
+    """(lat_min, lat_max, lng_min, lng_max) around the circle; lng may pass ±180."""
+    lat_delta = radius_km / KM_PER_DEGREE
+    lng_delta = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+    return max(lat - lat_delta, -90.0), min(lat + lat_delta, 90.0), lng - lng_delta, lng + lng_delta
+
+
+def _steps(low, high, step):
+    """Sample points from low to high, `step` apart, always including high."""
+    points = []
+    value = low
+    while value < high:
+        points.append(value)
+        value += step
+    points.append(high)
+    return points
+
+
+def _cells(box, precision):
+    """Geohashes at `precision` of every cell the bounding box touches."""
+    lat_min, lat_max, lng_min, lng_max = box
+    lat_deg, lng_deg = cell_size(precision)
+    # A sample every cell-width hits every cell the bounding box touches
+    hashes = set()
+    for sample_lat in _steps(lat_min, lat_max, lat_deg):
+        for sample_lng in _steps(lng_min, lng_max, lng_deg):
+            wrapped_lng = (sample_lng + 180.0) % 360.0 - 180.0
+            hashes.add(encode(sample_lat, wrapped_lng, precision))
+    return hashes
+
+
+def covering_hashes(lat, lng, radius_km, max_cells=MAX_COVER_CELLS):
+    """Geohash prefixes whose cells together cover the circle.
+
+    Uses the finest precision at which the circle's bounding box touches
+    at most `max_cells` cells, so a query reads little more than the
+    circle itself (a 5 km radius in New York is about a dozen 5 x 4 km
+    cells, not one 20 x 40 km cell).
+    """
+    box = _bounding_box(lat, lng, radius_km)
+    lat_min, lat_max, lng_min, lng_max = box
+    for precision in range(DEFAULT_PRECISION, 0, -1):
+        lat_deg, lng_deg = cell_size(precision)
+        # Upper bound on the cells per axis; skip precisions far too fine to enumerate
+        rows = (lat_max - lat_min) / lat_deg + 2
+        columns = (lng_max - lng_min) / lng_deg + 2
+        if rows * columns > 4 * max_cells:
+            continue
+        hashes = _cells(box, precision)
+        if len(hashes) <= max_cells:
+            return sorted(hashes)
+    return sorted(_cells(box, 1))
+
+
+def query_ranges(lat, lng, radius_km):
+    """(start, end) geohash ranges to query for drivers within the radius."""
+    return [(prefix, prefix + RANGE_END) for prefix in covering_hashes(lat, lng, radius_km)]
+
+
+def geo_point(lat, lng):
+    """driverLoc value in the app's GeoFirePoint.data shape."""
+    from google.cloud.firestore import GeoPoint
+
+    return {'geopoint': GeoPoint(lat, lng), 'geohash': encode(lat, lng)}
+
+
+def with_geohash(driver_loc):
+    """Return driverLoc with its geohash filled in from the geopoint.
+
+    Returns driver_loc unchanged if it has no geopoint.
+    """
+    geopoint = (driver_loc or {}).get('geopoint')
+    if geopoint is None:
+        return driver_loc
+    return {**driver_loc, 'geohash': encode(geopoint.latitude, geopoint.longitude)}
+
+
+def drivers_within(db, collection_name, lat, lng, radius_km, field='driverLoc',
+                   filters=None, field_paths=None):
+    """Find documents whose `field` location lies within radius_km.
+
+    Only documents in the covering geohash ranges are read. Equality
+    filters (e.g. driverStatus == 'Idle') need a composite index with
+    `<field>.geohash`.
+
+    Args:
+        db: Firestore client
+        collection_name: 'drivers' or 'Drivers'
+        lat, lng: Search centre
+        radius_km: Search radius in kilometres
+        field: Map field holding {geopoint, geohash}
+        filters: Optional list of (field, op, value) tuples
+        field_paths: Optional projection (the location field is always included)
+
+    Returns:
+        List of (doc_id, data, distance_km), nearest first
+    """
+    hash_field = f"{field}.geohash"
+    if field_paths is not None and field not in field_paths:
+        field_paths = list(field_paths) + [field]
+
+    found = {}
+    for start, end in query_ranges(lat, lng, radius_km):
+        query = project(build_query(db, collection_name, filters), field_paths)
+        query = query.order_by(hash_field).start_at([start]).end_at([end])
+        for snapshot in query.stream():
+            if snapshot.id in found:
+                continue
+            data = snapshot.to_dict() or {}
+            geopoint = (data.get(field) or {}).get('geopoint')
+            if geopoint is None:
+                continue
+            km = distance_km(lat, lng, geopoint.latitude, geopoint.longitude)
+            if km <= radius_km:
+                found[snapshot.id] = (snapshot.id, data, km)
+
+    return sorted(found.values(), key=lambda match: match[2])
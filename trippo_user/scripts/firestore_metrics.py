@@ -0,0 +1,490 @@
+"""
+RPC counters for the BTrips Firestore admin scripts.
+
+Counts calls at the generated GAPIC client (FirestoreClient.commit,
+run_query, batch_get_documents, ...) so every RPC is counted exactly once
+no matter which high-level API issued it, plus documents read, writes,
+deletes and firebase_admin.auth calls.
+
+Everything is also broken down per step (see step()) and per collection,
+and every RPC / Auth call is timed into a latency histogram. At exit the
+scripts can write it all as JSON or Prometheus text, and dump a cProfile
+per step. Only the synchronous client is instrumented; steps run on the
+AsyncClient (--async) report wall time only.
+
+Usage:
+    from firestore_metrics import RpcMetrics
+
+    metrics = RpcMetrics()
+    with metrics.instrument():
+        with metrics.step('migrate_drivers'):
+            migrate_drivers_to_new_schema(db)
+    print(metrics.snapshot())
+    metrics.write('metrics.prom')
+
+    # In a script: --metrics-out / --profile-dir
+    add_metrics_arguments(parser)
+    start_metrics(args)
+    with step('seed_drivers'):
+        ...
+"""
+
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+import atexit
+import cProfile
+import json
+import os
+import re
+import threading
+import time
+
+# FirestoreClient methods that are one RPC each
+FIRESTORE_RPCS = (
+    'batch_get_documents',
+    'batch_write',
+    'begin_transaction',
+    'commit',
+    'get_document',
+    'list_collection_ids',
+    'list_documents',
+    'partition_query',
+    'rollback',
+    'run_aggregation_query',
+    'run_query',
+)
+
+# firebase_admin.auth functions that are one RPC each
+AUTH_CALLS = (
+    'create_user',
+    'delete_user',
+    'delete_users',
+    'get_user',
+    'get_user_by_email',
+    'get_users',
+    'import_users',
+    'list_users',
+    'update_user',
+)
+
+# Latency histogram bucket upper bounds, in seconds (Prometheus style)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Label for work done outside any step()
+NO_STEP = 'main'
+
+# Metrics started by start_metrics(); step() marks steps on it
+_active = None
+
+
+def _request_field(args, kwargs, name):
+    """Read a field from a GAPIC call's `request` (dict or proto)."""
+    request = kwargs.get('request', args[0] if args else None)
+    if request is None:
+        return kwargs.get(name)
+    if isinstance(request, dict):
+        return request.get(name)
+    return getattr(request, name, None)
+
+
+def _collection(name):
+    """Collection ID of a document resource name (.../documents/users/uid → users)."""
+    if not name:
+        return None
+    parts = name.split('/documents/', 1)[-1].split('/')
+    return parts[-2] if len(parts) >= 2 else None
+
+
+def _write_collection(write):
+    """Collection a Write proto (or dict) targets."""
+    if isinstance(write, dict):
+        target = write.get('delete') or (write.get('update') or {}).get('name')
+    else:
+        target = getattr(write, 'delete', '') or getattr(getattr(write, 'update', None), 'name', '')
+    return _collection(target)
+
+
+class _Histogram:
+    """Cumulative-bucket latency histogram."""
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+    def cumulative(self):
+        total, result = 0, []
+        for count in self.buckets:
+            total += count
+            result.append(total)
+        return result
+
+    def quantile(self, fraction):
+        """Upper bucket bound holding the given quantile (None above the last bucket)."""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        for bound, count in zip(LATENCY_BUCKETS, self.cumulative()):
+            if count >= rank:
+                return bound
+        return None
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum_seconds': round(self.sum, 6),
+            'buckets': {str(bound): count for bound, count in zip(LATENCY_BUCKETS, self.cumulative())},
+            'p50_le': self.quantile(0.50),
+            'p99_le': self.quantile(0.99),
+        }
+
+
+class _StepStats:
+    """Counters for one step."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.runs = 0
+        self.rpcs = Counter()
+        self.auth_calls = Counter()
+        self.reads = Counter()      # per collection
+        self.writes = Counter()
+        self.deletes = Counter()
+        self.latency = {}           # method → _Histogram
+
+    def to_dict(self):
+        return {
+            'seconds': round(self.seconds, 3),
+            'runs': self.runs,
+            'rpcs': dict(self.rpcs),
+            'rpc_total': sum(self.rpcs.values()),
+            'auth_calls': dict(self.auth_calls),
+            'documents_read': sum(self.reads.values()),
+            'writes': sum(self.writes.values()),
+            'deletes': sum(self.deletes.values()),
+            'collections': {
+                name: {'reads': self.reads[name], 'writes': self.writes[name], 'deletes': self.deletes[name]}
+                for name in sorted(set(self.reads) | set(self.writes) | set(self.deletes))
+            },
+            'latency': {method: histogram.to_dict() for method, histogram in sorted(self.latency.items())},
+        }
+
+
+class RpcMetrics:
+    """Thread-safe RPC and document counters.
+
+    Args:
+        profile_dir: If set, step() writes a cProfile dump per step here
+    """
+
+    def __init__(self, profile_dir=None):
+        self._lock = threading.Lock()
+        self.profile_dir = profile_dir
+        self._patched = []
+        self._step_stack = []
+        self._profiling = False
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.rpcs = Counter()
+            self.auth_calls = Counter()
+            self.documents_read = 0
+            self.writes = 0
+            self.deletes = 0
+            self.steps = {}
+
+    def snapshot(self):
+        """Return the current counters as a JSON-serialisable dict."""
+        with self._lock:
+            collections = Counter()
+            for stats in self.steps.values():
+                collections.update({f"{name}.reads": count for name, count in stats.reads.items()})
+                collections.update({f"{name}.writes": count for name, count in stats.writes.items()})
+                collections.update({f"{name}.deletes": count for name, count in stats.deletes.items()})
+            return {
+                'rpcs': dict(self.rpcs),
+                'rpc_total': sum(self.rpcs.values()),
+                'auth_calls': dict(self.auth_calls),
+                'auth_total': sum(self.auth_calls.values()),
+                'documents_read': self.documents_read,
+                'writes': self.writes,
+                'deletes': self.deletes,
+                'collections': dict(sorted(collections.items())),
+            }
+
+    def report(self):
+        """Totals plus the per-step breakdown, as a JSON-serialisable dict."""
+        totals = self.snapshot()
+        with self._lock:
+            steps = {name: stats.to_dict() for name, stats in self.steps.items()}
+        return {'totals': totals, 'steps': steps}
+
+    # Steps
+
+    def _stats(self):
+        """Stats of the current step; call with the lock held."""
+        name = self._step_stack[-1] if self._step_stack else NO_STEP
+        stats = self.steps.get(name)
+        if stats is None:
+            stats = self.steps[name] = _StepStats()
+        return stats
+
+    @contextmanager
+    def step(self, name):
+        """Attribute RPCs made until exit (from any thread) to step `name`.
+
+        Steps may nest; the innermost one gets the RPCs. With profile_dir,
+        the outermost step on the calling thread is profiled into
+        <profile_dir>/<name>.prof.
+        """
+        profiler = None
+        if self.profile_dir and not self._profiling:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profiler = cProfile.Profile()
+            self._profiling = True
+            profiler.enable()
+        with self._lock:
+            self._step_stack.append(name)
+            self._stats()
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                stats = self._stats()
+                stats.seconds += seconds
+                stats.runs += 1
+                self._step_stack.pop()
+            if profiler is not None:
+                profiler.disable()
+                self._profiling = False
+                safe_name = re.sub(r'[^\w.-]+', '_', name)
+                profiler.dump_stats(os.path.join(self.profile_dir, f"{safe_name}.prof"))
+
+    # Recording
+
+    def _record_rpc(self, method, args, kwargs):
+        with self._lock:
+            self.rpcs[method] += 1
+            stats = self._stats()
+            stats.rpcs[method] += 1
+            if method in ('commit', 'batch_write'):
+                writes = _request_field(args, kwargs, 'writes') or []
+                for write in writes:
+                    collection = _write_collection(write) or '?'
+                    if getattr(write, 'delete', '') or (isinstance(write, dict) and write.get('delete')):
+                        self.deletes += 1
+                        stats.deletes[collection] += 1
+                    else:
+                        self.writes += 1
+                        stats.writes[collection] += 1
+
+    def _record_read(self, document_name):
+        with self._lock:
+            self.documents_read += 1
+            self._stats().reads[_collection(document_name) or '?'] += 1
+
+    def _observe(self, method, seconds):
+        with self._lock:
+            latency = self._stats().latency
+            histogram = latency.get(method)
+            if histogram is None:
+                histogram = latency[method] = _Histogram()
+            histogram.observe(seconds)
+
+    def _count_read(self, response, fields):
+        """Count a document read if the response carries one of `fields`.
+
+        'found' and 'document' hold a Document; 'missing' (a billed lookup
+        of a document that doesn't exist) holds just its name.
+        """
+        for field in fields:
+            if field in response:
+                value = getattr(response, field, None)
+                self._record_read(value if isinstance(value, str) else getattr(value, 'name', None))
+                return
+
+    def _wrap_stream(self, responses, fields, method, start):
+        try:
+            for response in responses:
+                self._count_read(response, fields)
+                yield response
+        finally:
+            # Streaming RPCs are timed until the last response
+            self._observe(method, time.perf_counter() - start)
+
+    def _wrap_firestore(self, method, original):
+        metrics = self
+
+        def wrapper(self, *args, **kwargs):
+            metrics._record_rpc(method, args, kwargs)
+            start = time.perf_counter()
+            result = original(self, *args, **kwargs)
+            if method == 'run_query':
+                return metrics._wrap_stream(result, ('document',), method, start)
+            if method == 'batch_get_documents':
+                return metrics._wrap_stream(result, ('found', 'missing'), method, start)
+            metrics._observe(method, time.perf_counter() - start)
+            if method == 'get_document':
+                metrics._record_read(getattr(result, 'name', None))
+            return result
+
+        return wrapper
+
+    def _wrap_auth(self, name, original):
+        metrics = self
+
+        def wrapper(*args, **kwargs):
+            with metrics._lock:
+                metrics.auth_calls[name] += 1
+                metrics._stats().auth_calls[name] += 1
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                metrics._observe(f"auth.{name}", time.perf_counter() - start)
+
+        return wrapper
+
+    def install(self):
+        """Patch the Firestore GAPIC client and firebase_admin.auth until uninstall()."""
+        from google.cloud.firestore_v1.services.firestore.client import FirestoreClient
+        from firebase_admin import auth
+
+        for method in FIRESTORE_RPCS:
+            original = getattr(FirestoreClient, method, None)
+            if original is not None:
+                setattr(FirestoreClient, method, self._wrap_firestore(method, original))
+                self._patched.append((FirestoreClient, method, original))
+        for name in AUTH_CALLS:
+            original = getattr(auth, name, None)
+            if original is not None:
+                setattr(auth, name, self._wrap_auth(name, original))
+                self._patched.append((auth, name, original))
+
+    def uninstall(self):
+        for owner, name, original in reversed(self._patched):
+            setattr(owner, name, original)
+        self._patched = []
+
+    @contextmanager
+    def instrument(self):
+        """Patch the Firestore GAPIC client and firebase_admin.auth while active."""
+        self.install()
+        try:
+            yield self
+        finally:
+            self.uninstall()
+
+    # Export
+
+    def to_json(self):
+        return json.dumps(self.report(), indent=2)
+
+    def to_prometheus(self):
+        """Prometheus text exposition of the per-step counters and histograms."""
+        report = self.report()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}")
+
+        steps = report['steps']
+        metric('btrips_step_duration_seconds', 'gauge', "Wall time spent in each step.",
+               [({'step': step}, stats['seconds']) for step, stats in steps.items()])
+        metric('btrips_firestore_rpcs_total', 'counter', "Firestore RPCs by step and method.",
+               [({'step': step, 'method': method}, count)
+                for step, stats in steps.items() for method, count in sorted(stats['rpcs'].items())])
+        metric('btrips_firestore_documents_total', 'counter', "Documents read, written and deleted.",
+               [({'step': step, 'collection': collection, 'op': op}, counts[op])
+                for step, stats in steps.items() for collection, counts in stats['collections'].items()
+                for op in ('reads', 'writes', 'deletes') if counts[op]])
+        metric('btrips_auth_calls_total', 'counter', "firebase_admin.auth calls by step.",
+               [({'step': step, 'call': call}, count)
+                for step, stats in steps.items() for call, count in sorted(stats['auth_calls'].items())])
+
+        lines.append("# HELP btrips_rpc_latency_seconds Firestore RPC and Auth call latency.")
+        lines.append("# TYPE btrips_rpc_latency_seconds histogram")
+        for step, stats in steps.items():
+            for method, histogram in stats['latency'].items():
+                labels = f'step="{step}",method="{method}"'
+                for bound, count in histogram['buckets'].items():
+                    lines.append(f'btrips_rpc_latency_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'btrips_rpc_latency_seconds_bucket{{{labels},le="+Inf"}} {histogram["count"]}')
+                lines.append(f'btrips_rpc_latency_seconds_sum{{{labels}}} {histogram["sum_seconds"]}')
+                lines.append(f'btrips_rpc_latency_seconds_count{{{labels}}} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Write the report to `path`: Prometheus text for .prom/.txt, JSON otherwise."""
+        text = self.to_prometheus() if path.endswith(('.prom', '.txt')) else self.to_json()
+        with open(path, 'w') as f:
+            f.write(text)
+
+    def print_steps(self):
+        """One line per step: wall time and what it cost."""
+        steps = self.report()['steps']
+        if not steps:
+            return
+        print("\n📈 Cost per step:")
+        for name, stats in sorted(steps.items(), key=lambda item: -item[1]['seconds']):
+            auth = sum(stats['auth_calls'].values())
+            print(f"   {name}: {stats['seconds']}s, {stats['rpc_total']} RPCs, "
+                  f"{stats['documents_read']} reads, {stats['writes']} writes, "
+                  f"{stats['deletes']} deletes, {auth} Auth calls")
+
+
+def add_metrics_arguments(parser):
+    """Add --metrics-out and --profile-dir to a script's argument parser."""
+    parser.add_argument('--metrics-out',
+                        help="At exit, write RPC/read/write/Auth counts per step and collection with "
+                             "latency histograms here (.prom for Prometheus text, otherwise JSON)")
+    parser.add_argument('--profile-dir',
+                        help="Write a cProfile dump (<step>.prof) per step into this directory")
+
+
+def start_metrics(args):
+    """Instrument the clients for the rest of the run if --metrics-out or --profile-dir was given.
+
+    The report is printed and written when the process exits.
+
+    Returns:
+        RpcMetrics, or None when metrics are off
+    """
+    global _active
+    if not (args.metrics_out or args.profile_dir):
+        return None
+    metrics = RpcMetrics(profile_dir=args.profile_dir)
+    metrics.install()
+    _active = metrics
+
+    def finish():
+        metrics.uninstall()
+        metrics.print_steps()
+        if args.metrics_out:
+            metrics.write(args.metrics_out)
+            print(f"💾 Metrics written to {args.metrics_out}")
+        if args.profile_dir:
+            print(f"💾 cProfile dumps in {args.profile_dir}/")
+
+    atexit.register(finish)
+    return metrics
+
+
+def step(name):
+    """Context manager marking a step on the metrics from start_metrics() (no-op when off)."""
+    return _active.step(name) if _active is not None else nullcontext()
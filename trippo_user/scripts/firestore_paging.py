@@ -0,0 +1,86 @@
+"""
+Cursor-based pagination for the BTrips Firestore admin scripts.
+
+Instead of one long stream() over a whole collection, pages are fetched
+with order_by(__name__) + start_after(<last doc>) queries. A page is a
+natural unit of work to checkpoint, and a run can resume after any
+document ID.
+
+Read-only paths can also project to the fields they need with select(),
+so only those fields cross the wire, and stream (doc_id, data) pairs with
+at most one page held in memory.
+
+Usage:
+    from firestore_paging import iter_documents, iter_pages
+
+    for page in iter_pages(db.collection('Drivers'), page_size=500, start_after=last_id):
+        ...
+        last_id = page[-1].id
+
+    for doc_id, data in iter_documents(db.collection('Drivers'), ['name', 'Car Type']):
+        ...
+"""
+
+# Firestore's special field path for the document ID
+DOCUMENT_ID = '__name__'
+
+DEFAULT_PAGE_SIZE = 500
+
+
+def _field_path(name):
+    """Quote field names that aren't plain identifiers (e.g. legacy 'Car Name')."""
+    if ' ' not in name:
+        return name
+    from google.cloud.firestore_v1.field_path import FieldPath
+    return FieldPath(name).to_api_repr()
+
+
+def project(query, field_paths):
+    """Apply a select() projection; None means all fields."""
+    if field_paths is None:
+        return query
+    return query.select([_field_path(name) for name in field_paths])
+
+
+def iter_pages(query, page_size=DEFAULT_PAGE_SIZE, start_after=None, field_paths=None, order_by=None):
+    """Yield lists of snapshots ordered by document ID, one page at a time.
+
+    Args:
+        query: Collection reference or query to page through
+        page_size: Documents per page
+        start_after: Document ID (or snapshot) to resume after
+        field_paths: Optional list of fields to download (select projection)
+        order_by: Optional field to order by first (document ID breaks ties);
+            start_after must then be a snapshot, not an ID
+    """
+    query = project(query, field_paths)
+    if order_by:
+        query = query.order_by(_field_path(order_by))
+    query = query.order_by(DOCUMENT_ID)
+    cursor = start_after
+
+    while True:
+        page_query = query.limit(page_size)
+        if isinstance(cursor, str):
+            page_query = page_query.start_after({DOCUMENT_ID: cursor})
+        elif cursor is not None:
+            page_query = page_query.start_after(cursor)
+
+        page = list(page_query.stream())
+        if not page:
+            return
+        yield page
+
+        if len(page) < page_size:
+            return
+        cursor = page[-1]
+
+
+def iter_documents(query, field_paths=None, page_size=DEFAULT_PAGE_SIZE):
+    """Stream (doc_id, data) pairs, decoding each snapshot once.
+
+    Memory stays bounded by one page regardless of collection size.
+    """
+    for page in iter_pages(query, page_size, field_paths=field_paths):
+        for snapshot in page:
+            yield snapshot.id, snapshot.to_dict() or {}
@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+"""
+Export Firestore collections to Parquet / Arrow files and import them back.
+
+An export is a directory with one folder per collection plus manifest.json:
+
+    firestore_export/
+        manifest.json
+        drivers/part-00000.parquet
+        rideHistory/part-00000.parquet
+        ...
+
+Each document is one row. `__id__` holds the document ID, nested maps are
+flattened into one column per field (`driverLoc.geohash`), GeoPoints become
+two float64 columns (`pickupLocation.latitude` / `.longitude`) and
+timestamps a UTC timestamp column, so the files can be analysed directly
+with pandas, DuckDB or Polars. Arrays, references and fields whose type
+varies between documents are stored as tagged JSON strings (except
+ints mixed with floats, which are widened to float). Every column records
+its original field path and kind in the Arrow field metadata, which is
+what the import uses to rebuild the documents.
+
+Collections are exported in parallel. Rows are buffered up to
+--row-group-size and written as one row group, so memory stays bounded
+whatever the collection size; if the fields change between row groups
+(a new field, a field changing type) the next rows go to a new part file.
+
+Import writes the files back in batches of up to 500, and refuses to run
+against a real project unless --allow-production is given: it is meant
+for loading a snapshot into the emulator to rehearse a migration.
+
+Install dependencies:
+    pip install pyarrow
+
+Run:
+    python3 scripts/firestore_snapshot.py export --output firestore_export
+    python3 scripts/firestore_snapshot.py export --collections drivers rideHistory --format arrow
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python3 scripts/firestore_snapshot.py import firestore_export
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+import argparse
+import base64
+import json
+import os
+import sys
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from firebase_client import PROJECT_ID, get_firestore, initialize_firebase, using_emulator
+from firestore_bulk import BatchWriter
+from firestore_paging import DEFAULT_PAGE_SIZE, iter_pages
+
+DEFAULT_COLLECTIONS = ['users', 'drivers', 'userProfiles', 'rideRequests', 'rideHistory', 'Drivers']
+DEFAULT_OUTPUT = 'firestore_export'
+DEFAULT_ROW_GROUP_SIZE = 10000
+DEFAULT_WORKERS = 6
+
+MANIFEST = 'manifest.json'
+FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+ID_COLUMN = '__id__'
+NULLS_COLUMN = '__nulls__'
+
+# Arrow type for each scalar kind; GeoPoints and JSON are handled separately
+ARROW_TYPES = {
+    'bool': pa.bool_(),
+    'int': pa.int64(),
+    'float': pa.float64(),
+    'string': pa.string(),
+    'bytes': pa.binary(),
+    'timestamp': pa.timestamp('us', tz='UTC'),
+}
+
+
+# Encoding ------------------------------------------------------------------
+
+def _flatten(data, prefix=()):
+    """Yield (path tuple, value) for every leaf; non-empty maps are descended into."""
+    for key, value in data.items():
+        path = prefix + (key,)
+        if isinstance(value, dict) and value:
+            yield from _flatten(value, path)
+        else:
+            yield path, value
+
+
+def _kind(value):
+    """Column kind for a single non-null value."""
+    from google.cloud.firestore import GeoPoint
+
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, int):
+        return 'int'
+    if isinstance(value, float):
+        return 'float'
+    if isinstance(value, str):
+        return 'string'
+    if isinstance(value, bytes):
+        return 'bytes'
+    if isinstance(value, datetime):
+        return 'timestamp'
+    if isinstance(value, GeoPoint):
+        return 'geopoint'
+    return 'json'
+
+
+def _column_kind(kinds):
+    """One kind for a column: ints widen to float, anything else mixed is JSON."""
+    if len(kinds) == 1:
+        return next(iter(kinds))
+    if kinds == {'int', 'float'}:
+        return 'float'
+    return 'json'
+
+
+def _tag(value):
+    """json.dumps default= hook for Firestore values that JSON can't hold."""
+    from google.cloud.firestore import DocumentReference, GeoPoint
+
+    if isinstance(value, GeoPoint):
+        return {'__geopoint__': [value.latitude, value.longitude]}
+    if isinstance(value, datetime):
+        return {'__timestamp__': _utc(value).isoformat()}
+    if isinstance(value, bytes):
+        return {'__bytes__': base64.b64encode(value).decode()}
+    if isinstance(value, DocumentReference):
+        return {'__ref__': value.path}
+    raise TypeError(f"Cannot export value of type {type(value).__name__}")
+
+
+def _utc(value):
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _to_json(value):
+    return json.dumps(value, default=_tag, separators=(',', ':'))
+
+
+def _field(name, kind, path, arrow_type):
+    return pa.field(name, arrow_type, metadata={'kind': kind, 'path': json.dumps(list(path))})
+
+
+def build_table(ids, documents):
+    """Encode a chunk of documents as an Arrow table.
+
+    Returns:
+        pyarrow.Table with __id__, __nulls__ and one column per field
+    """
+    rows = []
+    columns = {}
+    for data in documents:
+        row = {}
+        for path, value in _flatten(data):
+            row[path] = value
+            if value is not None:
+                columns.setdefault(path, set()).add(_kind(value))
+        rows.append(row)
+
+    fields = [pa.field(ID_COLUMN, pa.string()), pa.field(NULLS_COLUMN, pa.list_(pa.string()))]
+    arrays = [
+        pa.array(ids, pa.string()),
+        # Explicit nulls, so they are not confused with missing fields on import
+        pa.array([[json.dumps(list(p)) for p, v in row.items() if v is None] for row in rows],
+                 pa.list_(pa.string())),
+    ]
+
+    for path in sorted(columns):
+        kind = _column_kind(columns[path])
+        name = '.'.join(path)
+        values = [row.get(path) for row in rows]
+        if kind == 'geopoint':
+            for axis in ('latitude', 'longitude'):
+                fields.append(_field(f"{name}.{axis}", f"geopoint.{axis}", path, pa.float64()))
+                arrays.append(pa.array([None if v is None else getattr(v, axis) for v in values],
+                                       pa.float64()))
+            continue
+        if kind == 'json':
+            fields.append(_field(name, kind, path, pa.string()))
+            arrays.append(pa.array([None if v is None else _to_json(v) for v in values], pa.string()))
+            continue
+        if kind == 'float':
+            values = [None if v is None else float(v) for v in values]
+        elif kind == 'timestamp':
+            values = [None if v is None else _utc(v) for v in values]
+        fields.append(_field(name, kind, path, ARROW_TYPES[kind]))
+        arrays.append(pa.array(values, ARROW_TYPES[kind]))
+
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def _conform(table, schema):
+    """Cast `table` to an open file's schema, or None if it has fields the file lacks.
+
+    Columns missing from the chunk are filled with nulls.
+    """
+    by_name = {field.name: field for field in table.schema}
+    for name, field in by_name.items():
+        if schema.get_field_index(name) < 0 or not field.equals(schema.field(name), check_metadata=True):
+            return None
+    arrays = [table.column(field.name) if field.name in by_name else pa.nulls(table.num_rows, field.type)
+              for field in schema]
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+class _PartWriter:
+    """Writes tables to part-NNNNN files, starting a new part when the schema changes."""
+
+    def __init__(self, directory, file_format):
+        self.directory = directory
+        self.file_format = file_format
+        self.files = []
+        self._writer = None
+        self._schema = None
+
+    def write(self, table):
+        conformed = _conform(table, self._schema) if self._writer else None
+        if conformed is None:
+            self.close()
+            self._open(table.schema)
+            conformed = table
+        if self.file_format == 'parquet':
+            self._writer.write_table(conformed, row_group_size=conformed.num_rows)
+        else:
+            self._writer.write_table(conformed)
+
+    def _open(self, schema):
+        path = os.path.join(self.directory, f"part-{len(self.files):05d}{FORMATS[self.file_format]}")
+        if self.file_format == 'parquet':
+            self._writer = pq.ParquetWriter(path, schema, compression='zstd')
+        else:
+            self._writer = pa.ipc.new_file(path, schema)
+        self._schema = schema
+        self.files.append(os.path.basename(path))
+
+    def close(self):
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def export_collection(db, collection_name, output_dir, file_format='parquet',
+                      row_group_size=DEFAULT_ROW_GROUP_SIZE, page_size=DEFAULT_PAGE_SIZE):
+    """Stream one collection into part files under output_dir/collection_name.
+
+    Returns:
+        Dict with 'documents' and 'files'
+    """
+    directory = os.path.join(output_dir, collection_name)
+    os.makedirs(directory, exist_ok=True)
+
+    count = 0
+    ids, documents = [], []
+    with _PartWriter(directory, file_format) as writer:
+        for page in iter_pages(db.collection(collection_name), page_size):
+            for snapshot in page:
+                ids.append(snapshot.id)
+                documents.append(snapshot.to_dict() or {})
+            if len(ids) >= row_group_size:
+                writer.write(build_table(ids, documents))
+                count += len(ids)
+                ids, documents = [], []
+        if ids:
+            writer.write(build_table(ids, documents))
+            count += len(ids)
+
+    return {'documents': count, 'files': writer.files}
+
+
+def export_snapshot(db, collections, output_dir=DEFAULT_OUTPUT, file_format='parquet',
+                    row_group_size=DEFAULT_ROW_GROUP_SIZE, page_size=DEFAULT_PAGE_SIZE,
+                    workers=DEFAULT_WORKERS):
+    """Export several collections concurrently and write manifest.json.
+
+    Returns:
+        The manifest dict
+    """
+    print("\n" + "="*60)
+    print(f"📦 EXPORTING {len(collections)} COLLECTION(S) TO {output_dir} ({file_format})")
+    print("="*60)
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {
+        'project': PROJECT_ID,
+        'exportedAt': datetime.now(timezone.utc).isoformat(),
+        'format': file_format,
+        'collections': {},
+    }
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(export_collection, db, name, output_dir, file_format,
+                            row_group_size, page_size): name
+            for name in collections
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            result = future.result()
+            manifest['collections'][name] = result
+            print(f"   ✅ {name}: {result['documents']} documents in {len(result['files'])} file(s)")
+
+    with open(os.path.join(output_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+# Decoding ------------------------------------------------------------------
+
+def _untagger(db):
+    """json.loads object_hook= reversing _tag()."""
+    from google.cloud.firestore import GeoPoint
+
+    def untag(obj):
+        if len(obj) == 1:
+            if '__geopoint__' in obj:
+                return GeoPoint(*obj['__geopoint__'])
+            if '__timestamp__' in obj:
+                return datetime.fromisoformat(obj['__timestamp__'])
+            if '__bytes__' in obj:
+                return base64.b64decode(obj['__bytes__'])
+            if '__ref__' in obj:
+                return db.document(obj['__ref__'])
+        return obj
+    return untag
+
+
+def _assign(data, path, value):
+    target = data
+    for key in path[:-1]:
+        target = target.setdefault(key, {})
+    if isinstance(value, dict) and isinstance(target.get(path[-1]), dict):
+        target[path[-1]].update(value)
+    else:
+        target[path[-1]] = value
+
+
+def decode_batch(db, batch):
+    """Rebuild (document ID, data) pairs from one Arrow record batch."""
+    from google.cloud.firestore import GeoPoint
+
+    untag = _untagger(db)
+    schema = batch.schema
+    ids = batch.column(schema.get_field_index(ID_COLUMN)).to_pylist()
+    documents = [{} for _ in ids]
+
+    geopoints = {}
+    for index, field in enumerate(schema):
+        metadata = field.metadata or {}
+        if b'kind' not in metadata:
+            continue
+        kind = metadata[b'kind'].decode()
+        path = tuple(json.loads(metadata[b'path']))
+        values = batch.column(index).to_pylist()
+        if kind.startswith('geopoint.'):
+            geopoints.setdefault(path, {})[kind.split('.', 1)[1]] = values
+            continue
+        for data, value in zip(documents, values):
+            if value is None:
+                continue
+            _assign(data, path, json.loads(value, object_hook=untag) if kind == 'json' else value)
+
+    for path, axes in geopoints.items():
+        for data, lat, lng in zip(documents, axes['latitude'], axes['longitude']):
+            if lat is not None:
+                _assign(data, path, GeoPoint(lat, lng))
+
+    nulls = batch.column(schema.get_field_index(NULLS_COLUMN)).to_pylist()
+    for data, null_paths in zip(documents, nulls):
+        for encoded in null_paths or []:
+            _assign(data, tuple(json.loads(encoded)), None)
+
+    return list(zip(ids, documents))
+
+
+def _iter_batches(path, batch_size):
+    if path.endswith(FORMATS['parquet']):
+        yield from pq.ParquetFile(path).iter_batches(batch_size=batch_size)
+        return
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        for index in range(reader.num_record_batches):
+            yield reader.get_batch(index)
+
+
+def import_collection(db, collection_name, directory, batch_size=DEFAULT_PAGE_SIZE):
+    """Write every part file in `directory` back into `collection_name`.
+
+    Returns:
+        Number of documents written
+    """
+    collection = db.collection(collection_name)
+    files = sorted(f for f in os.listdir(directory) if f.endswith(tuple(FORMATS.values())))
+    count = 0
+    for name in files:
+        for batch in _iter_batches(os.path.join(directory, name), batch_size):
+            with BatchWriter(db) as writer:
+                for doc_id, data in decode_batch(db, batch):
+                    writer.set(collection.document(doc_id), data)
+            count += batch.num_rows
+    return count
+
+
+def import_snapshot(db, input_dir, collections=None, workers=DEFAULT_WORKERS):
+    """Import an export directory, several collections at a time.
+
+    Returns:
+        Dict of collection name → documents written
+    """
+    with open(os.path.join(input_dir, MANIFEST)) as f:
+        manifest = json.load(f)
+    names = collections or list(manifest['collections'])
+
+    print("\n" + "="*60)
+    print(f"📥 IMPORTING {len(names)} COLLECTION(S) FROM {input_dir}")
+    print("="*60)
+    print(f"   Snapshot of {manifest['project']} taken {manifest['exportedAt']}")
+
+    written = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(import_collection, db, name, os.path.join(input_dir, name)): name
+            for name in names
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            written[name] = future.result()
+            print(f"   ✅ {name}: {written[name]} documents")
+    return written
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export Firestore to Parquet/Arrow files or import them back")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help="Stream collections into Parquet / Arrow files")
+    export.add_argument('--output', default=DEFAULT_OUTPUT,
+                        help=f"Export directory (default: {DEFAULT_OUTPUT})")
+    export.add_argument('--collections', nargs='+', default=DEFAULT_COLLECTIONS,
+                        help=f"Collections to export (default: {' '.join(DEFAULT_COLLECTIONS)})")
+    export.add_argument('--format', choices=sorted(FORMATS), default='parquet',
+                        help="File format (default: parquet)")
+    export.add_argument('--row-group-size', type=int, default=DEFAULT_ROW_GROUP_SIZE,
+                        help=f"Documents buffered per row group (default: {DEFAULT_ROW_GROUP_SIZE})")
+    export.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f"Documents read per page (default: {DEFAULT_PAGE_SIZE})")
+    export.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f"Collections exported in parallel (default: {DEFAULT_WORKERS})")
+
+    load = commands.add_parser('import', help="Write an export back into Firestore (the emulator by default)")
+    load.add_argument('input', help="Export directory containing manifest.json")
+    load.add_argument('--collections', nargs='+',
+                      help="Only import these collections (default: all in the manifest)")
+    load.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                      help=f"Collections imported in parallel (default: {DEFAULT_WORKERS})")
+    load.add_argument('--allow-production', action='store_true',
+                      help="Allow importing without FIRESTORE_EMULATOR_HOST set")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.command == 'import' and not (using_emulator() or args.allow_production):
+        print("❌ FIRESTORE_EMULATOR_HOST not set")
+        print("\n📋 Imports overwrite documents, so they only run against the emulator:")
+        print("   FIRESTORE_EMULATOR_HOST=localhost:8080 python3 scripts/firestore_snapshot.py import ...")
+        print("   (or pass --allow-production)")
+        sys.exit(1)
+
+    if not initialize_firebase():
+        sys.exit(1)
+    db = get_firestore()
+
+    if args.command == 'export':
+        manifest = export_snapshot(db, args.collections, args.output, args.format,
+                                   args.row_group_size, args.page_size, args.workers)
+        total = sum(c['documents'] for c in manifest['collections'].values())
+        print(f"\n📊 {total} documents exported to {args.output}")
+    else:
+        written = import_snapshot(db, args.input, args.collections, args.workers)
+        print(f"\n📊 {sum(written.values())} documents imported")
+
+
+if __name__ == "__main__":
+    main()
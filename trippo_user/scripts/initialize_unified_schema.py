@@ -7,48 +7,17 @@ This script is safe to run multiple times.
 
 Usage:
     python3 scripts/initialize_unified_schema.py
+    python3 scripts/initialize_unified_schema.py --metrics-out schema_metrics.prom
 """
 
-import firebase_admin
-from firebase_admin import credentials, firestore
-from google.cloud.firestore import GeoPoint
-from datetime import datetime
-import os
+import argparse
 import sys
 
-def initialize_firebase():
-    """Initialize Firebase Admin SDK."""
-    try:
-        app = firebase_admin.get_app()
-        print("✅ Using existing Firebase app")
-        return app
-    except ValueError:
-        print("🔄 Initializing Firebase Admin SDK...")
-        
-        PROJECT_ID = "btrips-42089"
-        
-        possible_paths = [
-            'firestore_credentials.json',
-            'serviceAccountKey.json',
-        ]
-        
-        for path in possible_paths:
-            if os.path.exists(path):
-                print(f"📁 Found service account key at: {path}")
-                cred = credentials.Certificate(path)
-                app = firebase_admin.initialize_app(cred, {'projectId': PROJECT_ID})
-                print("✅ Initialized with service account key")
-                return app
-        
-        try:
-            cred = credentials.ApplicationDefault()
-            app = firebase_admin.initialize_app(cred, {'projectId': PROJECT_ID})
-            print("✅ Initialized with Application Default Credentials")
-            return app
-        except Exception as e:
-            print("❌ Could not initialize Firebase Admin SDK")
-            print(f"Error: {e}")
-            return None
+from consolidate_rides import count_user_rides, list_user_ride_collections
+from firebase_client import get_firestore, initialize_firebase
+from firestore_counts import count_documents
+from firestore_metrics import add_metrics_arguments, start_metrics, step
+from firestore_paging import iter_documents
 
 
 def verify_collections(db):
@@ -62,14 +31,20 @@ def verify_collections(db):
     
     print(f"\nFound {len(collection_names)} collections:")
     for name in collection_names:
-        count = len(list(db.collection(name).limit(100).stream()))
+        count = count_documents(db, name)
         print(f"   • {name}: {count} documents")
     
     return collection_names
 
 
-def check_schema_readiness(db):
-    """Check if new schema collections exist."""
+def check_schema_readiness(db, filters=None):
+    """Check if new schema collections exist.
+    
+    Args:
+        db: Firestore client
+        filters: Optional dict of collection name → list of (field, op, value)
+            to count only matching documents, e.g. {'rideRequests': [('status', '==', 'pending')]}
+    """
     print("\n" + "="*60)
     print("🔍 CHECKING NEW SCHEMA READINESS")
     print("="*60)
@@ -82,12 +57,12 @@ def check_schema_readiness(db):
         'rideHistory': 'Completed rides',
     }
     
+    filters = filters or {}
     status = {}
     for col_name, description in collections.items():
         try:
-            docs = list(db.collection(col_name).limit(1).stream())
-            exists = len(docs) > 0
-            count = len(list(db.collection(col_name).stream()))
+            count = count_documents(db, col_name, filters.get(col_name))
+            exists = count > 0
             status[col_name] = {'exists': exists, 'count': count}
             
             if exists:
@@ -108,34 +83,44 @@ def display_migration_plan(db):
     print("="*60)
     
     # Count old drivers
-    old_drivers = list(db.collection('Drivers').stream())
-    print(f"\n🚗 Drivers to migrate: {len(old_drivers)}")
+    old_drivers_count = count_documents(db, 'Drivers')
+    print(f"\n🚗 Drivers to migrate: {old_drivers_count}")
     
-    for driver_doc in old_drivers:
-        driver_data = driver_doc.to_dict()
-        print(f"   • {driver_doc.id}")
+    planned_fields = ['name', 'Car Name', 'Car Type']
+    for driver_id, driver_data in iter_documents(db.collection('Drivers'), planned_fields):
+        print(f"   • {driver_id}")
         print(f"     → Name: {driver_data.get('name')}")
         print(f"     → Car: {driver_data.get('Car Name')} ({driver_data.get('Car Type')})")
     
-    # Check for user ride history collections
-    all_collections = [col.id for col in db.collections()]
-    user_collections = [c for c in all_collections if '@' in c]
+    # Check for user ride history collections (counted concurrently)
+    user_collections = list_user_ride_collections(db)
+    ride_counts = count_user_rides(db, user_collections)
     
     print(f"\n👤 User ride history collections: {len(user_collections)}")
-    for col in user_collections:
-        ride_count = len(list(db.collection(col).stream()))
+    for col, ride_count in ride_counts.items():
         print(f"   • {col}: {ride_count} rides")
     
     print(f"\n🔄 Migration will:")
     print(f"   1. Create 'users' collection with userType field")
-    print(f"   2. Migrate {len(old_drivers)} drivers to new 'drivers' collection")
+    print(f"   2. Migrate {old_drivers_count} drivers to new 'drivers' collection")
     print(f"   3. Keep old 'Drivers' collection (backward compatibility)")
     print(f"   4. Create 'userProfiles' for regular users")
     print(f"   5. Preserve all ride history data")
+    print(f"   6. Optionally (--consolidate-rides) copy {sum(ride_counts.values())} per-user rides "
+          f"into rideRequests / rideHistory")
+    print(f"\n💡 Exact per-document changes and cost: "
+          f"python3 scripts/migrate_to_unified_schema.py --dry-run")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Check readiness for the unified schema migration")
+    add_metrics_arguments(parser)
+    return parser.parse_args(argv)
 
 
-def main():
+def main(argv=None):
     """Main function."""
+    args = parse_args(argv)
     print("\n" + "="*60)
     print("🚀 BTRIPS UNIFIED APP - SCHEMA INITIALIZATION")
     print("="*60)
@@ -144,16 +129,20 @@ def main():
     if not app:
         sys.exit(1)
     
-    db = firestore.client()
+    db = get_firestore()
+    start_metrics(args)
     
     # Step 1: Verify current collections
-    verify_collections(db)
+    with step('verify_collections'):
+        verify_collections(db)
     
     # Step 2: Check new schema readiness
-    check_schema_readiness(db)
+    with step('check_schema_readiness'):
+        check_schema_readiness(db)
     
     # Step 3: Show migration plan
-    display_migration_plan(db)
+    with step('display_migration_plan'):
+        display_migration_plan(db)
     
     # Conclusion
     print("\n" + "="*60)
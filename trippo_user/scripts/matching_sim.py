@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""
+Discrete-event replay of ride matching for offline policy evaluation.
+
+Replays historical rides (rideRequests + rideHistory, ordered by
+requestedAt) or synthetic ones against a fleet loaded from `drivers`, and
+models the app's matching rules:
+
+- drivers only see pending rides of their own vehicle type, newest first,
+  at most FEED_LIMIT of them (FirebaseConstants.nearbyDriversLimit)
+- a driver who declines is added to the ride's declinedBy and never sees
+  it again
+- accepting re-reads the ride and fails with "no longer available" unless
+  it is still pending. The check and the update are separate requests, so
+  two accepts less than --accept-latency apart both pass: these are
+  reported as races (double acceptance)
+
+A new ride is pushed to idle drivers of its type within --radius-km (all
+of them, as the app's feed does, or only the --offer-k nearest). Each
+driver reviews one ride at a time, answers after an exponential delay and
+accepts with probability --accept-prob * exp(-pickup km / --accept-decay-km).
+Drivers that finish reviewing or drop off a rider pull the newest ride
+from their feed. Unaccepted rides are cancelled after --max-wait seconds.
+
+Events live in one heapq of (time, seq, kind, a, b) tuples; ride requests
+are merged in from the sorted ride list instead of being pushed up front,
+so the heap only holds in-flight work. Idle drivers are kept in a grid of
+--cell-km cells per vehicle type, so finding drivers near a pickup only
+scans nearby cells. Pure standard library; runs millions of events per
+minute on one core.
+
+Run:
+    python3 scripts/matching_sim.py --synthetic-rides 200000 --synthetic-drivers 2000 --hours 4
+    python3 scripts/matching_sim.py --demand-scale 3 --offer-k 5     # replay Firestore at 3x demand
+"""
+
+from collections import Counter
+from heapq import heappop, heappush
+import argparse
+import json
+import math
+import random
+import sys
+import time
+
+from fares import estimate_trip
+
+KM_PER_DEGREE = 111.32
+FEED_LIMIT = 20
+
+# Event kinds
+RESPONSE, COMPLETE, EXPIRE = 1, 2, 3
+
+# Ride states
+PENDING, ACCEPTED, EXPIRED = 0, 1, 2
+
+
+class MatchingPolicy:
+    """Tunable matching and driver-behaviour parameters."""
+
+    def __init__(self, offer_k=0, radius_km=10.0, response_seconds=20.0, accept_prob=0.8,
+                 accept_decay_km=8.0, max_wait=600.0, speed_kmh=30.0, accept_latency=0.3,
+                 cell_km=5.0):
+        self.offer_k = offer_k
+        self.radius_km = radius_km
+        self.response_seconds = response_seconds
+        self.accept_prob = accept_prob
+        self.accept_decay_km = accept_decay_km
+        self.max_wait = max_wait
+        self.speed_kmh = speed_kmh
+        self.accept_latency = accept_latency
+        self.cell_km = cell_km
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def _summary(values, digits=1):
+    values = sorted(values)
+    result = {name: _percentile(values, fraction)
+              for name, fraction in (('p50', 0.50), ('p90', 0.90), ('p99', 0.99))}
+    result['max'] = values[-1] if values else None
+    return {name: None if value is None else round(value, digits) for name, value in result.items()}
+
+
+class MatchingSimulator:
+    """Event-driven matching model.
+
+    Args:
+        drivers: List of (driver ID, lat, lng, vehicle type)
+        rides: List of (requested seconds, pickup lat, pickup lng, dropoff lat,
+            dropoff lng, vehicle type, trip seconds), in any order
+        policy: MatchingPolicy
+        seed: RNG seed for response delays and accept decisions
+    """
+
+    def __init__(self, drivers, rides, policy=None, seed=42):
+        self.policy = policy or MatchingPolicy()
+        self.rng = random.Random(seed)
+        rides = sorted(rides)
+
+        lats = [d[1] for d in drivers] + [r[1] for r in rides]
+        mean_lat = sum(lats) / len(lats) if lats else 0.0
+        # Equirectangular km coordinates: accurate to well under 1% at city scale
+        self._lng_km = KM_PER_DEGREE * math.cos(math.radians(mean_lat))
+
+        self.type_names = sorted({d[3] for d in drivers} | {r[5] for r in rides})
+        type_code = {name: code for code, name in enumerate(self.type_names)}
+
+        self.driver_ids = [d[0] for d in drivers]
+        self.driver_x = [d[2] * self._lng_km for d in drivers]
+        self.driver_y = [d[1] * KM_PER_DEGREE for d in drivers]
+        self.driver_type = [type_code[d[3]] for d in drivers]
+        self.driver_cell = [None] * len(drivers)
+        self.busy_seconds = [0.0] * len(drivers)
+
+        self.ride_time = [r[0] for r in rides]
+        self.ride_x = [r[2] * self._lng_km for r in rides]
+        self.ride_y = [r[1] * KM_PER_DEGREE for r in rides]
+        self.drop_x = [r[4] * self._lng_km for r in rides]
+        self.drop_y = [r[3] * KM_PER_DEGREE for r in rides]
+        self.ride_type = [type_code[r[5]] for r in rides]
+        self.trip_seconds = [r[6] for r in rides]
+        self.ride_state = [PENDING] * len(rides)
+        self.accepted_at = [None] * len(rides)
+        self.declined_by = [None] * len(rides)
+
+        self.pending = [dict() for _ in self.type_names]   # insertion order = request order
+        self.grid = {}
+        self.counts = Counter()
+        self.wait_seconds = []
+        self.declines_per_ride = Counter()
+        self._rings = self._cell_rings()
+        self._heap = []
+        self._seq = 0
+        self._idle = 0
+        self._idle_area = 0.0
+        self._last_time = 0.0
+        self._demand_end = self.ride_time[-1] if rides else 0.0
+
+    # Idle-driver grid
+
+    def _cell(self, code, x, y):
+        size = self.policy.cell_km
+        return (code, int(x // size), int(y // size))
+
+    def _set_idle(self, driver, now):
+        cell = self._cell(self.driver_type[driver], self.driver_x[driver], self.driver_y[driver])
+        self.grid.setdefault(cell, set()).add(driver)
+        self.driver_cell[driver] = cell
+        self._track_idle(now, 1)
+
+    def _clear_idle(self, driver, now):
+        self.grid[self.driver_cell[driver]].discard(driver)
+        self.driver_cell[driver] = None
+        self._track_idle(now, -1)
+
+    def _track_idle(self, now, delta):
+        # Idle time only counts while rides are still being requested
+        end = self._demand_end
+        self._idle_area += self._idle * (min(now, end) - min(self._last_time, end))
+        self._last_time = now
+        self._idle += delta
+
+    def _cell_rings(self):
+        """Grid offsets within radius_km of a cell, grouped by their minimum distance."""
+        size, radius = self.policy.cell_km, self.policy.radius_km
+        reach = int(radius // size) + 1
+        rings = {}
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                min_km = math.hypot(max(abs(dx) - 1, 0), max(abs(dy) - 1, 0)) * size
+                if min_km <= radius:
+                    rings.setdefault(min_km, []).append((dx, dy))
+        return sorted(rings.items())
+
+    def _idle_near(self, code, x, y, limit):
+        """(km, driver) of idle drivers within radius_km, nearest first."""
+        radius, size, grid = self.policy.radius_km, self.policy.cell_km, self.grid
+        driver_x, driver_y, hypot = self.driver_x, self.driver_y, math.hypot
+        cx, cy = int(x // size), int(y // size)
+        found = []
+        for min_km, offsets in self._rings:
+            if limit and len(found) >= limit:
+                found.sort()
+                if min_km > found[limit - 1][0]:
+                    break
+            for dx, dy in offsets:
+                drivers = grid.get((code, cx + dx, cy + dy))
+                if drivers:
+                    for driver in drivers:
+                        km = hypot(driver_x[driver] - x, driver_y[driver] - y)
+                        if km <= radius:
+                            found.append((km, driver))
+        found.sort()
+        return found[:limit] if limit else found
+
+    # Events
+
+    def _push(self, when, kind, a, b=None):
+        self._seq += 1
+        heappush(self._heap, (when, self._seq, kind, a, b))
+
+    def _offer(self, driver, ride, now):
+        self.counts['offers'] += 1
+        self._push(now + self.rng.expovariate(1.0 / self.policy.response_seconds), RESPONSE, driver, ride)
+
+    def _request(self, ride, now):
+        code = self.ride_type[ride]
+        self.pending[code][ride] = None
+        self._push(now + self.policy.max_wait, EXPIRE, ride)
+        for _, driver in self._idle_near(code, self.ride_x[ride], self.ride_y[ride], self.policy.offer_k):
+            self._clear_idle(driver, now)
+            self._offer(driver, ride, now)
+
+    def _pull(self, driver, now):
+        """Offer the driver the newest pending ride in their feed, else mark them idle."""
+        x, y = self.driver_x[driver], self.driver_y[driver]
+        radius = self.policy.radius_km
+        pending = self.pending[self.driver_type[driver]]
+        for seen, ride in enumerate(reversed(pending)):
+            if seen == FEED_LIMIT:
+                break
+            declined = self.declined_by[ride]
+            if declined is not None and driver in declined:
+                continue
+            if math.hypot(self.ride_x[ride] - x, self.ride_y[ride] - y) <= radius:
+                self._offer(driver, ride, now)
+                return
+        self._set_idle(driver, now)
+
+    def _response(self, driver, ride, now):
+        policy, counts = self.policy, self.counts
+        state = self.ride_state[ride]
+        if state == EXPIRED or (state == ACCEPTED and now - self.accepted_at[ride] >= policy.accept_latency):
+            # The ride left the feed before the driver got to it
+            counts['missed'] += 1
+            self._pull(driver, now)
+            return
+
+        pickup_km = math.hypot(self.ride_x[ride] - self.driver_x[driver],
+                               self.ride_y[ride] - self.driver_y[driver])
+        if self.rng.random() >= policy.accept_prob * math.exp(-pickup_km / policy.accept_decay_km):
+            counts['declines'] += 1
+            self.declines_per_ride[ride] += 1
+            if self.declined_by[ride] is None:
+                self.declined_by[ride] = set()
+            self.declined_by[ride].add(driver)
+            self._pull(driver, now)
+            return
+
+        if state == ACCEPTED:
+            # Both accepts passed the pending check: the later update wins in Firestore
+            counts['races'] += 1
+        else:
+            counts['accepted'] += 1
+            self.ride_state[ride] = ACCEPTED
+            self.accepted_at[ride] = now
+            self.wait_seconds.append(now - self.ride_time[ride])
+            del self.pending[self.ride_type[ride]][ride]
+
+        busy = pickup_km / policy.speed_kmh * 3600 + self.trip_seconds[ride]
+        self.busy_seconds[driver] += busy
+        self._push(now + busy, COMPLETE, driver, ride)
+
+    def _complete(self, driver, ride, now):
+        self.counts['completed'] += 1
+        self.driver_x[driver] = self.drop_x[ride]
+        self.driver_y[driver] = self.drop_y[ride]
+        self._pull(driver, now)
+
+    def _expire(self, ride, now):
+        if self.ride_state[ride] == PENDING:
+            self.counts['expired'] += 1
+            self.ride_state[ride] = EXPIRED
+            del self.pending[self.ride_type[ride]][ride]
+
+    def run(self):
+        """Process every event.
+
+        Returns:
+            Number of events processed
+        """
+        heap, ride_time = self._heap, self.ride_time
+        start = ride_time[0] if ride_time else 0.0
+        self._last_time = start
+        for driver in range(len(self.driver_ids)):
+            self._set_idle(driver, start)
+
+        handlers = {RESPONSE: self._response, COMPLETE: self._complete}
+        expire = self._expire
+        next_ride, ride_count, events = 0, len(ride_time), 0
+        while heap or next_ride < ride_count:
+            if next_ride < ride_count and (not heap or ride_time[next_ride] <= heap[0][0]):
+                self._request(next_ride, ride_time[next_ride])
+                next_ride += 1
+            else:
+                now, _, kind, a, b = heappop(heap)
+                if kind == EXPIRE:
+                    expire(a, now)
+                else:
+                    handlers[kind](a, b, now)
+            events += 1
+
+        self._track_idle(self._last_time, 0)
+        self.started, self.finished = start, self._last_time
+        self.counts['events'] = events
+        return events
+
+    def report(self):
+        """Time-to-accept, decline churn and fleet utilisation after run()."""
+        counts = self.counts
+        rides = len(self.ride_time)
+        horizon = max(self.finished - self.started, 1e-9)
+        demand_window = max(self._demand_end - self.started, 1e-9)
+        fleet = len(self.driver_ids)
+        utilisation = sorted(min(busy / horizon, 1.0) for busy in self.busy_seconds)
+        declined = list(self.declines_per_ride.values())
+        return {
+            'rides': rides,
+            'drivers': fleet,
+            'demandHours': round(demand_window / 3600, 2),
+            'simulatedHours': round(horizon / 3600, 2),
+            'events': counts['events'],
+            'accepted': counts['accepted'],
+            'expired': counts['expired'],
+            'acceptRate': round(counts['accepted'] / rides, 4) if rides else None,
+            'timeToAcceptSeconds': _summary(self.wait_seconds),
+            'offers': counts['offers'],
+            'declines': counts['declines'],
+            'declinesPerRide': round(counts['declines'] / rides, 3) if rides else None,
+            'ridesDeclinedAtLeastOnce': len(declined),
+            'declinesOnDeclinedRides': _summary(declined, 0),
+            'missedOffers': counts['missed'],
+            'doubleAcceptRaces': counts['races'],
+            'fleetUtilisation': round(sum(self.busy_seconds) / (fleet * horizon), 4) if fleet else None,
+            'driverUtilisation': _summary(utilisation, 3),
+            'meanIdleDrivers': round(self._idle_area / demand_window, 1),
+        }
+
+
+def load_drivers(db, collection_name='drivers', statuses=('Idle', 'Busy')):
+    """(id, lat, lng, vehicle type) for drivers with a location and one of `statuses`.
+
+    Legacy 'Drivers' documents use 'Car Type' instead of carType.
+    """
+    from firestore_paging import iter_documents
+
+    type_field = 'Car Type' if collection_name == 'Drivers' else 'carType'
+    drivers = []
+    for doc_id, data in iter_documents(db.collection(collection_name),
+                                       ['driverLoc', type_field, 'driverStatus']):
+        geopoint = (data.get('driverLoc') or {}).get('geopoint')
+        if geopoint is None or data.get('driverStatus', 'Offline') not in statuses:
+            continue
+        drivers.append((doc_id, geopoint.latitude, geopoint.longitude, data.get(type_field) or 'Sedan'))
+    return drivers
+
+
+def _ride_tuple(requested_at, pickup, dropoff, vehicle_type, duration):
+    if duration is None:
+        _, duration, _ = estimate_trip(pickup.latitude, pickup.longitude,
+                                       dropoff.latitude, dropoff.longitude, vehicle_type)
+    return (requested_at.timestamp(), pickup.latitude, pickup.longitude,
+            dropoff.latitude, dropoff.longitude, vehicle_type, float(duration) * 60)
+
+
+def load_rides(db, collection_names=('rideRequests', 'rideHistory')):
+    """Simulator ride tuples for every ride with a request time and both locations."""
+    from firestore_paging import iter_documents
+
+    fields = ['requestedAt', 'pickupLocation', 'dropoffLocation', 'vehicleType', 'duration']
+    rides = []
+    for collection_name in collection_names:
+        for _, ride in iter_documents(db.collection(collection_name), fields):
+            pickup, dropoff, requested_at = ride.get('pickupLocation'), ride.get('dropoffLocation'), ride.get('requestedAt')
+            if pickup is None or dropoff is None or requested_at is None:
+                continue
+            rides.append(_ride_tuple(requested_at, pickup, dropoff,
+                                     ride.get('vehicleType') or 'Sedan', ride.get('duration')))
+    return rides
+
+
+def synthetic_inputs(rides, drivers, hours, seed=42):
+    """Drivers and rides from synthetic_data.SyntheticFleet, requested within `hours`."""
+    from synthetic_data import SyntheticFleet
+
+    fleet = SyntheticFleet(seed=seed, drivers=drivers, riders=max(1, rides // 10), days=hours / 24)
+    fleet_drivers = []
+    for index in range(drivers):
+        data = fleet.legacy_driver(index)
+        geopoint = data['driverLoc']['geopoint']
+        fleet_drivers.append((data['email'], geopoint.latitude, geopoint.longitude, data['Car Type']))
+    fleet_rides = []
+    for index in range(rides):
+        _, ride = fleet.ride(index)
+        fleet_rides.append(_ride_tuple(ride['requestedAt'], ride['pickupLocation'], ride['dropoffLocation'],
+                                       ride['vehicleType'], ride['duration']))
+    return fleet_drivers, fleet_rides
+
+
+def scale_demand(rides, factor):
+    """Compress request times by `factor` (3 = the same rides in a third of the time)."""
+    if not rides or factor == 1:
+        return rides
+    start = min(ride[0] for ride in rides)
+    return [(start + (ride[0] - start) / factor,) + tuple(ride[1:]) for ride in rides]
+
+
+def print_report(report, wall_seconds):
+    wait, util = report['timeToAcceptSeconds'], report['driverUtilisation']
+    print(f"\n📊 {report['rides']} rides over {report['demandHours']} h, {report['drivers']} drivers, "
+          f"{report['simulatedHours']} simulated hours")
+    print(f"   ✅ Accepted: {report['accepted']} ({report['acceptRate']:.1%}), expired: {report['expired']}")
+    print(f"   ⏱️  Time to accept (s): p50 {wait['p50']}, p90 {wait['p90']}, p99 {wait['p99']}, max {wait['max']}")
+    print(f"   🔁 Offers: {report['offers']}, declines: {report['declines']} "
+          f"({report['declinesPerRide']} per ride, {report['ridesDeclinedAtLeastOnce']} rides declined), "
+          f"missed: {report['missedOffers']}")
+    print(f"   ⚠️  Double-accept races: {report['doubleAcceptRaces']}")
+    print(f"   🚗 Fleet utilisation {report['fleetUtilisation']:.1%} "
+          f"(per driver p50 {util['p50']}, p90 {util['p90']}), "
+          f"mean idle drivers while rides arrive {report['meanIdleDrivers']}")
+    print(f"   ⚡ {report['events']} events in {wall_seconds:.2f}s "
+          f"({report['events'] / max(wall_seconds, 1e-9) * 60 / 1e6:.1f}M events/min)")
+
+
+def parse_args(argv=None):
+    defaults = MatchingPolicy()
+    parser = argparse.ArgumentParser(description="Replay rides against a simulated driver fleet")
+    source = parser.add_argument_group('input')
+    source.add_argument('--drivers', default='drivers', help="Driver collection (default: drivers)")
+    source.add_argument('--driver-status', nargs='+', default=['Idle', 'Busy'],
+                        help="driverStatus values that start online (default: Idle Busy)")
+    source.add_argument('--rides', nargs='+', default=['rideRequests', 'rideHistory'],
+                        help="Ride collections to replay (default: rideRequests rideHistory)")
+    source.add_argument('--synthetic-rides', type=int, default=0,
+                        help="Generate this many synthetic rides instead of reading Firestore")
+    source.add_argument('--synthetic-drivers', type=int, default=1000,
+                        help="Synthetic fleet size (default: 1000)")
+    source.add_argument('--hours', type=float, default=24.0,
+                        help="Synthetic rides are requested within this many hours (default: 24)")
+    source.add_argument('--demand-scale', type=float, default=1.0,
+                        help="Compress request times by this factor to simulate peak demand (default: 1)")
+    source.add_argument('--seed', type=int, default=42, help="RNG seed (default: 42)")
+
+    policy = parser.add_argument_group('policy')
+    policy.add_argument('--offer-k', type=int, default=defaults.offer_k,
+                        help="Push new rides to the k nearest idle drivers (default: 0 = all in range)")
+    policy.add_argument('--radius-km', type=float, default=defaults.radius_km,
+                        help=f"Max pickup distance a driver considers (default: {defaults.radius_km})")
+    policy.add_argument('--response-seconds', type=float, default=defaults.response_seconds,
+                        help=f"Mean driver response time (default: {defaults.response_seconds})")
+    policy.add_argument('--accept-prob', type=float, default=defaults.accept_prob,
+                        help=f"Accept probability for a pickup next door (default: {defaults.accept_prob})")
+    policy.add_argument('--accept-decay-km', type=float, default=defaults.accept_decay_km,
+                        help=f"Pickup distance at which accept odds fall by 1/e (default: {defaults.accept_decay_km})")
+    policy.add_argument('--max-wait', type=float, default=defaults.max_wait,
+                        help=f"Seconds before an unaccepted ride is cancelled (default: {defaults.max_wait:g})")
+    policy.add_argument('--speed-kmh', type=float, default=defaults.speed_kmh,
+                        help=f"Driving speed to the pickup (default: {defaults.speed_kmh:g})")
+    policy.add_argument('--accept-latency', type=float, default=defaults.accept_latency,
+                        help=f"Seconds between the pending check and the accept write (default: {defaults.accept_latency})")
+    policy.add_argument('--cell-km', type=float, default=defaults.cell_km,
+                        help=f"Idle-driver grid cell size (default: {defaults.cell_km:g})")
+    parser.add_argument('--metrics-file', help="Also write the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print("\n" + "="*60)
+    print("🎲 BTRIPS MATCHING SIMULATION")
+    print("="*60)
+
+    start = time.perf_counter()
+    if args.synthetic_rides:
+        drivers, rides = synthetic_inputs(args.synthetic_rides, args.synthetic_drivers, args.hours, args.seed)
+    else:
+        from firebase_client import get_firestore, initialize_firebase
+
+        if not initialize_firebase():
+            sys.exit(1)
+        db = get_firestore()
+        drivers = load_drivers(db, args.drivers, args.driver_status)
+        rides = load_rides(db, args.rides)
+    rides = scale_demand(rides, args.demand_scale)
+    print(f"📥 {len(drivers)} drivers and {len(rides)} rides loaded in {time.perf_counter() - start:.1f}s")
+    if not drivers or not rides:
+        return
+
+    policy = MatchingPolicy(args.offer_k, args.radius_km, args.response_seconds, args.accept_prob,
+                            args.accept_decay_km, args.max_wait, args.speed_kmh, args.accept_latency,
+                            args.cell_km)
+    simulator = MatchingSimulator(drivers, rides, policy, args.seed)
+    start = time.perf_counter()
+    simulator.run()
+    wall_seconds = time.perf_counter() - start
+
+    report = simulator.report()
+    report['wallSeconds'] = round(wall_seconds, 3)
+    print_report(report, wall_seconds)
+    if args.metrics_file:
+        with open(args.metrics_file, 'w') as f:
+            json.dump({'policy': vars(policy), **report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
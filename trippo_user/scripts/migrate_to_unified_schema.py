@@ -7,143 +7,169 @@ This script:
 1. Creates 'users' collection with userType field for existing accounts
 2. Migrates drivers from 'Drivers' collection to new 'drivers' and 'users' collections
 3. Creates 'userProfiles' collection for existing users
-4. Preserves all existing data
+4. Optionally (--consolidate-rides) copies the per-user ride collections
+   into rideRequests / rideHistory (see consolidate_rides.py)
+5. Preserves all existing data
 
 Usage:
     python3 scripts/migrate_to_unified_schema.py
+    python3 scripts/migrate_to_unified_schema.py --parallel --workers 16
+    python3 scripts/migrate_to_unified_schema.py --restart   # ignore saved checkpoint
+    python3 scripts/migrate_to_unified_schema.py --async --concurrency 200
+    python3 scripts/migrate_to_unified_schema.py --consolidate-rides
+    python3 scripts/migrate_to_unified_schema.py --dry-run   # diff + cost estimate, no writes
+    python3 scripts/migrate_to_unified_schema.py --incremental --yes   # only drivers changed since last run
 
 Requirements:
     pip install firebase-admin google-cloud-firestore
 """
 
-import firebase_admin
-from firebase_admin import credentials, firestore, auth
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
 from datetime import datetime
+import argparse
+import asyncio
 import os
 import sys
+import threading
 
-# Initialize Firebase Admin SDK
-def initialize_firebase():
-    """Initialize Firebase Admin SDK."""
+from auth_cache import DEFAULT_CACHE_PATH, MAX_LOOKUP_BATCH, AuthUidResolver
+from consolidate_rides import consolidate_user_rides
+from firebase_client import get_firestore, initialize_firebase
+from firestore_bulk import bulk_create, call_with_backoff, chunked, find_missing, retryable_exceptions
+from firestore_counts import count_collections, count_documents
+from firestore_metrics import add_metrics_arguments, start_metrics, step
+from firestore_paging import DEFAULT_PAGE_SIZE, iter_documents, iter_pages
+from migration_checkpoint import DEFAULT_CHECKPOINT_PATH, FileCheckpointStore, FirestoreCheckpointStore
+from unified_schema import new_driver_data, new_user_data, new_user_profile_data
+
+
+def migrate_driver_doc(db, driver_doc, resolver, verbose=True, write_slots=None):
+    """Migrate one legacy 'Drivers' document to users/{uid} + drivers/{uid}.
+    
+    Args:
+        db: Firestore client
+        driver_doc: Snapshot from the old 'Drivers' collection
+        resolver: AuthUidResolver used to map the driver email to a UID
+        verbose: Print per-driver progress
+        write_slots: Optional semaphore bounding concurrent writes
+    
+    Returns:
+        'migrated' or 'skipped'
+    """
+    log = print if verbose else (lambda *args, **kwargs: None)
+    slot = write_slots if write_slots is not None else nullcontext()
+    
+    driver_data = driver_doc.to_dict()
+    driver_email = driver_doc.id  # Old collection used email as ID
+    
+    log(f"\n📧 Processing: {driver_email}")
+    
+    # Find Firebase Auth user by email (cached / batch-prefetched)
+    user_uid = resolver.resolve(driver_email)
+    if user_uid:
+        log(f"   ✓ Found Firebase Auth user: {user_uid}")
+    else:
+        log(f"   ⚠️  No Firebase Auth user found for {driver_email}")
+        log(f"   → Skipping (driver needs to register via app)")
+        return 'skipped'
+    
+    # Create/update user document in 'users' collection
+    user_doc_ref = db.collection('users').document(user_uid)
+    user_doc = user_doc_ref.get()
+    
+    if not user_doc.exists:
+        # Create new user document
+        with slot:
+            call_with_backoff(lambda: user_doc_ref.set(new_user_data(driver_email, driver_data)))
+        log(f"   ✓ Created users/{user_uid}")
+    else:
+        # Update existing user with userType
+        with slot:
+            call_with_backoff(lambda: user_doc_ref.update({'userType': 'driver'}))
+        log(f"   ✓ Updated users/{user_uid} with userType: 'driver'")
+    
+    # Create/update driver document in 'drivers' collection
+    driver_doc_ref = db.collection('drivers').document(user_uid)
+    
+    # Prepare driver data for new schema
+    driver_fields = new_driver_data(driver_data)
+    
+    with slot:
+        call_with_backoff(lambda: driver_doc_ref.set(driver_fields))
+    log(f"   ✓ Created drivers/{user_uid}")
+    log(f"   → Car: {driver_fields['carName']} ({driver_fields['carType']})")
+    
+    return 'migrated'
+
+
+def _prefetch_uids(resolver, driver_docs):
+    """Warm the resolver cache for a chunk of drivers.
+
+    Best effort: if the batch fails, each driver's own resolve() retries
+    inside its per-document error handling.
+    """
     try:
-        app = firebase_admin.get_app()
-        print("✅ Using existing Firebase app")
-        return app
-    except ValueError:
-        print("🔄 Initializing Firebase Admin SDK...")
-        
-        PROJECT_ID = "btrips-42089"
-        
-        # Try to find service account key
-        possible_paths = [
-            'firestore_credentials.json',
-            'serviceAccountKey.json',
-            os.path.expanduser('~/Downloads/serviceAccountKey.json'),
-        ]
-        
-        for path in possible_paths:
-            if os.path.exists(path):
-                print(f"📁 Found service account key at: {path}")
-                cred = credentials.Certificate(path)
-                app = firebase_admin.initialize_app(cred, {'projectId': PROJECT_ID})
-                print("✅ Initialized with service account key")
-                return app
-        
-        # Try Application Default Credentials
-        try:
-            cred = credentials.ApplicationDefault()
-            app = firebase_admin.initialize_app(cred, {'projectId': PROJECT_ID})
-            print("✅ Initialized with Application Default Credentials")
-            return app
-        except Exception as e:
-            print("❌ Could not initialize Firebase Admin SDK")
-            print(f"Error: {e}")
-            return None
+        resolver.resolve_many([doc.id for doc in driver_docs])
+    except Exception as e:
+        print(f"   ⚠️  Auth prefetch of {len(driver_docs)} driver(s) failed, resolving one by one: {e}")
 
 
-def migrate_drivers_to_new_schema(db):
-    """Migrate drivers from old 'Drivers' collection to new schema."""
+def _iter_with_prefetched_uids(driver_docs, resolver):
+    """Yield driver docs after resolving their emails 100 at a time."""
+    for chunk in chunked(driver_docs, MAX_LOOKUP_BATCH):
+        _prefetch_uids(resolver, chunk)
+        yield from chunk
+
+
+def _resume_state(checkpoint, step):
+    """Return the saved checkpoint state for `step` and report it."""
+    state = checkpoint.get(step) if checkpoint else {}
+    if state.get('done'):
+        print(f"   ⏭️  Step '{step}' already completed in a previous run")
+    elif state.get('cursor'):
+        print(f"   ↩️  Resuming '{step}' after document {state['cursor']}")
+    return state
+
+
+def migrate_drivers_to_new_schema(db, resolver=None, checkpoint=None, page_size=DEFAULT_PAGE_SIZE):
+    """Migrate drivers from old 'Drivers' collection to new schema.
+    
+    Drivers are read page by page; after each page the last document ID is
+    saved to `checkpoint` so a re-run continues from there.
+    """
     print("\n" + "="*60)
     print("🚗 MIGRATING DRIVERS TO NEW SCHEMA")
     print("="*60)
     
+    state = _resume_state(checkpoint, 'drivers')
+    migrated_count = state.get('migrated', 0)
+    skipped_count = state.get('skipped', 0)
+    if state.get('done'):
+        return migrated_count
+    
     try:
-        # Get all documents from old 'Drivers' collection
-        old_drivers = db.collection('Drivers').stream()
-        
-        migrated_count = 0
-        skipped_count = 0
+        resolver = resolver or AuthUidResolver()
         
-        for driver_doc in old_drivers:
-            driver_data = driver_doc.to_dict()
-            driver_email = driver_doc.id  # Old collection used email as ID
-            
-            print(f"\n📧 Processing: {driver_email}")
-            
-            # Try to find Firebase Auth user by email
-            try:
-                firebase_user = auth.get_user_by_email(driver_email)
-                user_uid = firebase_user.uid
-                print(f"   ✓ Found Firebase Auth user: {user_uid}")
-            except auth.UserNotFoundError:
-                print(f"   ⚠️  No Firebase Auth user found for {driver_email}")
-                print(f"   → Skipping (driver needs to register via app)")
-                skipped_count += 1
-                continue
-            
-            # Create/update user document in 'users' collection
-            user_doc_ref = db.collection('users').document(user_uid)
-            user_doc = user_doc_ref.get()
+        # Page through the old 'Drivers' collection
+        for page in iter_pages(db.collection('Drivers'), page_size, state.get('cursor')):
+            _prefetch_uids(resolver, page)
             
-            if not user_doc.exists:
-                # Create new user document
-                user_data = {
-                    'email': driver_email,
-                    'name': driver_data.get('name', 'Driver'),
-                    'userType': 'driver',
-                    'phoneNumber': '',
-                    'createdAt': firestore.SERVER_TIMESTAMP,
-                    'lastLogin': firestore.SERVER_TIMESTAMP,
-                    'isActive': True,
-                    'fcmToken': '',
-                    'profileImageUrl': '',
-                }
-                user_doc_ref.set(user_data)
-                print(f"   ✓ Created users/{user_uid}")
-            else:
-                # Update existing user with userType
-                user_doc_ref.update({'userType': 'driver'})
-                print(f"   ✓ Updated users/{user_uid} with userType: 'driver'")
+            for driver_doc in page:
+                if migrate_driver_doc(db, driver_doc, resolver) == 'migrated':
+                    migrated_count += 1
+                else:
+                    skipped_count += 1
             
-            # Create/update driver document in 'drivers' collection
-            driver_doc_ref = db.collection('drivers').document(user_uid)
-            
-            # Prepare driver data for new schema
-            new_driver_data = {
-                'carName': driver_data.get('Car Name', ''),
-                'carPlateNum': driver_data.get('Car Plate Num', ''),
-                'carType': driver_data.get('Car Type', 'Car'),
-                'rate': driver_data.get('rate', 3.0),
-                'driverStatus': driver_data.get('driverStatus', 'Offline'),
-                'rating': 5.0,  # Default rating
-                'totalRides': 0,  # Default
-                'earnings': 0.0,  # Default
-                'licenseNumber': '',
-                'vehicleRegistration': '',
-                'isVerified': False,
-            }
-            
-            # Migrate location if exists
-            if 'driverLoc' in driver_data:
-                new_driver_data['driverLoc'] = driver_data['driverLoc']
-                
-            driver_doc_ref.set(new_driver_data)
-            print(f"   ✓ Created drivers/{user_uid}")
-            print(f"   → Car: {new_driver_data['carName']} ({new_driver_data['carType']})")
-            
-            migrated_count += 1
+            if checkpoint:
+                checkpoint.save('drivers', page[-1].id, migrated=migrated_count, skipped=skipped_count)
+        
+        if checkpoint:
+            checkpoint.complete('drivers', migrated=migrated_count, skipped=skipped_count)
         
         print(f"\n📊 Migration Summary:")
+        print(f"   🔑 Auth lookups: {resolver.rpc_count} RPC(s), {resolver.cache_hits} cache hit(s)")
         print(f"   ✅ Migrated: {migrated_count} drivers")
         print(f"   ⚠️  Skipped: {skipped_count} (no Auth account)")
         
@@ -154,48 +180,133 @@ def migrate_drivers_to_new_schema(db):
         return 0
 
 
-def create_user_profiles_for_existing_users(db):
+def _migrate_driver_shard(db, shard_index, query, resolver, write_slots):
+    """Migrate every driver returned by one shard query.
+    
+    Errors are counted per document so one bad driver doesn't abort the shard.
+    Drivers still throttled after their retries are re-queued and tried
+    again once the rest of the shard is done.
+    """
+    summary = Counter()
+    throttled = []
+    # collection_group() also matches nested */Drivers subcollections
+    driver_docs = (doc for doc in query.stream() if doc.reference.parent.parent is None)
+    for driver_doc in _iter_with_prefetched_uids(driver_docs, resolver):
+        try:
+            summary[migrate_driver_doc(db, driver_doc, resolver, verbose=False, write_slots=write_slots)] += 1
+        except retryable_exceptions():
+            throttled.append(driver_doc)
+        except Exception as e:
+            summary['failed'] += 1
+            print(f"   ❌ [shard {shard_index}] {driver_doc.id}: {e}")
+    for driver_doc in throttled:
+        try:
+            summary[migrate_driver_doc(db, driver_doc, resolver, verbose=False, write_slots=write_slots)] += 1
+        except Exception as e:
+            summary['failed'] += 1
+            print(f"   ❌ [shard {shard_index}] {driver_doc.id}: {e}")
+    print(f"   ✓ Shard {shard_index}: {summary['migrated']} migrated, "
+          f"{summary['skipped']} skipped, {summary['failed']} failed")
+    return summary
+
+
+def migrate_drivers_parallel(db, workers=8, shards=None, max_in_flight=32, resolver=None):
+    """Migrate drivers using sharded partition queries on a thread pool.
+    
+    The 'Drivers' collection is split into document-ID ranges with a
+    partition query and each range is migrated on its own worker thread.
+    
+    Args:
+        db: Firestore client
+        workers: Number of worker threads
+        shards: Number of partitions to request (default: 4 per worker)
+        max_in_flight: Maximum concurrent write RPCs across all workers
+        resolver: Shared AuthUidResolver (default: on-disk cache)
+    
+    Returns:
+        Counter with 'migrated', 'skipped', 'failed' (drivers) and
+        'failed_shards'
+    """
+    print("\n" + "="*60)
+    print("🚗 MIGRATING DRIVERS TO NEW SCHEMA (PARALLEL)")
+    print("="*60)
+    
+    shards = shards or workers * 4
+    
+    # Partition queries run against collection groups; each shard skips
+    # documents from nested 'Drivers' subcollections.
+    partitions = list(db.collection_group('Drivers').get_partitions(shards))
+    print(f"\n🧩 Split 'Drivers' into {len(partitions)} shard(s) across {workers} worker(s)")
+    
+    resolver = resolver or AuthUidResolver()
+    write_slots = threading.BoundedSemaphore(max_in_flight)
+    total = Counter()
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_migrate_driver_shard, db, index, partition.query(), resolver, write_slots)
+            for index, partition in enumerate(partitions)
+        ]
+        for future in as_completed(futures):
+            try:
+                total.update(future.result())
+            except Exception as e:
+                total['failed_shards'] += 1
+                print(f"   ❌ Shard failed: {e}")
+    
+    print(f"\n📊 Migration Summary:")
+    print(f"   🔑 Auth lookups: {resolver.rpc_count} RPC(s), {resolver.cache_hits} cache hit(s)")
+    print(f"   ✅ Migrated: {total['migrated']} drivers")
+    print(f"   ⚠️  Skipped: {total['skipped']} (no Auth account)")
+    if total['failed'] or total['failed_shards']:
+        print(f"   ❌ Failed: {total['failed']} drivers, {total['failed_shards']} shards")
+    
+    return total
+
+
+def create_user_profiles_for_existing_users(db, checkpoint=None, page_size=DEFAULT_PAGE_SIZE):
     """Create userProfiles for existing users who don't have driver data."""
     print("\n" + "="*60)
     print("👤 CREATING USER PROFILES FOR EXISTING USERS")
     print("="*60)
     
+    state = _resume_state(checkpoint, 'userProfiles')
+    created_count = state.get('created', 0)
+    if state.get('done'):
+        return created_count
+    
     try:
         # This will create userProfiles for any existing Firebase Auth users
         # who aren't drivers
         
-        # Get all users from 'users' collection
-        users = db.collection('users').stream()
-        
-        created_count = 0
-        
-        for user_doc in users:
-            user_data = user_doc.to_dict()
-            user_id = user_doc.id
-            user_type = user_data.get('userType', 'user')
-            
+        # Page through all users in 'users' collection
+        users_page_iter = iter_pages(
+            db.collection('users'), page_size, state.get('cursor'), field_paths=['userType']
+        )
+        for page in users_page_iter:
             # Only create profiles for regular users
-            if user_type == 'user':
-                profile_ref = db.collection('userProfiles').document(user_id)
-                profile_doc = profile_ref.get()
-                
-                if not profile_doc.exists:
-                    profile_data = {
-                        'homeAddress': '',
-                        'workAddress': '',
-                        'favoriteLocations': [],
-                        'paymentMethods': [],
-                        'preferences': {
-                            'notifications': True,
-                            'language': 'en',
-                            'theme': 'dark',
-                        },
-                        'totalRides': 0,
-                        'rating': 5.0,
-                    }
-                    profile_ref.set(profile_data)
-                    print(f"   ✓ Created userProfiles/{user_id}")
-                    created_count += 1
+            profile_refs = [
+                db.collection('userProfiles').document(user_doc.id)
+                for user_doc in page
+                if user_doc.to_dict().get('userType', 'user') == 'user'
+            ]
+            
+            # One get_all() per chunk tells us which profiles are missing;
+            # create() keeps any the app adds before the write lands
+            missing = find_missing(db, profile_refs)
+            created, counts = bulk_create(db, ((ref, new_user_profile_data()) for ref in missing))
+            if counts['failed']:
+                raise RuntimeError(f"{counts['failed']} user profile(s) could not be created")
+            
+            for profile_ref in created:
+                print(f"   ✓ Created userProfiles/{profile_ref.id}")
+            created_count += len(created)
+            
+            if checkpoint:
+                checkpoint.save('userProfiles', page[-1].id, created=created_count)
+        
+        if checkpoint:
+            checkpoint.complete('userProfiles', created=created_count)
         
         print(f"\n📊 Created {created_count} user profiles")
         return created_count
@@ -212,36 +323,32 @@ def verify_migration(db):
     print("="*60)
     
     try:
-        # Count documents in each collection
-        users_count = len(list(db.collection('users').stream()))
-        drivers_count = len(list(db.collection('drivers').stream()))
-        profiles_count = len(list(db.collection('userProfiles').stream()))
-        old_drivers_count = len(list(db.collection('Drivers').stream()))
+        # Count documents in each collection (server-side aggregation)
+        counts = count_collections(db, ['users', 'drivers', 'userProfiles', 'Drivers'])
+        driver_users_count = count_documents(db, 'users', [('userType', '==', 'driver')])
         
         print(f"\n📊 Collection Counts:")
-        print(f"   users: {users_count}")
-        print(f"   drivers: {drivers_count}")
-        print(f"   userProfiles: {profiles_count}")
-        print(f"   Drivers (old): {old_drivers_count}")
+        print(f"   users: {counts['users']} ({driver_users_count} drivers)")
+        print(f"   drivers: {counts['drivers']}")
+        print(f"   userProfiles: {counts['userProfiles']}")
+        print(f"   Drivers (old): {counts['Drivers']}")
         
         # Show sample data
         print(f"\n📋 Sample Data:")
         
         # Show a user
-        users = list(db.collection('users').limit(1).stream())
-        if users:
-            user = users[0]
-            print(f"\n   users/{user.id}:")
-            print(f"      userType: {user.to_dict().get('userType')}")
-            print(f"      email: {user.to_dict().get('email')}")
+        for user_id, user in iter_documents(db.collection('users'), ['userType', 'email'], page_size=1):
+            print(f"\n   users/{user_id}:")
+            print(f"      userType: {user.get('userType')}")
+            print(f"      email: {user.get('email')}")
+            break
         
         # Show a driver
-        drivers = list(db.collection('drivers').limit(1).stream())
-        if drivers:
-            driver = drivers[0]
-            print(f"\n   drivers/{driver.id}:")
-            print(f"      carName: {driver.to_dict().get('carName')}")
-            print(f"      driverStatus: {driver.to_dict().get('driverStatus')}")
+        for driver_id, driver in iter_documents(db.collection('drivers'), ['carName', 'driverStatus'], page_size=1):
+            print(f"\n   drivers/{driver_id}:")
+            print(f"      carName: {driver.get('carName')}")
+            print(f"      driverStatus: {driver.get('driverStatus')}")
+            break
         
         print(f"\n✅ Migration verification complete!")
         
@@ -249,8 +356,107 @@ def verify_migration(db):
         print(f"❌ Error verifying migration: {e}")
 
 
-def main():
+def parse_args(argv=None):
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Migrate BTrips data to the unified schema.")
+    parser.add_argument('--parallel', action='store_true',
+                        help="Migrate drivers in sharded batches on a thread pool")
+    parser.add_argument('--workers', type=int, default=8,
+                        help="Worker threads for --parallel (default: 8)")
+    parser.add_argument('--shards', type=int, default=None,
+                        help="Partitions to split 'Drivers' into (default: 4 per worker)")
+    parser.add_argument('--max-in-flight', type=int, default=32,
+                        help="Maximum concurrent write RPCs for --parallel (default: 32)")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="Run on the Firestore AsyncClient with bounded concurrency")
+    parser.add_argument('--concurrency', type=int, default=100,
+                        help="Documents in flight for --async (default: 100)")
+    parser.add_argument('--auth-cache', default=DEFAULT_CACHE_PATH,
+                        help=f"SQLite email→UID cache (default: {DEFAULT_CACHE_PATH})")
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT_PATH,
+                        help=f"Local checkpoint file for resuming (default: {DEFAULT_CHECKPOINT_PATH})")
+    parser.add_argument('--firestore-checkpoint', action='store_true',
+                        help="Keep the checkpoint in _migrations/unified_schema instead of a local file")
+    parser.add_argument('--restart', action='store_true',
+                        help="Ignore any saved checkpoint and start from the first document")
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f"Documents read per page (default: {DEFAULT_PAGE_SIZE})")
+    parser.add_argument('--consolidate-rides', action='store_true',
+                        help="Also copy per-user ride collections into rideRequests / rideHistory "
+                             "(collections processed by --workers threads)")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Diff the planned writes against current documents and estimate cost, "
+                             "without writing (shards across --workers threads)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only migrate drivers changed since the last incremental run, merging "
+                             "into existing drivers/{uid} documents")
+    parser.add_argument('--scan', action='store_true',
+                        help="With --incremental, scan all drivers and compare update times "
+                             "(catches writers that don't set updatedAt)")
+    parser.add_argument('--yes', action='store_true',
+                        help="Don't ask for confirmation (for scheduled --incremental runs)")
+    add_metrics_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def run_sync_migration(db, resolver, args):
+    """Run steps 1 and 2 (and rides, with --consolidate-rides) on the
+    synchronous client, with checkpointing.
+    
+    Returns:
+        (drivers migrated, profiles created, rides moved or None, complete)
+    """
+    if args.firestore_checkpoint:
+        checkpoint = FirestoreCheckpointStore(db, 'unified_schema')
+    else:
+        checkpoint = FileCheckpointStore(args.checkpoint)
+    if args.restart:
+        checkpoint.reset()
+    
+    # Step 1: Migrate drivers
+    print("\n📍 Step 1: Migrating drivers...")
+    with step('migrate_drivers'):
+        if args.parallel:
+            drivers = migrate_drivers_parallel(
+                db,
+                workers=args.workers,
+                shards=args.shards,
+                max_in_flight=args.max_in_flight,
+                resolver=resolver,
+            )
+            drivers_migrated = drivers['migrated']
+            # The parallel path has no checkpoint; it is done when nothing failed
+            drivers_done = not (drivers['failed'] or drivers['failed_shards'])
+        else:
+            drivers_migrated = migrate_drivers_to_new_schema(db, resolver, checkpoint, args.page_size)
+            drivers_done = checkpoint.is_complete('drivers')
+    
+    # Step 2: Create user profiles
+    print("\n📍 Step 2: Creating user profiles...")
+    with step('create_user_profiles'):
+        profiles_created = create_user_profiles_for_existing_users(db, checkpoint, args.page_size)
+    
+    rides_moved, rides_done = None, True
+    if args.consolidate_rides:
+        print("\n📍 Step 2b: Consolidating per-user ride collections...")
+        with step('consolidate_rides'):
+            rides = consolidate_user_rides(db, resolver, checkpoint, args.workers, args.page_size)
+        rides_moved, rides_done = rides['moved'], not rides['failed']
+    
+    # Every step finished: the next run starts fresh instead of resuming
+    complete = drivers_done and checkpoint.is_complete('userProfiles') and rides_done
+    if complete:
+        checkpoint.reset()
+    else:
+        print("\n⚠️  Migration incomplete - re-run to resume from the last checkpoint")
+    
+    return drivers_migrated, profiles_created, rides_moved, complete
+
+
+def main(argv=None):
     """Main migration function."""
+    args = parse_args(argv)
+    
     print("\n" + "="*60)
     print("🔄 BTRIPS UNIFIED APP - FIREBASE MIGRATION")
     print("="*60)
@@ -258,39 +464,73 @@ def main():
     print("  • Drivers collection → drivers + users")
     print("  • Creates users collection with userType field")
     print("  • Creates userProfiles for regular users")
-    print("\n⚠️  WARNING: This will modify your Firebase database!")
+    if args.consolidate_rides:
+        print("  • Per-user ride collections → rideRequests / rideHistory")
     
-    # Confirmation
-    response = input("\nProceed with migration? (yes/no): ")
-    if response.lower() != 'yes':
-        print("❌ Migration cancelled")
-        return
+    if args.dry_run:
+        print("\n🧪 Dry run: nothing will be written")
+    elif not args.yes:
+        print("\n⚠️  WARNING: This will modify your Firebase database!")
+        
+        # Confirmation
+        response = input("\nProceed with migration? (yes/no): ")
+        if response.lower() != 'yes':
+            print("❌ Migration cancelled")
+            return
     
     app = initialize_firebase()
     if not app:
         sys.exit(1)
     
-    db = firestore.client()
+    db = get_firestore()
+    start_metrics(args)
     
-    # Step 1: Migrate drivers
-    print("\n📍 Step 1: Migrating drivers...")
-    drivers_migrated = migrate_drivers_to_new_schema(db)
+    resolver = AuthUidResolver(args.auth_cache)
     
-    # Step 2: Create user profiles
-    print("\n📍 Step 2: Creating user profiles...")
-    profiles_created = create_user_profiles_for_existing_users(db)
+    if args.dry_run:
+        from migration_plan import plan_migration, print_plan
+        with step('dry_run'):
+            plan = plan_migration(db, resolver, args.workers, args.shards, args.consolidate_rides,
+                                  args.page_size)
+        print_plan(plan)
+        return
+    
+    if args.incremental:
+        from delta_migration import migrate_drivers_incremental
+        with step('incremental_drivers'):
+            migrate_drivers_incremental(db, resolver, args.page_size, args.scan)
+        return
+    
+    if args.use_async:
+        # Steps 1 + 2 on the AsyncClient
+        from async_migration import run_async_migration
+        with step('async_migration'):
+            drivers_migrated, profiles_created = asyncio.run(
+                run_async_migration(resolver, args.concurrency)
+            )
+        rides_moved, complete = None, True
+        if args.consolidate_rides:
+            with step('consolidate_rides'):
+                rides = consolidate_user_rides(db, resolver, workers=args.workers,
+                                               page_size=args.page_size)
+            rides_moved, complete = rides['moved'], not rides['failed']
+    else:
+        drivers_migrated, profiles_created, rides_moved, complete = run_sync_migration(db, resolver, args)
     
     # Step 3: Verify
     print("\n📍 Step 3: Verifying migration...")
-    verify_migration(db)
+    with step('verify_migration'):
+        verify_migration(db)
     
     # Summary
     print("\n" + "="*60)
-    print("✨ MIGRATION COMPLETE")
+    print("✨ MIGRATION COMPLETE" if complete else "⚠️  MIGRATION INCOMPLETE - RE-RUN TO RESUME")
     print("="*60)
     print(f"\n📊 Summary:")
     print(f"   🚗 Drivers migrated: {drivers_migrated}")
     print(f"   👤 User profiles created: {profiles_created}")
+    if rides_moved is not None:
+        print(f"   🚕 Legacy rides consolidated: {rides_moved}")
     print(f"\n💡 Next Steps:")
     print(f"   1. Verify data in Firebase Console")
     print(f"   2. Test app with existing accounts")
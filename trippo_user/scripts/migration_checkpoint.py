@@ -0,0 +1,119 @@
+"""
+Checkpoint stores for resumable BTrips migrations.
+
+A checkpoint records, per step (e.g. 'drivers', 'userProfiles'), the ID
+of the last document whose writes were committed, plus running counts.
+A restarted run continues after that document instead of starting over.
+
+Two backends share the same interface:
+    FileCheckpointStore('migration_checkpoint.json')    # local JSON file
+    FirestoreCheckpointStore(db, 'unified_schema')      # _migrations/{name} doc
+
+Usage:
+    state = checkpoint.get('drivers')         # {} or {'cursor': ..., 'done': ..., counts...}
+    checkpoint.save('drivers', page[-1].id, migrated=10, skipped=2)
+    checkpoint.complete('drivers', migrated=10, skipped=2)
+    checkpoint.reset()
+"""
+
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+import json
+import os
+import threading
+
+DEFAULT_CHECKPOINT_PATH = 'migration_checkpoint.json'
+CHECKPOINT_COLLECTION = '_migrations'
+
+
+class _CheckpointStore(ABC):
+    """Shared step bookkeeping; subclasses persist `self._state`.
+
+    Safe to share between threads, e.g. one step per worker.
+    """
+
+    def __init__(self):
+        self._state = {}
+        self._lock = threading.RLock()
+
+    def get(self, step):
+        """Return the saved state for `step` ({} if none)."""
+        return dict(self._state.get(step, {}))
+
+    def is_complete(self, step):
+        return bool(self._state.get(step, {}).get('done'))
+
+    def save(self, step, cursor, **counts):
+        """Record that everything up to and including `cursor` is committed."""
+        with self._lock:
+            self._state[step] = {
+                'cursor': cursor,
+                'done': False,
+                'updatedAt': datetime.now(timezone.utc).isoformat(),
+                **counts,
+            }
+            self._persist(step)
+
+    def complete(self, step, **counts):
+        """Mark `step` as finished."""
+        with self._lock:
+            state = self._state.get(step, {})
+            state.update(counts)
+            state.update({
+                'done': True,
+                'updatedAt': datetime.now(timezone.utc).isoformat(),
+            })
+            self._state[step] = state
+            self._persist(step)
+
+    def reset(self):
+        """Forget all steps."""
+        with self._lock:
+            self._state = {}
+            self._clear()
+
+    @abstractmethod
+    def _persist(self, step):
+        """Save `self._state[step]`."""
+
+    @abstractmethod
+    def _clear(self):
+        """Delete all saved state."""
+
+
+class FileCheckpointStore(_CheckpointStore):
+    """Checkpoints kept in a local JSON file, rewritten atomically."""
+
+    def __init__(self, path=DEFAULT_CHECKPOINT_PATH):
+        super().__init__()
+        self.path = path
+        if os.path.exists(path):
+            with open(path) as f:
+                self._state = json.load(f)
+
+    def _persist(self, step):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._state, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class FirestoreCheckpointStore(_CheckpointStore):
+    """Checkpoints kept in a `_migrations/{name}` document, one field per step."""
+
+    def __init__(self, db, name):
+        super().__init__()
+        self._doc_ref = db.collection(CHECKPOINT_COLLECTION).document(name)
+        snapshot = self._doc_ref.get()
+        if snapshot.exists:
+            self._state = snapshot.to_dict()
+
+    def _persist(self, step):
+        self._doc_ref.set({step: self._state[step]}, merge=True)
+
+    def _clear(self):
+        self._doc_ref.delete()
@@ -0,0 +1,245 @@
+"""
+Dry-run planner for migrate_to_unified_schema.py.
+
+Works out every write the migration would make and diffs it against the
+current target document, without writing anything:
+
+    users/{uid}          create, or update userType → 'driver'
+    drivers/{uid}        create, or replace (set) with the mapped legacy fields
+    userProfiles/{uid}   create for regular users that have none
+    rideRequests / rideHistory (with --consolidate-rides)
+
+Each planned write is classified as create, update or no-op, and updates
+record which fields would change. Source collections are split with
+partition queries and planned on a thread pool; target documents are
+fetched with get_all() in chunks of up to 500 instead of one get() each.
+
+The report also estimates the reads, writes and Auth lookups the real run
+will make, so a large migration can be costed before it is started.
+
+Usage:
+    python3 scripts/migrate_to_unified_schema.py --dry-run
+    python3 scripts/migrate_to_unified_schema.py --dry-run --consolidate-rides --workers 16
+"""
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+
+from auth_cache import AuthUidResolver
+from consolidate_rides import (HISTORY_STATUSES, list_user_ride_collections, unified_ride_data,
+                               unified_ride_id)
+from firestore_bulk import MAX_BATCH_SIZE, chunked
+from firestore_paging import DEFAULT_PAGE_SIZE, iter_pages
+from unified_schema import new_driver_data
+
+# Approximate Firestore list prices (USD per 100,000 operations, multi-region)
+READ_PRICE = 0.06
+WRITE_PRICE = 0.18
+DELETE_PRICE = 0.02
+
+LEGACY_RIDE_FIELDS = ('OriginLat', 'OriginLng', 'destinationLat', 'destinationLng')
+
+_MISSING = object()
+
+
+def changed_fields(existing, planned):
+    """Top-level fields a set() of `planned` over `existing` would change.
+
+    set() replaces the document, so fields only in `existing` count too.
+    """
+    keys = set(planned) | set(existing)
+    return sorted(key for key in keys if existing.get(key, _MISSING) != planned.get(key, _MISSING))
+
+
+class MigrationPlan:
+    """Planned writes per target collection, safe to fill from several threads."""
+
+    def __init__(self):
+        self.actions = {}
+        self.fields = {}
+        self.ops = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, collection_name, action, fields=()):
+        with self._lock:
+            self.actions.setdefault(collection_name, Counter())[action] += 1
+            if fields:
+                self.fields.setdefault(collection_name, Counter()).update(fields)
+
+    def count(self, **ops):
+        with self._lock:
+            self.ops.update(ops)
+
+    def total(self, action):
+        return sum(counts[action] for counts in self.actions.values())
+
+    def estimated_cost(self):
+        """Approximate USD cost of the real run at list prices."""
+        return (self.ops['migration_reads'] * READ_PRICE
+                + self.ops['migration_writes'] * WRITE_PRICE
+                + self.ops['migration_deletes'] * DELETE_PRICE) / 100000
+
+
+def _fetch(db, refs, field_paths=None):
+    """Existing data for each ref (None if missing), fetched with get_all() in chunks."""
+    found = {}
+    for chunk in chunked(refs, MAX_BATCH_SIZE):
+        for snapshot in db.get_all(chunk, field_paths=field_paths):
+            if snapshot.exists:
+                found[snapshot.reference.path] = snapshot.to_dict() or {}
+    return [found.get(ref.path) for ref in refs]
+
+
+def _partitions(db, collection_name, shards):
+    """Shard queries over a collection (partition queries run on collection groups)."""
+    return [partition.query() for partition in db.collection_group(collection_name).get_partitions(shards)]
+
+
+def _top_level(snapshot):
+    # collection_group() also matches subcollections with the same name
+    return snapshot.reference.parent.parent is None
+
+
+def _plan_driver_shard(db, query, resolver, plan, driver_uids):
+    """Plan users/{uid} and drivers/{uid} writes for one shard of 'Drivers'."""
+    for chunk in chunked((doc for doc in query.stream() if _top_level(doc)), MAX_BATCH_SIZE):
+        uids = resolver.resolve_many([doc.id for doc in chunk])
+        resolved = [(doc, uids[doc.id]) for doc in chunk if uids[doc.id]]
+        for _ in range(len(chunk) - len(resolved)):
+            plan.record('drivers', 'skipped')
+        plan.count(source_reads=len(chunk), target_reads=2 * len(resolved),
+                   migration_reads=len(chunk) + len(resolved), migration_writes=2 * len(resolved))
+        if not resolved:
+            continue
+
+        users = _fetch(db, [db.collection('users').document(uid) for _, uid in resolved], ['userType'])
+        drivers = _fetch(db, [db.collection('drivers').document(uid) for _, uid in resolved])
+
+        for (doc, uid), user, driver in zip(resolved, users, drivers):
+            driver_uids.add(uid)
+            if user is None:
+                plan.record('users', 'create')
+            elif user.get('userType') == 'driver':
+                plan.record('users', 'noop')
+            else:
+                plan.record('users', 'update', ['userType'])
+
+            planned = new_driver_data(doc.to_dict() or {})
+            if driver is None:
+                plan.record('drivers', 'create')
+            else:
+                fields = changed_fields(driver, planned)
+                plan.record('drivers', 'update' if fields else 'noop', fields)
+
+
+def _plan_profile_shard(db, query, plan, driver_uids):
+    """Plan userProfiles creates for one shard of 'users'."""
+    for chunk in chunked((doc for doc in query.select(['userType']).stream() if _top_level(doc)),
+                         MAX_BATCH_SIZE):
+        candidates = [
+            doc.id for doc in chunk
+            if (doc.to_dict() or {}).get('userType', 'user') == 'user' and doc.id not in driver_uids
+        ]
+        plan.count(source_reads=len(chunk), target_reads=len(candidates),
+                   migration_reads=len(chunk) + len(candidates))
+        profiles = _fetch(db, [db.collection('userProfiles').document(uid) for uid in candidates], [])
+        for profile in profiles:
+            plan.record('userProfiles', 'noop' if profile is not None else 'create')
+        plan.count(migration_writes=sum(profile is None for profile in profiles))
+
+
+def _plan_ride_collection(db, collection_name, resolver, plan, page_size, delete_source):
+    """Plan the unified copies of one per-user ride collection."""
+    source = db.collection(collection_name)
+    for page in iter_pages(source, page_size):
+        rides = [(snapshot.id, snapshot.to_dict() or {}) for snapshot in page]
+        rides_with_coords = [(doc_id, ride) for doc_id, ride in rides
+                             if all(ride.get(f) is not None for f in LEGACY_RIDE_FIELDS)]
+        for _ in range(len(rides) - len(rides_with_coords)):
+            plan.record('rides', 'skipped')
+
+        emails = {collection_name}
+        for _, ride in rides_with_coords:
+            emails.update(e for e in (ride.get('userEmail'), ride.get('driverEmail')) if e)
+        uids = resolver.resolve_many(sorted(emails))
+
+        planned = []
+        for doc_id, ride in rides_with_coords:
+            user_email = ride.get('userEmail') or collection_name
+            data = unified_ride_data(collection_name, doc_id, ride,
+                                     uids.get(user_email), uids.get(ride.get('driverEmail')))
+            target = 'rideHistory' if data['status'] in HISTORY_STATUSES else 'rideRequests'
+            planned.append((target, db.collection(target).document(unified_ride_id(collection_name, doc_id)), data))
+
+        existing = _fetch(db, [ref for _, ref, _ in planned])
+        for (target, _, data), current in zip(planned, existing):
+            if current is None:
+                plan.record(target, 'create')
+            else:
+                fields = changed_fields(current, data)
+                plan.record(target, 'update' if fields else 'noop', fields)
+
+        moved = len(planned)
+        plan.count(source_reads=len(rides), target_reads=moved,
+                   migration_reads=len(rides), migration_writes=moved,
+                   migration_deletes=moved if delete_source else 0)
+
+
+def plan_migration(db, resolver=None, workers=8, shards=None, consolidate_rides=False,
+                   page_size=DEFAULT_PAGE_SIZE, delete_source=False):
+    """Compute the full migration plan without writing.
+
+    Drivers are planned before profiles, since users that become drivers
+    in step 1 don't get a profile in step 2.
+
+    Returns:
+        MigrationPlan
+    """
+    resolver = resolver or AuthUidResolver()
+    shards = shards or workers * 4
+    plan = MigrationPlan()
+    driver_uids = set()
+    rpcs_before = resolver.rpc_count
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_plan_driver_shard, db, query, resolver, plan, driver_uids)
+                   for query in _partitions(db, 'Drivers', shards)]
+        for future in as_completed(futures):
+            future.result()
+        # Step 2 also reads the users created in step 1
+        plan.count(migration_reads=plan.actions.get('users', Counter())['create'])
+
+        futures = [executor.submit(_plan_profile_shard, db, query, plan, driver_uids)
+                   for query in _partitions(db, 'users', shards)]
+        if consolidate_rides:
+            futures += [executor.submit(_plan_ride_collection, db, name, resolver, plan,
+                                        page_size, delete_source)
+                        for name in list_user_ride_collections(db)]
+        for future in as_completed(futures):
+            future.result()
+
+    plan.count(auth_rpcs=resolver.rpc_count - rpcs_before)
+    return plan
+
+
+def print_plan(plan):
+    """Print the per-collection diff and the cost estimate."""
+    print("\n" + "="*60)
+    print("🧪 MIGRATION DRY RUN (nothing written)")
+    print("="*60)
+
+    for collection_name in sorted(plan.actions):
+        counts = plan.actions[collection_name]
+        print(f"\n   {collection_name}: {counts['create']} create, {counts['update']} update, "
+              f"{counts['noop']} no-op" + (f", {counts['skipped']} skipped" if counts['skipped'] else ""))
+        for field, changes in plan.fields.get(collection_name, Counter()).most_common(10):
+            print(f"      ~ {field}: {changes} document(s)")
+
+    ops = plan.ops
+    print(f"\n📊 Planned: {plan.total('create')} create, {plan.total('update')} update, "
+          f"{plan.total('noop')} no-op")
+    print(f"   Dry run used {ops['source_reads'] + ops['target_reads']} reads "
+          f"({ops['target_reads']} via get_all) and {ops['auth_rpcs']} Auth lookup RPC(s)")
+    print(f"   Real run estimate: {ops['migration_reads']} reads, {ops['migration_writes']} writes, "
+          f"{ops['migration_deletes']} deletes ≈ ${plan.estimated_cost():.2f} at list prices")
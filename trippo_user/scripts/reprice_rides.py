@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Recompute distance, duration and fare for stored rides in one vectorized pass.
+
+Streams rideRequests / rideHistory (and, with --legacy, the old per-user
+ride collections named after an email, which store OriginLat/OriginLng/
+destinationLat/destinationLng) page by page. Each page is turned into
+NumPy columns, priced with fares.estimate_trips(), and only the rides
+whose values changed are written back in batched updates. Prices are
+estimates from straight-line distance (see fares.py), not the Google
+Directions route the app quoted.
+
+Pricing options default to the app's current rates; pass new ones to
+reprice after a pricing change. Use --dry-run first to see the impact.
+
+Install dependencies:
+    pip install numpy
+
+Run:
+    python3 scripts/reprice_rides.py --dry-run
+    python3 scripts/reprice_rides.py --per-mile 1.75 --legacy
+    python3 scripts/reprice_rides.py --collections rideHistory --status completed
+"""
+
+from collections import Counter
+import argparse
+import sys
+
+import numpy as np
+
+from consolidate_rides import list_user_ride_collections
+from fares import PER_MILE_RATE, PER_MINUTE_RATE, SERVICE_MULTIPLIER, VEHICLE_MULTIPLIERS, estimate_trips
+from firebase_client import get_firestore, initialize_firebase
+from firestore_bulk import BatchWriter
+from firestore_counts import build_query
+from firestore_paging import iter_pages
+
+DEFAULT_COLLECTIONS = ['rideRequests', 'rideHistory']
+DEFAULT_PAGE_SIZE = 2000
+
+RIDE_FIELDS = ['pickupLocation', 'dropoffLocation', 'vehicleType', 'isDelivery', 'fare', 'distance', 'duration']
+LEGACY_FIELDS = ['OriginLat', 'OriginLng', 'destinationLat', 'destinationLng', 'fare', 'distance', 'duration']
+
+# Differences smaller than this are float noise, not a price change
+CENT = 0.005
+
+
+def ride_columns(snapshots):
+    """Columns for rideRequests / rideHistory documents (GeoPoint locations).
+
+    Deliveries are skipped: their fare is deliveryFee + itemCost, not a trip price.
+
+    Returns:
+        (rows, Counter of skipped rides by 'delivery' / 'no_location')
+    """
+    rows = []
+    skipped = Counter()
+    for snapshot in snapshots:
+        ride = snapshot.to_dict() or {}
+        if ride.get('isDelivery'):
+            skipped['delivery'] += 1
+            continue
+        pickup, dropoff = ride.get('pickupLocation'), ride.get('dropoffLocation')
+        if pickup is None or dropoff is None:
+            skipped['no_location'] += 1
+            continue
+        rows.append((snapshot.id, pickup.latitude, pickup.longitude, dropoff.latitude, dropoff.longitude,
+                     ride.get('vehicleType') or 'Sedan',
+                     ride.get('fare'), ride.get('distance'), ride.get('duration')))
+    return rows, skipped
+
+
+def legacy_columns(snapshots):
+    """Columns for legacy per-user ride documents (flat lat/lng fields, no vehicle type).
+
+    Returns:
+        (rows, Counter of skipped rides by 'no_location')
+    """
+    rows = []
+    skipped = Counter()
+    for snapshot in snapshots:
+        ride = snapshot.to_dict() or {}
+        coords = [ride.get(f) for f in ('OriginLat', 'OriginLng', 'destinationLat', 'destinationLng')]
+        if any(value is None for value in coords):
+            skipped['no_location'] += 1
+            continue
+        rows.append((snapshot.id, *coords, 'Sedan',
+                     ride.get('fare'), ride.get('distance'), ride.get('duration')))
+    return rows, skipped
+
+
+def _to_array(values):
+    """Float array with NaN for missing values."""
+    return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+
+
+def price_page(rows, pricing):
+    """Price one page of rows and find the rides whose stored values differ.
+
+    Returns:
+        (ids, distances, durations, fares, changed mask, fare delta of changed rides)
+    """
+    ids, p_lat, p_lng, d_lat, d_lng, types, old_fare, old_distance, old_duration = zip(*rows)
+    distance, duration, fare = estimate_trips(p_lat, p_lng, d_lat, d_lng, types, **pricing)
+
+    old_fare, old_distance, old_duration = _to_array(old_fare), _to_array(old_distance), _to_array(old_duration)
+    # NaN (missing) never compares equal, so missing values count as changed
+    changed = ~(
+        (np.abs(fare - old_fare) < CENT)
+        & (np.abs(distance - old_distance) < CENT)
+        & (duration == old_duration)
+    )
+    fare_delta = float(np.nansum((fare - np.nan_to_num(old_fare))[changed]))
+    return ids, distance, duration, fare, changed, fare_delta
+
+
+def reprice_collection(db, query, collection_name, to_rows, fields, pricing,
+                       page_size=DEFAULT_PAGE_SIZE, dry_run=False):
+    """Reprice every ride matched by `query`.
+
+    Returns:
+        Counter with 'read', 'priced', 'changed', 'skipped', 'deliveries' and 'fare_delta'
+    """
+    summary = Counter()
+    collection = db.collection(collection_name)
+
+    for page in iter_pages(query, page_size, field_paths=fields):
+        summary['read'] += len(page)
+        rows, skipped = to_rows(page)
+        summary['skipped'] += sum(skipped.values())
+        summary['deliveries'] += skipped['delivery']
+        if not rows:
+            continue
+
+        ids, distance, duration, fare, changed, fare_delta = price_page(rows, pricing)
+        summary['priced'] += len(rows)
+        summary['changed'] += int(changed.sum())
+        summary['fare_delta'] += fare_delta
+
+        if dry_run:
+            continue
+        with BatchWriter(db) as writer:
+            for i in np.flatnonzero(changed):
+                writer.update(collection.document(ids[i]), {
+                    'fare': float(fare[i]),
+                    'distance': float(distance[i]),
+                    'duration': int(duration[i]),
+                })
+
+    print(f"   {collection_name}: {summary['priced']} priced, {summary['changed']} changed "
+          f"({summary['fare_delta']:+.2f} total fare), {summary['skipped']} skipped "
+          f"({summary['deliveries']} deliveries left unchanged)")
+    return summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute ride distance, duration and fare in bulk")
+    parser.add_argument('--collections', nargs='+', default=DEFAULT_COLLECTIONS,
+                        help="Ride collections to reprice (default: rideRequests rideHistory)")
+    parser.add_argument('--legacy', action='store_true',
+                        help="Also reprice the old per-user ride collections (named after an email)")
+    parser.add_argument('--status', help="Only reprice rides with this status (e.g. completed)")
+    parser.add_argument('--per-mile', type=float, default=PER_MILE_RATE,
+                        help=f"Rate per mile (default: {PER_MILE_RATE})")
+    parser.add_argument('--per-minute', type=float, default=PER_MINUTE_RATE,
+                        help=f"Rate per minute (default: {PER_MINUTE_RATE})")
+    parser.add_argument('--service-multiplier', type=float, default=SERVICE_MULTIPLIER,
+                        help=f"Service multiplier (default: {SERVICE_MULTIPLIER})")
+    parser.add_argument('--multiplier', action='append', default=[], metavar='TYPE=VALUE',
+                        help="Override a vehicle multiplier, e.g. --multiplier 'Luxury SUV=2.25'")
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f"Rides read and priced per page (default: {DEFAULT_PAGE_SIZE})")
+    parser.add_argument('--dry-run', action='store_true', help="Report changes without writing")
+    args = parser.parse_args(argv)
+
+    multipliers = dict(VEHICLE_MULTIPLIERS)
+    for override in args.multiplier:
+        vehicle_type, _, value = override.partition('=')
+        try:
+            multipliers[vehicle_type] = float(value)
+        except ValueError:
+            parser.error(f"--multiplier expects TYPE=VALUE, got {override!r}")
+    args.pricing = {
+        'per_minute': args.per_minute,
+        'per_mile': args.per_mile,
+        'service_multiplier': args.service_multiplier,
+        'vehicle_multipliers': multipliers,
+    }
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print("\n" + "="*60)
+    print("💰 BTRIPS RIDE REPRICING" + (" (DRY RUN)" if args.dry_run else ""))
+    print("="*60)
+    pricing = args.pricing
+    print(f"   ${pricing['per_minute']}/min + ${pricing['per_mile']}/mile, "
+          f"x{pricing['service_multiplier']} service, vehicle multipliers {pricing['vehicle_multipliers']}")
+
+    if not initialize_firebase():
+        sys.exit(1)
+    db = get_firestore()
+
+    filters = [('status', '==', args.status)] if args.status else None
+    total = Counter()
+    for name in args.collections:
+        # update() rather than += so a negative fare_delta isn't dropped
+        total.update(reprice_collection(db, build_query(db, name, filters), name, ride_columns,
+                                        RIDE_FIELDS, pricing, args.page_size, args.dry_run))
+
+    if args.legacy:
+        for name in list_user_ride_collections(db):
+            total.update(reprice_collection(db, db.collection(name), name, legacy_columns,
+                                            LEGACY_FIELDS, pricing, args.page_size, args.dry_run))
+
+    print("\n" + "="*60)
+    print("✨ REPRICING COMPLETE" + (" (nothing written)" if args.dry_run else ""))
+    print("="*60)
+    print(f"📊 {total['priced']} rides priced, {total['changed']} "
+          f"{'would change' if args.dry_run else 'updated'}, "
+          f"total fare change {total['fare_delta']:+.2f}")
+    print(f"   🚚 {total['deliveries']} delivery rides left unchanged (fare is deliveryFee + itemCost)")
+
+
+if __name__ == "__main__":
+    main()
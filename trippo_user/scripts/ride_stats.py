@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Aggregate completed rides into driver and rider profile stats.
+
+Streams completed rides from rideHistory and writes, in batched updates:
+
+    drivers/{driverId}       rating, totalRides, earnings
+    userProfiles/{userId}    rating, totalRides
+
+`rating` is the exact average of the ratings received (userRating on the
+ride rates the driver, driverRating rates the rider) instead of the app's
+running estimate. The counts and sums behind it are kept in a `rideStats`
+map on the same document.
+
+Like the app's completeRide(), only rides with a fare count towards
+totalRides and earnings. The app keeps those two fields current with
+FieldValue.increment, so the job writes the difference from the value it
+read as an Increment too; a ride completed between the read and the write
+is not lost.
+
+Ratings can be added days after a ride completes, so each entity's stats
+are split in two:
+
+    settled   rides completed before settledThrough (now - --settle-days)
+    recent    rides completed since then, recomputed on every run
+
+An incremental run reads only rides completed since the previous
+settledThrough (kept in _migrations/ride_stats): rides that have aged out
+of the recent window are folded into `settled`, and `recent` is rebuilt.
+Each document also records its own settledThrough, so a run interrupted
+half-way never folds the same rides twice. Ratings added after a ride is
+settled are only picked up by a full run.
+
+Run:
+    python3 scripts/ride_stats.py --full            # rebuild from every completed ride
+    python3 scripts/ride_stats.py                    # incremental, e.g. hourly
+    python3 scripts/ride_stats.py --settle-days 14 --dry-run
+"""
+
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+import argparse
+import sys
+
+from firebase_client import get_firestore, initialize_firebase
+from firestore_bulk import MAX_BATCH_SIZE, BatchWriter, chunked
+from firestore_counts import build_query
+from firestore_paging import iter_pages
+from migration_checkpoint import CHECKPOINT_COLLECTION
+
+SYNC_DOC = 'ride_stats'
+DEFAULT_SETTLE_DAYS = 7
+DEFAULT_PAGE_SIZE = 2000
+
+RIDE_FIELDS = ['driverId', 'userId', 'fare', 'userRating', 'driverRating', 'completedAt']
+
+# (target collection, ride field with the entity ID, ride field with its rating, tracks earnings)
+ENTITIES = [
+    ('drivers', 'driverId', 'userRating', True),
+    ('userProfiles', 'userId', 'driverRating', False),
+]
+
+STAT_KEYS = ('rides', 'earnings', 'ratingCount', 'ratingSum')
+
+
+def _empty():
+    return dict.fromkeys(STAT_KEYS, 0)
+
+
+def _add(stats, fare, rating):
+    # The app skips fare-0 rides when it counts rides and earnings
+    if fare > 0:
+        stats['rides'] += 1
+        stats['earnings'] += fare
+    if rating is not None:
+        stats['ratingCount'] += 1
+        stats['ratingSum'] += rating
+
+
+def _combine(a, b):
+    return {key: a.get(key, 0) + b.get(key, 0) for key in STAT_KEYS}
+
+
+class _Entity:
+    """Rides of one driver or rider read in this run."""
+
+    __slots__ = ('recent', 'settling')
+
+    def __init__(self):
+        self.recent = _empty()
+        self.settling = []   # (completedAt, fare, rating) of rides now leaving the recent window
+
+
+def collect(db, since, settle_through, page_size=DEFAULT_PAGE_SIZE):
+    """Read completed rides (completed at or after `since`, if given).
+
+    Returns:
+        ({collection: {entity ID: _Entity}}, rides read)
+    """
+    filters = [('status', '==', 'completed')]
+    if since is not None:
+        filters.append(('completedAt', '>=', since))
+    query = build_query(db, 'rideHistory', filters)
+    pages = iter_pages(query, page_size, field_paths=RIDE_FIELDS,
+                       order_by='completedAt' if since is not None else None)
+
+    entities = {name: {} for name, _, _, _ in ENTITIES}
+    read = 0
+    for page in pages:
+        read += len(page)
+        for snapshot in page:
+            ride = snapshot.to_dict() or {}
+            completed_at = ride.get('completedAt')
+            if completed_at is None:
+                continue
+            fare = float(ride.get('fare') or 0)
+            for name, id_field, rating_field, _ in ENTITIES:
+                entity_id = ride.get(id_field)
+                if not entity_id:
+                    continue
+                entity = entities[name].setdefault(entity_id, _Entity())
+                rating = ride.get(rating_field)
+                rating = None if rating is None else float(rating)
+                if completed_at >= settle_through:
+                    _add(entity.recent, fare, rating)
+                else:
+                    entity.settling.append((completed_at, fare, rating))
+    return entities, read
+
+
+def entity_update(entity, doc, settle_through, full, tracks_earnings):
+    """Field updates for one entity, given its stored document fields.
+
+    Returns:
+        (dict of updates, dict of totalRides / earnings deltas to increment by)
+    """
+    current = doc.get('rideStats') or {}
+    settled = _empty() if full else {key: current.get('settled', {}).get(key, 0) for key in STAT_KEYS}
+    applied_through = None if full else current.get('settledThrough')
+
+    for completed_at, fare, rating in entity.settling:
+        # Skip rides an interrupted earlier run already folded into this document
+        if applied_through is None or completed_at >= applied_through:
+            _add(settled, fare, rating)
+
+    total = _combine(settled, entity.recent)
+    update = {
+        'rideStats': {
+            'settled': settled,
+            'recent': entity.recent,
+            'settledThrough': settle_through,
+            'ratingCount': total['ratingCount'],
+            'ratingSum': round(total['ratingSum'], 4),
+        },
+    }
+    if total['ratingCount']:
+        update['rating'] = round(total['ratingSum'] / total['ratingCount'], 2)
+
+    deltas = {}
+    rides_delta = total['rides'] - int(doc.get('totalRides') or 0)
+    if rides_delta:
+        deltas['totalRides'] = rides_delta
+    if tracks_earnings:
+        earnings_delta = round(total['earnings'] - float(doc.get('earnings') or 0), 2)
+        if earnings_delta:
+            deltas['earnings'] = earnings_delta
+    return update, deltas
+
+
+def write_stats(db, entities, settle_through, full, dry_run=False):
+    """Apply entity_update() to every entity that had rides in this run.
+
+    Current rideStats, totalRides and earnings are fetched with get_all() in
+    chunks; entities without a document (e.g. riders with no profile) are
+    skipped. totalRides and earnings are written as Increments.
+
+    Returns:
+        Counter per collection of 'updated' and 'missing'
+    """
+    from google.cloud.firestore import Increment
+
+    summary = Counter()
+    for name, _, _, tracks_earnings in ENTITIES:
+        collection = db.collection(name)
+        for chunk in chunked(sorted(entities[name]), MAX_BATCH_SIZE):
+            refs = [collection.document(entity_id) for entity_id in chunk]
+            current = {
+                snapshot.id: snapshot.to_dict() or {}
+                for snapshot in db.get_all(refs, field_paths=['rideStats', 'totalRides', 'earnings'])
+                if snapshot.exists
+            }
+            with BatchWriter(db) as writer:
+                for ref in refs:
+                    if ref.id not in current:
+                        summary[f'{name}_missing'] += 1
+                        continue
+                    update, deltas = entity_update(entities[name][ref.id], current[ref.id],
+                                                   settle_through, full, tracks_earnings)
+                    update.update({field: Increment(delta) for field, delta in deltas.items()})
+                    summary[f'{name}_updated'] += 1
+                    if not dry_run:
+                        writer.update(ref, update)
+    return summary
+
+
+def run(db, full=False, settle_days=DEFAULT_SETTLE_DAYS, page_size=DEFAULT_PAGE_SIZE, dry_run=False):
+    """One aggregation pass; advances the checkpoint unless dry_run."""
+    from google.cloud.firestore import SERVER_TIMESTAMP
+
+    sync_ref = db.collection(CHECKPOINT_COLLECTION).document(SYNC_DOC)
+    state = sync_ref.get().to_dict() or {}
+    since = None if full else state.get('settledThrough')
+    full = since is None
+
+    settle_through = datetime.now(timezone.utc) - timedelta(days=settle_days)
+    if since is not None and settle_through < since:
+        settle_through = since
+
+    print(f"   {'Full rebuild' if full else f'Rides completed since {since}'}; "
+          f"settling rides before {settle_through:%Y-%m-%d %H:%M} UTC")
+
+    entities, read = collect(db, since, settle_through, page_size)
+    print(f"   📥 {read} completed rides read, {len(entities['drivers'])} drivers, "
+          f"{len(entities['userProfiles'])} riders")
+
+    summary = write_stats(db, entities, settle_through, full, dry_run)
+    summary['rides_read'] = read
+    if not dry_run:
+        sync_ref.set({'settledThrough': settle_through, 'lastRunAt': SERVER_TIMESTAMP}, merge=True)
+    return summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate ratings, ride counts and earnings from completed rides")
+    parser.add_argument('--full', action='store_true',
+                        help="Recompute from every completed ride instead of the last checkpoint")
+    parser.add_argument('--settle-days', type=float, default=DEFAULT_SETTLE_DAYS,
+                        help=f"Days a ride's ratings may still change (default: {DEFAULT_SETTLE_DAYS})")
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f"Rides read per page (default: {DEFAULT_PAGE_SIZE})")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Compute the stats without writing them or the checkpoint")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print("\n" + "="*60)
+    print("⭐ BTRIPS RIDE STATS" + (" (DRY RUN)" if args.dry_run else ""))
+    print("="*60)
+
+    if not initialize_firebase():
+        sys.exit(1)
+    db = get_firestore()
+
+    summary = run(db, args.full, args.settle_days, args.page_size, args.dry_run)
+
+    print(f"\n📊 {summary['drivers_updated']} drivers and {summary['userProfiles_updated']} rider profiles "
+          f"{'would be ' if args.dry_run else ''}updated")
+    missing = summary['drivers_missing'] + summary['userProfiles_missing']
+    if missing:
+        print(f"   ⚠️  {missing} ID(s) with rides but no drivers/userProfiles document")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,159 +9,124 @@ Install dependencies:
 Run:
     python3 scripts/seed_firestore_data.py
 
+Sample drivers on the Firestore AsyncClient (see async_migration.py):
+    python3 scripts/seed_firestore_data.py --async --concurrency 200
+
+Load-test data (seedable synthetic fleet and rides, see synthetic_data.py):
+    python3 scripts/seed_firestore_data.py --drivers 10000 --rides 200000 --workers 8
+    python3 scripts/seed_firestore_data.py --drivers 5000 --target unified --hotspots hotspots.json
+
 Or set GOOGLE_APPLICATION_CREDENTIALS environment variable:
     export GOOGLE_APPLICATION_CREDENTIALS="path/to/serviceAccountKey.json"
     python3 scripts/seed_firestore_data.py
 """
 
-import firebase_admin
-from firebase_admin import credentials, firestore
-from google.cloud.firestore import GeoPoint
 from datetime import datetime, timedelta
+import argparse
+import asyncio
 import os
 import sys
 
-# Initialize Firebase Admin SDK
-def initialize_firebase():
-    """Initialize Firebase Admin SDK."""
-    try:
-        app = firebase_admin.get_app()
-        print("✅ Using existing Firebase app")
-        return app
-    except ValueError:
-        print("🔄 Initializing Firebase Admin SDK...")
-        
-        PROJECT_ID = "btrips-42089"
-        
-        # Option 1: Use service account key file (if provided)
-        cred_path = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS')
-        if cred_path and os.path.exists(cred_path):
-            cred = credentials.Certificate(cred_path)
-            app = firebase_admin.initialize_app(cred, {'projectId': PROJECT_ID})
-            print("✅ Initialized with service account key")
-            return app
-        
-        # Option 2: Try to find service account key in common locations
-        possible_paths = [
-            'firestore_credentials.json',
-            'btrips_user/firestore_credentials.json',
-            'serviceAccountKey.json',
-            'btrips_user/serviceAccountKey.json',
-            os.path.expanduser('~/Downloads/serviceAccountKey.json'),
-        ]
-        
-        for path in possible_paths:
-            if os.path.exists(path):
-                print(f"📁 Found service account key at: {path}")
-                cred = credentials.Certificate(path)
-                app = firebase_admin.initialize_app(cred, {'projectId': PROJECT_ID})
-                print("✅ Initialized with service account key")
-                return app
-        
-        # Option 3: Use Application Default Credentials
-        try:
-            cred = credentials.ApplicationDefault()
-            app = firebase_admin.initialize_app(cred, {'projectId': PROJECT_ID})
-            print("✅ Initialized with Application Default Credentials")
-            return app
-        except Exception as e:
-            print("❌ Could not initialize Firebase Admin SDK")
-            print(f"\nError: {e}")
-            print("\n📋 To use this script, you need Firebase credentials:")
-            print("\nOption 1 - Download Service Account Key:")
-            print("1. Go to: https://console.firebase.google.com/project/btrips-42089/settings/serviceaccounts/adminsdk")
-            print("2. Click 'Generate New Private Key'")
-            print("3. Save as 'serviceAccountKey.json' in the btrips_user directory")
-            print("4. Run the script again")
-            print("\nOption 2 - Set Environment Variable:")
-            print("   export GOOGLE_APPLICATION_CREDENTIALS='path/to/serviceAccountKey.json'")
-            return None
+from firebase_client import get_async_firestore, get_firestore, initialize_firebase
+from firestore_bulk import MAX_BATCH_SIZE, bulk_upsert
+from firestore_geo import geo_point
+from firestore_metrics import add_metrics_arguments, start_metrics, step
 
-def seed_drivers(db):
-    """Seed Drivers collection with sample drivers."""
+def seed_drivers(db, drivers=None, chunk_size=MAX_BATCH_SIZE, concurrency=None):
+    """Seed Drivers collection with sample drivers.
+    
+    Args:
+        db: Firestore client
+        drivers: Iterable of driver dicts (defaults to the 4 sample drivers)
+        chunk_size: Drivers written per batch (max 500)
+        concurrency: If set, upsert on the AsyncClient with this many
+            writes in flight instead of batching on `db`
+    """
     print("\n" + "="*60)
     print("🚗 SEEDING DRIVERS COLLECTION")
     print("="*60)
     
-    drivers = [
-        {
-            "Car Name": "Toyota Camry",
-            "Car Plate Num": "ABC-1234",
-            "Car Type": "Car",
-            "name": "Ahmed Khan",
-            "email": "ahmed.khan@driver.com",
-            "driverStatus": "Idle",
-            "rate": 3.0,  # Vehicle rate multiplier
-            "driverLoc": {
-                "geopoint": GeoPoint(40.6895, -74.1745),  # Near Newark Airport
+    verbose = drivers is None
+    if drivers is None:
+        drivers = [
+            {
+                "Car Name": "Toyota Camry",
+                "Car Plate Num": "ABC-1234",
+                "Car Type": "Car",
+                "name": "Ahmed Khan",
+                "email": "ahmed.khan@driver.com",
+                "driverStatus": "Idle",
+                "rate": 3.0,  # Vehicle rate multiplier
+                "driverLoc": geo_point(40.6895, -74.1745),  # Near Newark Airport
             },
-        },
-        {
-            "Car Name": "Honda Civic",
-            "Car Plate Num": "XYZ-5678",
-            "Car Type": "Car",
-            "name": "Sara Ali",
-            "email": "sara.ali@driver.com",
-            "driverStatus": "Idle",
-            "rate": 3.0,  # Vehicle rate multiplier
-            "driverLoc": {
-                "geopoint": GeoPoint(40.6413, -73.7781),  # Near JFK Airport
+            {
+                "Car Name": "Honda Civic",
+                "Car Plate Num": "XYZ-5678",
+                "Car Type": "Car",
+                "name": "Sara Ali",
+                "email": "sara.ali@driver.com",
+                "driverStatus": "Idle",
+                "rate": 3.0,  # Vehicle rate multiplier
+                "driverLoc": geo_point(40.6413, -73.7781),  # Near JFK Airport
             },
-        },
-        {
-            "Car Name": "Toyota RAV4",
-            "Car Plate Num": "SUV-9012",
-            "Car Type": "SUV",
-            "name": "Mohammed Hassan",
-            "email": "mohammed.hassan@driver.com",
-            "driverStatus": "Idle",
-            "rate": 3.0,  # Vehicle rate multiplier
-            "driverLoc": {
-                "geopoint": GeoPoint(40.7769, -73.8740),  # Near La Guardia Airport
+            {
+                "Car Name": "Toyota RAV4",
+                "Car Plate Num": "SUV-9012",
+                "Car Type": "SUV",
+                "name": "Mohammed Hassan",
+                "email": "mohammed.hassan@driver.com",
+                "driverStatus": "Idle",
+                "rate": 3.0,  # Vehicle rate multiplier
+                "driverLoc": geo_point(40.7769, -73.8740),  # Near La Guardia Airport
             },
-        },
-        {
-            "Car Name": "Yamaha R15",
-            "Car Plate Num": "MOT-3456",
-            "Car Type": "MotorCycle",
-            "name": "Fatima Ahmed",
-            "email": "fatima.ahmed@driver.com",
-            "driverStatus": "Idle",
-            "rate": 3.0,  # Vehicle rate multiplier
-            "driverLoc": {
-                "geopoint": GeoPoint(39.8719, -75.2411),  # Near Philadelphia Airport
+            {
+                "Car Name": "Yamaha R15",
+                "Car Plate Num": "MOT-3456",
+                "Car Type": "MotorCycle",
+                "name": "Fatima Ahmed",
+                "email": "fatima.ahmed@driver.com",
+                "driverStatus": "Idle",
+                "rate": 3.0,  # Vehicle rate multiplier
+                "driverLoc": geo_point(39.8719, -75.2411),  # Near Philadelphia Airport
             },
-        },
-    ]
+        ]
     
-    added_count = 0
-    updated_count = 0
+    # Stamp the change time so incremental migrations pick the drivers up
+    from google.cloud.firestore import SERVER_TIMESTAMP
+    drivers = ({**driver, "updatedAt": SERVER_TIMESTAMP} for driver in drivers)
     
-    for driver_data in drivers:
-        try:
-            doc_ref = db.collection("Drivers").document(driver_data["email"])
-            doc = doc_ref.get()
-            
-            if doc.exists:
-                doc_ref.update(driver_data)
-                status = "Updated"
-                updated_count += 1
-            else:
-                doc_ref.set(driver_data)
-                status = "Added"
-                added_count += 1
-            
-            print(f"✅ {status}: {driver_data['name']} ({driver_data['Car Name']})")
-            print(f"   📧 {driver_data['email']}")
-            print(f"   🚗 Type: {driver_data['Car Type']}")
-            print(f"   📍 {driver_data['driverLoc']['geopoint'].latitude}, {driver_data['driverLoc']['geopoint'].longitude}")
-            print(f"   🟢 Status: {driver_data['driverStatus']}")
-            
-        except Exception as e:
-            print(f"❌ Error with driver {driver_data['email']}: {e}")
+    if concurrency:
+        summary = asyncio.run(_seed_drivers_async(drivers, concurrency))
+        return summary['added'] + summary['updated']
+    
+    summary = bulk_upsert(
+        db,
+        "Drivers",
+        drivers,
+        doc_id_field="email",
+        chunk_size=chunk_size,
+        on_written=_print_driver if verbose else None,
+    )
+
+    for email, message in summary.errors:
+        print(f"❌ Error with driver {email}: {message}")
+
+    print(f"\n📊 Drivers: {summary.added} added, {summary.updated} updated")
+    return summary.total
+
+async def _seed_drivers_async(drivers, concurrency):
+    """Run seed_drivers_async on the shared AsyncClient (bound to this event loop)."""
+    from async_migration import seed_drivers_async
     
-    print(f"\n📊 Drivers: {added_count} added, {updated_count} updated")
-    return len(drivers)
+    return await seed_drivers_async(get_async_firestore(), drivers, concurrency)
+
+def _print_driver(status, driver_data):
+    """Print one seeded driver."""
+    print(f"✅ {status}: {driver_data['name']} ({driver_data['Car Name']})")
+    print(f"   📧 {driver_data['email']}")
+    print(f"   🚗 Type: {driver_data['Car Type']}")
+    print(f"   📍 {driver_data['driverLoc']['geopoint'].latitude}, {driver_data['driverLoc']['geopoint'].longitude}")
+    print(f"   🟢 Status: {driver_data['driverStatus']}")
 
 def seed_test_user_rides(db, test_user_email="test.user@example.com"):
     """Seed test user ride requests collection.
@@ -248,8 +213,61 @@ def seed_test_user_rides(db, test_user_email="test.user@example.com"):
     print(f"\n📊 Ride Requests: {added_count} added")
     return added_count
 
-def main():
+def seed_synthetic(db, args):
+    """Seed a generated fleet and rides for load testing."""
+    from synthetic_data import SyntheticFleet, load_hotspots, write_fleet
+    
+    print("\n" + "="*60)
+    print(f"🧪 SEEDING SYNTHETIC DATA (seed {args.seed}, {args.workers} workers)")
+    print("="*60)
+    
+    fleet = SyntheticFleet(
+        seed=args.seed,
+        drivers=args.drivers,
+        riders=args.riders,
+        hotspots=load_hotspots(args.hotspots) if args.hotspots else None,
+        days=args.days,
+    )
+    written = write_fleet(db, fleet, rides=args.rides, workers=args.workers, target=args.target)
+    
+    print("\n" + "="*60)
+    print("✨ SEEDING COMPLETE")
+    print("="*60)
+    print(f"📊 Summary:")
+    for kind, count in written.items():
+        print(f"   {kind}: {count} documents written")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Seed Firestore with sample or synthetic data")
+    parser.add_argument('--drivers', type=int, default=0,
+                        help="Generate this many synthetic drivers instead of the 4 samples")
+    parser.add_argument('--rides', type=int, default=0,
+                        help="Generate this many synthetic rides (rideRequests / rideHistory)")
+    parser.add_argument('--riders', type=int, default=1000,
+                        help="Distinct riders the synthetic rides are spread over (default: 1000)")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed for synthetic data")
+    parser.add_argument('--hotspots', help="JSON file of hotspots (name, lat, lng, weight, radius_km)")
+    parser.add_argument('--days', type=int, default=30,
+                        help="Spread synthetic ride times over this many past days (default: 30)")
+    parser.add_argument('--workers', type=int, default=4, help="Parallel writers (default: 4)")
+    parser.add_argument('--target', choices=['legacy', 'unified'], default='legacy',
+                        help="Write drivers to legacy Drivers/{email} or to users/ + drivers/{uid}")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="Upsert the sample drivers on the Firestore AsyncClient")
+    parser.add_argument('--concurrency', type=int, default=100,
+                        help="Writes in flight with --async (default: 100)")
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.rides and not args.drivers:
+        parser.error("--rides needs --drivers (rides are assigned to synthetic drivers)")
+    if args.use_async and (args.drivers or args.rides):
+        parser.error("--async seeds the sample drivers; synthetic data is parallelised with --workers")
+    return args
+
+def main(argv=None):
     """Main seeding function."""
+    args = parse_args(argv)
+    
     print("\n" + "="*60)
     print("🌱 BTRIPS FIRESTORE DATA SEEDING")
     print("="*60)
@@ -258,15 +276,23 @@ def main():
     if not app:
         sys.exit(1)
     
-    db = firestore.client()
+    db = get_firestore()
+    start_metrics(args)
+    
+    if args.drivers or args.rides:
+        with step('seed_synthetic'):
+            seed_synthetic(db, args)
+        return
     
     # Seed drivers
-    drivers_count = seed_drivers(db)
+    with step('seed_drivers'):
+        drivers_count = seed_drivers(db, concurrency=args.concurrency if args.use_async else None)
     
     # Seed test user rides (optional - only if test user email provided)
     test_user_email = os.environ.get('TEST_USER_EMAIL', 'test.user@example.com')
     if test_user_email:
-        rides_count = seed_test_user_rides(db, test_user_email)
+        with step('seed_test_user_rides'):
+            rides_count = seed_test_user_rides(db, test_user_email)
     else:
         rides_count = 0
         print("\n⚠️  Skipping user rides (set TEST_USER_EMAIL env var to seed)")
@@ -0,0 +1,342 @@
+"""
+Seedable synthetic fleet and ride data for load-testing BTrips.
+
+Drivers, riders and rides are placed around weighted hotspots (the NYC
+airports and Manhattan by default) with a Gaussian spread, so queries on
+the matching collections see production-like density: tight clusters and
+a long tail. Every document is derived from (seed, kind, index) alone, so
+any index range can be generated on its own - that is what lets
+write_fleet() split the work across parallel writers - and re-running with
+the same seed rewrites exactly the same documents.
+
+Usage:
+    from synthetic_data import SyntheticFleet, write_fleet
+
+    fleet = SyntheticFleet(seed=7, drivers=10000, riders=50000)
+    for driver_data in fleet.legacy_drivers(0, 100):
+        ...
+    write_fleet(db, fleet, rides=200000, workers=8)
+
+    python3 scripts/seed_firestore_data.py --drivers 10000 --rides 200000 --workers 8
+
+Hotspots can be loaded from a JSON list of
+{"name", "lat", "lng", "weight", "radius_km"} objects with load_hotspots().
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+import json
+import math
+import random
+import threading
+
+from fares import estimate_trip, haversine_miles
+from firestore_bulk import MAX_BATCH_SIZE, BatchWriter
+from firestore_geo import geo_point
+from unified_schema import new_driver_data, new_user_data
+
+KM_PER_DEGREE = 111.32
+KM_PER_MILE = 1.609344
+
+# Dropoff hotspots are weighted by weight / (1 + distance / GRAVITY_KM)^2,
+# so most trips stay local and few cross to far-away hotspots
+GRAVITY_KM = 15.0
+
+DEFAULT_HOTSPOTS = [
+    {'name': 'Newark Liberty International Airport', 'lat': 40.6895, 'lng': -74.1745, 'weight': 2, 'radius_km': 3},
+    {'name': 'John F. Kennedy International Airport', 'lat': 40.6413, 'lng': -73.7781, 'weight': 3, 'radius_km': 3},
+    {'name': 'LaGuardia Airport', 'lat': 40.7769, 'lng': -73.8740, 'weight': 2, 'radius_km': 2},
+    {'name': 'Philadelphia International Airport', 'lat': 39.8719, 'lng': -75.2411, 'weight': 1, 'radius_km': 3},
+    {'name': 'Times Square, New York, NY', 'lat': 40.7589, 'lng': -73.9851, 'weight': 5, 'radius_km': 4},
+    {'name': 'Downtown Brooklyn, NY', 'lat': 40.6928, 'lng': -73.9903, 'weight': 2, 'radius_km': 3},
+]
+
+# vehicle type → (weight, car models); types match FirebaseConstants.vehicleType*
+VEHICLE_TYPES = {
+    'Sedan': (6, ['Toyota Camry', 'Honda Civic', 'Honda Accord', 'Nissan Altima']),
+    'SUV': (3, ['Toyota RAV4', 'Honda CR-V', 'Ford Explorer']),
+    'Luxury SUV': (1, ['Cadillac Escalade', 'BMW X7', 'Lincoln Navigator']),
+}
+
+DRIVER_STATUSES = {'Idle': 5, 'Busy': 2, 'Offline': 3}
+
+# Terminal rides live in rideHistory, the rest in rideRequests
+RIDE_STATUSES = {'completed': 60, 'cancelled': 10, 'pending': 15, 'accepted': 8, 'ongoing': 7}
+HISTORY_STATUSES = ('completed', 'cancelled')
+
+
+def load_hotspots(path):
+    """Read hotspots from a JSON file (list of name/lat/lng/weight/radius_km)."""
+    with open(path) as f:
+        hotspots = json.load(f)
+    for hotspot in hotspots:
+        hotspot.setdefault('weight', 1)
+        hotspot.setdefault('radius_km', 2)
+    return hotspots
+
+
+def driver_email(index):
+    return f"synthetic.driver{index:06d}@driver.com"
+
+
+def driver_uid(index):
+    return f"synthetic-driver-{index:06d}"
+
+
+def rider_email(index):
+    return f"synthetic.user{index:06d}@example.com"
+
+
+def rider_uid(index):
+    return f"synthetic-user-{index:06d}"
+
+
+def ride_id(index):
+    return f"synthetic-ride-{index:08d}"
+
+
+class _Weighted:
+    """Seeded weighted choice over a dict of value → weight."""
+
+    def __init__(self, weights):
+        self.values = list(weights)
+        self.cum_weights = []
+        total = 0
+        for value in self.values:
+            total += weights[value]
+            self.cum_weights.append(total)
+
+    def pick(self, rng):
+        return rng.choices(self.values, cum_weights=self.cum_weights)[0]
+
+
+class SyntheticFleet:
+    """Deterministic generator of drivers, riders and rides.
+
+    Args:
+        seed: RNG seed; the same seed always produces the same documents
+        drivers: Fleet size (rides reference drivers in range(drivers))
+        riders: Rider count (rides reference riders in range(riders))
+        hotspots: List of hotspot dicts (defaults to DEFAULT_HOTSPOTS)
+        days: Rides are requested within this many days before `now`
+        now: End of the ride time window (defaults to the current time)
+    """
+
+    def __init__(self, seed=42, drivers=100, riders=1000, hotspots=None, days=30, now=None):
+        self.seed = seed
+        self.driver_count = drivers
+        self.rider_count = riders
+        self.hotspots = hotspots or DEFAULT_HOTSPOTS
+        self.days = days
+        self.now = now or datetime.now(timezone.utc)
+        self._hotspot_choice = _Weighted({i: h['weight'] for i, h in enumerate(self.hotspots)})
+        self._dropoff_choice = [
+            _Weighted({
+                j: to['weight'] / (1 + haversine_miles(frm['lat'], frm['lng'], to['lat'], to['lng'])
+                                   * KM_PER_MILE / GRAVITY_KM) ** 2
+                for j, to in enumerate(self.hotspots)
+            })
+            for frm in self.hotspots
+        ]
+        self._vehicle_choice = _Weighted({name: weight for name, (weight, _) in VEHICLE_TYPES.items()})
+        self._driver_status_choice = _Weighted(DRIVER_STATUSES)
+        self._ride_status_choice = _Weighted(RIDE_STATUSES)
+
+    def _rng(self, kind, index):
+        # str seeds are hashed deterministically (unlike hash())
+        return random.Random(f"{self.seed}:{kind}:{index}")
+
+    def _point(self, rng, near=None):
+        """Pick a hotspot and a Gaussian-scattered point around it.
+
+        Returns:
+            (hotspot index, lat, lng)
+        """
+        choice = self._hotspot_choice if near is None else self._dropoff_choice[near]
+        index = choice.pick(rng)
+        hotspot = self.hotspots[index]
+        sigma_km = hotspot['radius_km'] / 2
+        lat = hotspot['lat'] + rng.gauss(0, sigma_km) / KM_PER_DEGREE
+        lng = hotspot['lng'] + rng.gauss(0, sigma_km) / (KM_PER_DEGREE * math.cos(math.radians(hotspot['lat'])))
+        return index, round(lat, 6), round(lng, 6)
+
+    def legacy_driver(self, index):
+        """Legacy 'Drivers' document for driver `index` (keyed by email)."""
+        rng = self._rng('driver', index)
+        vehicle_type = self._vehicle_choice.pick(rng)
+        _, lat, lng = self._point(rng)
+        return {
+            "Car Name": rng.choice(VEHICLE_TYPES[vehicle_type][1]),
+            "Car Plate Num": f"SYN-{index:06d}",
+            "Car Type": vehicle_type,
+            "name": f"Synthetic Driver {index}",
+            "email": driver_email(index),
+            "driverStatus": self._driver_status_choice.pick(rng),
+            "rate": 3.0,
+            "driverLoc": geo_point(lat, lng),
+        }
+
+    def legacy_drivers(self, start=0, stop=None):
+        for index in range(start, self.driver_count if stop is None else stop):
+            yield self.legacy_driver(index)
+
+    def rider(self, index):
+        """users/{uid} document for regular user `index`."""
+        return {
+            'email': rider_email(index),
+            'name': f"Synthetic User {index}",
+            'userType': 'user',
+            'phoneNumber': '',
+            'createdAt': self.now - timedelta(days=self.days),
+            'isActive': True,
+        }
+
+    def ride(self, index):
+        """Ride document for ride `index`.
+
+        Returns:
+            (collection name, ride data)
+        """
+        from google.cloud.firestore import GeoPoint
+
+        rng = self._rng('ride', index)
+        status = self._ride_status_choice.pick(rng)
+        vehicle_type = self._vehicle_choice.pick(rng)
+        pickup_spot, pickup_lat, pickup_lng = self._point(rng)
+        dropoff_spot, dropoff_lat, dropoff_lng = self._point(rng, near=pickup_spot)
+        distance, duration, fare = estimate_trip(pickup_lat, pickup_lng, dropoff_lat, dropoff_lng, vehicle_type)
+        rider = rng.randrange(self.rider_count)
+
+        requested_at = self.now - timedelta(seconds=rng.uniform(0, self.days * 86400))
+        ride = {
+            'userId': rider_uid(rider),
+            'driverId': None,
+            'userEmail': rider_email(rider),
+            'driverEmail': None,
+            'status': status,
+            'pickupLocation': GeoPoint(pickup_lat, pickup_lng),
+            'pickupAddress': self.hotspots[pickup_spot]['name'],
+            'dropoffLocation': GeoPoint(dropoff_lat, dropoff_lng),
+            'dropoffAddress': self.hotspots[dropoff_spot]['name'],
+            'scheduledTime': None,
+            'requestedAt': requested_at,
+            'acceptedAt': None,
+            'startedAt': None,
+            'completedAt': None,
+            'vehicleType': vehicle_type,
+            'fare': fare,
+            'distance': distance,
+            'duration': duration,
+            'route': None,
+            'declinedBy': [],
+            'paymentMethod': rng.choice(['cash', 'card']),
+            'paymentStatus': 'completed' if status == 'completed' else 'pending',
+        }
+
+        # Rides past pending have a driver; half of cancellations happen after acceptance
+        has_driver = status in ('accepted', 'ongoing', 'completed') or (
+            status == 'cancelled' and rng.random() < 0.5)
+        if has_driver:
+            driver = rng.randrange(self.driver_count)
+            ride['driverId'] = driver_uid(driver)
+            ride['driverEmail'] = driver_email(driver)
+            ride['acceptedAt'] = requested_at + timedelta(seconds=rng.uniform(10, 300))
+            if status in ('ongoing', 'completed'):
+                ride['startedAt'] = ride['acceptedAt'] + timedelta(seconds=rng.uniform(120, 900))
+            if status == 'completed':
+                ride['completedAt'] = ride['startedAt'] + timedelta(minutes=duration * rng.uniform(0.8, 1.4))
+                ride['userRating'] = rng.choice([3, 4, 4, 5, 5, 5, 5])
+                ride['driverRating'] = rng.choice([4, 5, 5, 5])
+        if status == 'pending' and rng.random() < 0.2:
+            ride['declinedBy'] = [driver_uid(rng.randrange(self.driver_count))]
+
+        collection = 'rideHistory' if status in HISTORY_STATUSES else 'rideRequests'
+        return collection, ride
+
+
+def _split(total, parts):
+    """Split range(total) into at most `parts` contiguous (start, stop) slices."""
+    parts = max(1, min(parts, total))
+    step = math.ceil(total / parts) if total else 0
+    return [(start, min(start + step, total)) for start in range(0, total, step)] if total else []
+
+
+class _Progress:
+    """Thread-safe per-kind write counter that prints every `every` documents."""
+
+    def __init__(self, every=10000):
+        self.every = every
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def add(self, kind, count, total):
+        if not count:
+            return
+        with self._lock:
+            before = self.counts.get(kind, 0)
+            self.counts[kind] = before + count
+            if self.counts[kind] // self.every > before // self.every or self.counts[kind] == total:
+                print(f"   ✍️  {kind}: {self.counts[kind]}/{total}")
+
+
+def _write_range(db, kind, writes_for, start, stop, total, chunk_size, progress):
+    """Generate and write documents start..stop-1 with one BatchWriter."""
+    with BatchWriter(db, chunk_size) as writer:
+        for index in range(start, stop):
+            for ref, data in writes_for(index):
+                writer.set(ref, data)
+            if (index - start + 1) % chunk_size == 0:
+                progress.add(kind, chunk_size, total)
+    progress.add(kind, (stop - start) % chunk_size, total)
+    return writer.committed
+
+
+def write_fleet(db, fleet, rides=0, workers=4, target='legacy', chunk_size=MAX_BATCH_SIZE):
+    """Write the fleet's drivers, riders and `rides` rides with parallel writers.
+
+    Args:
+        db: Firestore client
+        fleet: SyntheticFleet
+        rides: Number of rides to write
+        workers: Parallel writer threads (each with its own WriteBatch)
+        target: 'legacy' writes Drivers/{email}; 'unified' writes users/{uid} + drivers/{uid}
+        chunk_size: Documents per batch (max 500)
+
+    Returns:
+        Dict of kind → documents written
+    """
+    def driver_writes(index):
+        driver_data = fleet.legacy_driver(index)
+        if target == 'legacy':
+            from google.cloud.firestore import SERVER_TIMESTAMP
+            stamped = {**driver_data, 'updatedAt': SERVER_TIMESTAMP}
+            return [(db.collection('Drivers').document(driver_data['email']), stamped)]
+        uid = driver_uid(index)
+        return [
+            (db.collection('users').document(uid), new_user_data(driver_data['email'], driver_data)),
+            (db.collection('drivers').document(uid), new_driver_data(driver_data)),
+        ]
+
+    def rider_writes(index):
+        return [(db.collection('users').document(rider_uid(index)), fleet.rider(index))]
+
+    def ride_writes(index):
+        collection, ride = fleet.ride(index)
+        return [(db.collection(collection).document(ride_id(index)), ride)]
+
+    jobs = [('drivers', driver_writes, fleet.driver_count)]
+    if target == 'unified':
+        jobs.append(('riders', rider_writes, fleet.rider_count))
+    jobs.append(('rides', ride_writes, rides))
+
+    progress = _Progress()
+    written = {kind: 0 for kind, _, _ in jobs}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(_write_range, db, kind, writes_for, start, stop, total, chunk_size, progress): kind
+            for kind, writes_for, total in jobs
+            for start, stop in _split(total, workers)
+        }
+        for future in as_completed(futures):
+            written[futures[future]] += future.result()
+    return written
@@ -0,0 +1,71 @@
+"""
+Document builders for the unified schema (users, drivers, userProfiles).
+
+Shared by the migration, its dry run, the incremental/real-time driver
+sync, the async engine and the synthetic seeder, so every path writes the
+same shape. Kept free of script imports so any of them can import it.
+
+Usage:
+    from unified_schema import new_driver_data, new_user_data, new_user_profile_data
+"""
+
+from firestore_geo import with_geohash
+
+
+def new_user_data(driver_email, driver_data):
+    """users/{uid} document for a migrated driver with no existing user doc."""
+    from google.cloud.firestore import SERVER_TIMESTAMP
+    
+    return {
+        'email': driver_email,
+        'name': driver_data.get('name', 'Driver'),
+        'userType': 'driver',
+        'phoneNumber': '',
+        'createdAt': SERVER_TIMESTAMP,
+        'lastLogin': SERVER_TIMESTAMP,
+        'isActive': True,
+        'fcmToken': '',
+        'profileImageUrl': '',
+    }
+
+
+def new_driver_data(driver_data):
+    """Map a legacy 'Drivers' document to the new drivers/{uid} schema."""
+    data = {
+        'carName': driver_data.get('Car Name', ''),
+        'carPlateNum': driver_data.get('Car Plate Num', ''),
+        'carType': driver_data.get('Car Type', 'Car'),
+        'rate': driver_data.get('rate', 3.0),
+        'driverStatus': driver_data.get('driverStatus', 'Offline'),
+        'rating': 5.0,  # Default rating
+        'totalRides': 0,  # Default
+        'earnings': 0.0,  # Default
+        'licenseNumber': '',
+        'vehicleRegistration': '',
+        'isVerified': False,
+    }
+    
+    # Migrate location if exists, with the geohash the app's geo queries use
+    if 'driverLoc' in driver_data:
+        data['driverLoc'] = with_geohash(driver_data['driverLoc'])
+        if (data['driverLoc'] or {}).get('geohash'):
+            data['geohash'] = data['driverLoc']['geohash']
+    
+    return data
+
+
+def new_user_profile_data():
+    """Default userProfiles/{uid} document for a regular user."""
+    return {
+        'homeAddress': '',
+        'workAddress': '',
+        'favoriteLocations': [],
+        'paymentMethods': [],
+        'preferences': {
+            'notifications': True,
+            'language': 'en',
+            'theme': 'dark',
+        },
+        'totalRides': 0,
+        'rating': 5.0,
+    }